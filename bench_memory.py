@@ -0,0 +1,37 @@
+import argparse
+import tracemalloc
+from array import array
+from typing import Callable
+
+from pycompiler.objects import Object, IntObject, StringObject, ArrayObject, IntArrayObject
+
+
+def bytes_per_element(build: Callable[[int], Object], size: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    built = build(size)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del built
+    return (after - before) / size
+
+
+def int_array(size: int) -> Object:
+    # Past the small int cache, so every payload is its own Python int as a script's results would be
+    return ArrayObject([IntObject(1000 + i) for i in range(size)])
+
+
+def unboxed_int_array(size: int) -> Object:
+    return IntArrayObject(array("q", range(1000, 1000 + size)))
+
+
+def string_array(size: int) -> Object:
+    return ArrayObject([StringObject(str(i)) for i in range(size)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", dest="size", type=int, default=1_000_000)
+    args = parser.parse_args()
+    for name, build in [("int", int_array), ("unboxed int", unboxed_int_array), ("string", string_array)]:
+        print(f"{name} array of {args.size}: {bytes_per_element(build, args.size):.1f} bytes per element")
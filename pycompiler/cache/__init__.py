@@ -0,0 +1,2 @@
+from .binary import *
+from .cache import *
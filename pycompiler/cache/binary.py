@@ -0,0 +1,248 @@
+import mmap
+import marshal
+import struct
+from importlib.util import MAGIC_NUMBER
+from types import CodeType
+from typing import List, Tuple, Any
+from pycompiler.code import Instructions, RegOpcode, RegInstructions
+from pycompiler.objects import (
+    Object,
+    IntObject,
+    StringObject,
+    CompiledFunctionObject,
+    RegisterFunctionObject,
+    ClosureObject,
+)
+
+Error = str
+
+FORMAT_MAGIC = b"MKBC"
+FORMAT_VERSION = 1
+
+# Which backend the container was compiled for
+KIND_STACK = 0
+KIND_REGISTER = 1
+KIND_NATIVE = 2
+
+# magic, version, kind, reserved, constant count, code section offset, main offset, main length, main registers
+HEADER = struct.Struct(">4sHBBIIIII")
+
+TAG_INT = 0
+TAG_BIGINT = 1
+TAG_STRING = 2
+TAG_FUNCTION = 3
+TAG_REGISTER_FUNCTION = 4
+TAG_CLOSURE = 5
+
+TAG = struct.Struct(">B")
+INT = struct.Struct(">q")
+LENGTH = struct.Struct(">I")
+# num_locals, num_args, code offset, code length
+FUNCTION = struct.Struct(">IIII")
+# num_registers, num_args, num_free, code offset, code length
+REGISTER_FUNCTION = struct.Struct(">IIIII")
+REGISTER_INSTRUCTION = struct.Struct(">BIII")
+
+
+class LazyCompiledFunctionObject(CompiledFunctionObject):
+    __slots__ = ("code",)
+
+    def __init__(self, buffer: memoryview, offset: int, length: int, num_locals: int, num_args: int):
+        # value stays unset until the first call reads it
+        self.code: Tuple[memoryview, int, int] = (buffer, offset, length)
+        self.num_locals: int = num_locals
+        self.num_args: int = num_args
+        self.literal = None
+        self.max_stack = None
+        self.calls: int = 0
+        self.back_edges: int = 0
+        self.tier = None
+
+    def __getattr__(self, name: str):
+        if name != "value":
+            raise AttributeError(name)
+        buffer, offset, length = self.code
+        self.value = buffer[offset : offset + length]
+        return self.value
+
+
+class LazyRegisterFunctionObject(RegisterFunctionObject):
+    __slots__ = ("code",)
+
+    def __init__(self, buffer: memoryview, offset: int, length: int, num_registers: int, num_args: int, num_free: int):
+        self.code: Tuple[memoryview, int, int] = (buffer, offset, length)
+        self.num_registers: int = num_registers
+        self.num_args: int = num_args
+        self.num_free: int = num_free
+
+    def __getattr__(self, name: str):
+        if name != "value":
+            raise AttributeError(name)
+        buffer, offset, length = self.code
+        self.value = decode_register_instructions(buffer[offset : offset + length])
+        return self.value
+
+
+def encode_register_instructions(instructions: RegInstructions) -> bytes:
+    out = bytearray(REGISTER_INSTRUCTION.size * len(instructions))
+    for i, (op, a, b, c) in enumerate(instructions):
+        REGISTER_INSTRUCTION.pack_into(out, i * REGISTER_INSTRUCTION.size, op.value, a, b, c)
+    return bytes(out)
+
+
+def decode_register_instructions(buffer: memoryview) -> RegInstructions:
+    return [(RegOpcode(op), a, b, c) for op, a, b, c in REGISTER_INSTRUCTION.iter_unpack(buffer)]
+
+
+def serialize(bytecode: Any) -> bytes:
+    # Constant pool entries point into a code section that follows them
+    pool = bytearray()
+    code: List[bytes] = []
+    code_size: int = 0
+
+    def add_code(body: bytes) -> int:
+        nonlocal code_size
+        code.append(bytes(body))
+        code_size += len(body)
+        return code_size - len(body)
+
+    def add_constant(constant: Object) -> None:
+        match constant:
+            case IntObject():
+                if -(1 << 63) <= constant.value < 1 << 63:
+                    pool.extend(TAG.pack(TAG_INT) + INT.pack(constant.value))
+                else:
+                    raw = constant.value.to_bytes((constant.value.bit_length() + 8) // 8, "big", signed=True)
+                    pool.extend(TAG.pack(TAG_BIGINT) + LENGTH.pack(len(raw)) + raw)
+            case StringObject():
+                raw = constant.value.encode()
+                pool.extend(TAG.pack(TAG_STRING) + LENGTH.pack(len(raw)) + raw)
+            case CompiledFunctionObject():
+                offset = add_code(constant.value)
+                pool.extend(
+                    TAG.pack(TAG_FUNCTION)
+                    + FUNCTION.pack(constant.num_locals, constant.num_args, offset, len(constant.value))
+                )
+            case RegisterFunctionObject():
+                body = encode_register_instructions(constant.value)
+                offset = add_code(body)
+                pool.extend(
+                    TAG.pack(TAG_REGISTER_FUNCTION)
+                    + REGISTER_FUNCTION.pack(
+                        constant.num_registers, constant.num_args, constant.num_free, offset, len(body)
+                    )
+                )
+            case ClosureObject():
+                if constant.free:
+                    raise ValueError("closures with free variables are never constants")
+                pool.extend(TAG.pack(TAG_CLOSURE))
+                add_constant(constant.func)
+            case _:
+                raise ValueError(f"cannot serialize constant {constant}")
+
+    constants: List[Object] = []
+    if isinstance(bytecode, CodeType):
+        # marshal's format belongs to the interpreter, so its magic number goes in front
+        kind, num_registers = KIND_NATIVE, 0
+        main = MAGIC_NUMBER + marshal.dumps(bytecode)
+    elif len(bytecode) == 3:
+        kind, num_registers = KIND_REGISTER, bytecode[2]
+        main = encode_register_instructions(bytecode[0])
+        constants = bytecode[1]
+    else:
+        kind, num_registers = KIND_STACK, 0
+        main = bytes(bytecode[0])
+        constants = bytecode[1]
+    main_offset = add_code(main)
+    for constant in constants:
+        add_constant(constant)
+
+    # Code offsets are relative to the code section, which follows the constant pool
+    header = HEADER.pack(
+        FORMAT_MAGIC,
+        FORMAT_VERSION,
+        kind,
+        0,
+        len(constants),
+        HEADER.size + len(pool),
+        main_offset,
+        len(main),
+        num_registers,
+    )
+    return header + bytes(pool) + b"".join(code)
+
+
+def deserialize(buffer) -> Tuple[Any, Error | None]:
+    # Instruction sections stay views into buffer, nothing is copied
+    view = memoryview(buffer)
+    try:
+        header = HEADER.unpack_from(view, 0)
+        magic, version, kind, _, num_constants, code_offset, main_offset, main_length, num_registers = header
+        if magic != FORMAT_MAGIC:
+            return None, "not a bytecode container"
+        if version != FORMAT_VERSION:
+            return None, f"unsupported bytecode format version {version}"
+        code = view[code_offset:]
+        if main_offset + main_length > len(code):
+            return None, "truncated bytecode container"
+
+        pos: int = HEADER.size
+        constants: List[Object] = []
+        for _ in range(num_constants):
+            constant, pos = _read_constant(view, pos, code)
+            constants.append(constant)
+    except (struct.error, ValueError, UnicodeDecodeError) as e:
+        return None, f"corrupt bytecode container: {e}"
+
+    main = code[main_offset : main_offset + main_length]
+    if kind == KIND_NATIVE:
+        if bytes(main[: len(MAGIC_NUMBER)]) != MAGIC_NUMBER:
+            return None, "native code compiled by another Python version"
+        try:
+            return marshal.loads(main[len(MAGIC_NUMBER) :]), None
+        except (ValueError, EOFError, TypeError) as e:
+            return None, f"corrupt bytecode container: {e}"
+    if kind == KIND_REGISTER:
+        return (decode_register_instructions(main), constants, num_registers), None
+    return (main, constants), None
+
+
+def _read_constant(view: memoryview, pos: int, code: memoryview) -> Tuple[Object, int]:
+    (tag,) = TAG.unpack_from(view, pos)
+    pos += TAG.size
+    if tag == TAG_INT:
+        (value,) = INT.unpack_from(view, pos)
+        return IntObject(value), pos + INT.size
+    if tag == TAG_BIGINT:
+        (length,) = LENGTH.unpack_from(view, pos)
+        pos += LENGTH.size
+        return IntObject(int.from_bytes(view[pos : pos + length], "big", signed=True)), pos + length
+    if tag == TAG_STRING:
+        (length,) = LENGTH.unpack_from(view, pos)
+        pos += LENGTH.size
+        return StringObject(str(view[pos : pos + length], "utf-8")), pos + length
+    if tag == TAG_FUNCTION:
+        num_locals, num_args, offset, length = FUNCTION.unpack_from(view, pos)
+        if offset + length > len(code):
+            raise ValueError("function body out of bounds")
+        return LazyCompiledFunctionObject(code, offset, length, num_locals, num_args), pos + FUNCTION.size
+    if tag == TAG_REGISTER_FUNCTION:
+        num_registers, num_args, num_free, offset, length = REGISTER_FUNCTION.unpack_from(view, pos)
+        if offset + length > len(code):
+            raise ValueError("function body out of bounds")
+        func = LazyRegisterFunctionObject(code, offset, length, num_registers, num_args, num_free)
+        return func, pos + REGISTER_FUNCTION.size
+    if tag == TAG_CLOSURE:
+        func, pos = _read_constant(view, pos, code)
+        return ClosureObject(func, []), pos
+    raise ValueError(f"unknown constant tag {tag}")
+
+
+def load_bytecode(path: str) -> Tuple[Any, Error | None]:
+    with open(path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return None, "empty bytecode container"
+    # The views handed out keep the mapping alive
+    return deserialize(mapped)
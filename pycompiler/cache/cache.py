@@ -0,0 +1,124 @@
+import os
+import hashlib
+import tempfile
+from typing import List, Tuple, Any, Optional
+from pycompiler.code import Opcode, RegOpcode
+
+from .binary import FORMAT_VERSION, serialize, load_bytecode
+
+
+# Bump whenever the compiler output changes for the same source
+CACHE_VERSION = 3
+CACHE_SUFFIX = ".mkbc"
+
+# Renumbering the instruction set invalidates every entry on its own
+OPCODE_FINGERPRINT = ",".join(op.name for op in Opcode) + ";" + ",".join(op.name for op in RegOpcode)
+
+# Packages whose source decides the bytecode produced for a program
+COMPILER_PACKAGES = ("lexer", "parser", "optimizer", "compiler", "code", "objects", "modules")
+
+
+def compiler_fingerprint() -> str:
+    # Editing the compiler misses every old entry even when CACHE_VERSION was not bumped
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    digest = hashlib.sha256()
+    for package in COMPILER_PACKAGES:
+        directory = os.path.join(root, package)
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".py"):
+                continue
+            with open(os.path.join(directory, name), "rb") as f:
+                digest.update(f"{package}/{name}\0".encode())
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+COMPILER_FINGERPRINT = compiler_fingerprint()
+
+
+class BytecodeCache:
+    def __init__(self, directory: str, max_entries: int = 4096, max_bytes: int = 256 * 1024 * 1024) -> None:
+        self.directory: str = directory
+        self.max_entries: int = max_entries
+        self.max_bytes: int = max_bytes
+        self.hits: int = 0
+        self.misses: int = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, source: str, *variant: str) -> str:
+        # variant holds whatever else shapes the output, such as backend and opt level
+        digest = hashlib.sha256()
+        digest.update(f"{CACHE_VERSION}\0{FORMAT_VERSION}\0{OPCODE_FINGERPRINT}\0{COMPILER_FINGERPRINT}\0".encode())
+        for part in variant:
+            digest.update(f"{part}\0".encode())
+        digest.update(source.encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            bytecode, err = load_bytecode(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        if err:
+            # A corrupt or stale entry is a miss, the next put replaces it
+            self._remove(path)
+            self.misses += 1
+            return None
+        # The modification time doubles as the last use for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return bytecode
+
+    def put(self, key: str, bytecode: Any) -> None:
+        data = serialize(bytecode)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            # Readers see either the old entry or the complete new one
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            self._remove(tmp)
+            raise
+        self.evict()
+
+    def evict(self) -> None:
+        entries: List[Tuple[float, int, str]] = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        for _, size, path in entries:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._remove(path)
+            count -= 1
+            total -= size
+
+    def clear(self) -> None:
+        for name in os.listdir(self.directory):
+            if name.endswith(CACHE_SUFFIX):
+                self._remove(os.path.join(self.directory, name))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
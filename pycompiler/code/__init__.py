@@ -1 +1,5 @@
 from .code import *
+from .assembler import *
+from .relocate import *
+from .register import *
+from .verify import *
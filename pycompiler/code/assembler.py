@@ -0,0 +1,120 @@
+import struct
+from typing import List, Dict, Tuple, Optional, Union
+from .code import Instructions, Opcode, JUMP_OPCODES, operand_widths
+
+
+STRUCT_CODES = {1: "B", 2: "H", 4: "I"}
+
+
+class Label:
+    def __init__(self) -> None:
+        # Index of the instruction the label sits in front of, once bound
+        self.index: Optional[int] = None
+
+
+class Ins:
+    def __init__(self, op: Opcode, operands: List[int]):
+        self.op: Opcode = op
+        self.operands: List[int] = operands
+        # Jumps point at another Ins or a Label, None is the end of the instructions
+        self.target: Optional[Union[Ins, Label]] = None
+        self.dead: bool = False
+        self.forward: Optional[Ins] = None
+
+    def __repr__(self):
+        return f"<Ins: op={self.op.name}, operands={self.operands}>"
+
+
+_formats: Dict[Tuple[Opcode, bool], struct.Struct] = {}
+
+
+def _format(op: Opcode, wide: bool) -> struct.Struct:
+    fmt = _formats.get((op, wide))
+    if fmt is None:
+        widths = operand_widths(op)
+        if wide:
+            fmt = struct.Struct(">BB" + "I" * len(widths))
+        else:
+            fmt = struct.Struct(">B" + "".join(STRUCT_CODES[width] for width in widths))
+        _formats[(op, wide)] = fmt
+    return fmt
+
+
+def _is_wide(op: Opcode, operands: List[int]) -> bool:
+    return any(operand >= 1 << (8 * width) for operand, width in zip(operands, operand_widths(op)))
+
+
+def assemble_instructions(instructions: List[Ins]) -> Instructions:
+    count = len(instructions)
+    index_of: Dict[int, int] = {}
+    if any(isinstance(ins.target, Ins) for ins in instructions):
+        index_of = {id(ins): i for i, ins in enumerate(instructions)}
+
+    jumps: List[Tuple[int, int]] = []
+    wide: List[bool] = []
+    for i, ins in enumerate(instructions):
+        if ins.op in JUMP_OPCODES:
+            target = ins.target
+            if target is None:
+                jumps.append((i, count))
+            elif isinstance(target, Label):
+                if target.index is None:
+                    raise ValueError(f"jump at {i} to an unbound label")
+                jumps.append((i, target.index))
+            else:
+                jumps.append((i, index_of[id(target)]))
+            # Jumps start out compact and only ever grow
+            wide.append(False)
+        else:
+            wide.append(_is_wide(ins.op, ins.operands))
+
+    while True:
+        positions: List[int] = [0] * (count + 1)
+        pos: int = 0
+        for i, ins in enumerate(instructions):
+            positions[i] = pos
+            pos += _format(ins.op, wide[i]).size
+        positions[count] = pos
+
+        grown: bool = False
+        for i, target in jumps:
+            instructions[i].operands = [positions[target]]
+            if not wide[i] and _is_wide(instructions[i].op, instructions[i].operands):
+                wide[i] = True
+                grown = True
+        if not grown:
+            break
+
+    out = Instructions(positions[count])
+    for i, ins in enumerate(instructions):
+        if wide[i]:
+            _format(ins.op, True).pack_into(out, positions[i], Opcode.WIDE.value, ins.op.value, *ins.operands)
+        else:
+            _format(ins.op, False).pack_into(out, positions[i], ins.op.value, *ins.operands)
+    return out
+
+
+class Assembler:
+    def __init__(self) -> None:
+        self.instructions: List[Ins] = []
+
+    def emit(self, op: Opcode, operands: List[int] = []) -> Ins:
+        ins = Ins(op, operands)
+        self.instructions.append(ins)
+        return ins
+
+    def emit_jump(self, op: Opcode, target: Optional[Union[Ins, Label]] = None) -> Ins:
+        ins = Ins(op, [])
+        ins.target = target
+        self.instructions.append(ins)
+        return ins
+
+    def label(self) -> Label:
+        return Label()
+
+    def bind(self, label: Label) -> Label:
+        label.index = len(self.instructions)
+        return label
+
+    def assemble(self) -> Instructions:
+        return assemble_instructions(self.instructions)
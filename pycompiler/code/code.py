@@ -1,4 +1,4 @@
-from typing import List, Tuple, Any
+from typing import List, Tuple, Dict, Callable, Iterator
 from enum import Enum, auto
 
 
@@ -33,91 +33,196 @@ class Opcode(Enum):
     CLOSURE = auto()
     CURRENTCLOSURE = auto()
     NULL = auto()
+    WIDE = auto()
+    ADD_INT = auto()
+    SUB_INT = auto()
+    MUL_INT = auto()
+    DIV_INT = auto()
+    EQUAL_INT = auto()
+    NOTEQUAL_INT = auto()
+    GREATERTHAN_INT = auto()
+    MINUS_INT = auto()
+    ITER_INIT = auto()
+    ITER_NEXT = auto()
+    SETINDEX = auto()
 
 
 Instructions = bytearray
 
-
-def instructions_to_str(instructions: Instructions) -> str:
-    out_string: str = ""
-
+# Every operand of an instruction prefixed with WIDE is this many bytes
+WIDE_OPERAND_WIDTH = 4
+
+# Generic operators and their variants for operands already known to be integers
+INT_OPCODES = {
+    Opcode.ADD: Opcode.ADD_INT,
+    Opcode.SUB: Opcode.SUB_INT,
+    Opcode.MUL: Opcode.MUL_INT,
+    Opcode.DIV: Opcode.DIV_INT,
+    Opcode.EQUAL: Opcode.EQUAL_INT,
+    Opcode.NOTEQUAL: Opcode.NOTEQUAL_INT,
+    Opcode.GREATERTHAN: Opcode.GREATERTHAN_INT,
+    Opcode.MINUS: Opcode.MINUS_INT,
+}
+
+# Opcodes whose first operand is an absolute jump target
+JUMP_OPCODES = (Opcode.JUMP, Opcode.JUMPCOND, Opcode.ITER_NEXT)
+
+
+class Definition:
+    def __init__(self, op: Opcode, operand_widths: List[int], pops: int | Callable[[List[int]], int], pushes: int) -> None:
+        self.op: Opcode = op
+        self.name: str = op.name
+        self.operand_widths: List[int] = operand_widths
+        # Bytes taken by the opcode and its operands without a WIDE prefix
+        self.size: int = 1 + sum(operand_widths)
+        # Where each operand sits relative to the opcode
+        self.offsets: List[Tuple[int, int]] = []
+        offset: int = 1
+        for width in operand_widths:
+            self.offsets.append((offset, offset + width))
+            offset += width
+        # Values taken off the stack, which can depend on the operands, and values left on it
+        self.pops: int | Callable[[List[int]], int] = pops
+        self.pushes: int = pushes
+
+    def stack_effect(self, operands: List[int]) -> Tuple[int, int]:
+        if callable(self.pops):
+            return self.pops(operands), self.pushes
+        return self.pops, self.pushes
+
+
+# The one place an opcode's encoding and stack effect are written down
+DEFINITIONS: Dict[Opcode, Definition] = {
+    definition.op: definition
+    for definition in [
+        Definition(Opcode.CONSTANT, [2], 0, 1),
+        Definition(Opcode.TRUE, [], 0, 1),
+        Definition(Opcode.FALSE, [], 0, 1),
+        Definition(Opcode.ADD, [], 2, 1),
+        Definition(Opcode.SUB, [], 2, 1),
+        Definition(Opcode.MUL, [], 2, 1),
+        Definition(Opcode.DIV, [], 2, 1),
+        Definition(Opcode.POP, [], 1, 0),
+        Definition(Opcode.EQUAL, [], 2, 1),
+        Definition(Opcode.NOTEQUAL, [], 2, 1),
+        Definition(Opcode.GREATERTHAN, [], 2, 1),
+        Definition(Opcode.MINUS, [], 1, 1),
+        Definition(Opcode.BANG, [], 1, 1),
+        Definition(Opcode.JUMPCOND, [2], 1, 0),
+        Definition(Opcode.JUMP, [2], 0, 0),
+        Definition(Opcode.GETGLOBAL, [2], 0, 1),
+        Definition(Opcode.SETGLOBAL, [2], 1, 0),
+        Definition(Opcode.GETLOCAL, [1], 0, 1),
+        Definition(Opcode.SETLOCAL, [1], 1, 0),
+        Definition(Opcode.GETBUILTIN, [1], 0, 1),
+        Definition(Opcode.GETFREE, [1], 0, 1),
+        Definition(Opcode.ARRAY, [2], lambda operands: operands[0], 1),
+        Definition(Opcode.MAP, [2], lambda operands: 2 * operands[0], 1),
+        Definition(Opcode.INDEX, [], 2, 1),
+        # The function and its arguments, replaced by the result once the call returns
+        Definition(Opcode.CALL, [1], lambda operands: operands[0] + 1, 1),
+        Definition(Opcode.RETURNVALUE, [], 1, 0),
+        Definition(Opcode.RETURN, [], 0, 0),
+        Definition(Opcode.CLOSURE, [2, 1], lambda operands: operands[1], 1),
+        Definition(Opcode.CURRENTCLOSURE, [], 0, 1),
+        Definition(Opcode.NULL, [], 0, 1),
+        # A prefix, the instruction after it carries the effect
+        Definition(Opcode.WIDE, [], 0, 0),
+        Definition(Opcode.ADD_INT, [], 2, 1),
+        Definition(Opcode.SUB_INT, [], 2, 1),
+        Definition(Opcode.MUL_INT, [], 2, 1),
+        Definition(Opcode.DIV_INT, [], 2, 1),
+        Definition(Opcode.EQUAL_INT, [], 2, 1),
+        Definition(Opcode.NOTEQUAL_INT, [], 2, 1),
+        Definition(Opcode.GREATERTHAN_INT, [], 2, 1),
+        Definition(Opcode.MINUS_INT, [], 1, 1),
+        Definition(Opcode.ITER_INIT, [], 1, 1),
+        # Pushes the next element when it continues, pops the iterator when it jumps
+        Definition(Opcode.ITER_NEXT, [2], 0, 1),
+        Definition(Opcode.SETINDEX, [], 3, 0),
+    ]
+}
+
+# Indexed by the opcode byte, None where no opcode has that value
+OPCODES: List[Opcode | None] = [None] * 256
+DEFINITIONS_BY_VALUE: List[Definition | None] = [None] * 256
+for _op, _definition in DEFINITIONS.items():
+    OPCODES[_op.value] = _op
+    DEFINITIONS_BY_VALUE[_op.value] = _definition
+
+
+# Position, opcode, operands and whether it had a WIDE prefix
+DecodedInstruction = Tuple[int, Opcode, List[int], bool]
+
+
+def iter_instructions(instructions: Instructions) -> Iterator[DecodedInstruction]:
+    # Plain indexing, so nothing holds the buffer while suspended and the caller may still resize it
     i: int = 0
     while i < len(instructions):
+        pos: int = i
+        wide: bool = instructions[i] == Opcode.WIDE.value
+        if wide:
+            i += 1
         op: Opcode = lookup_opcode(instructions[i])
-        out_string += "{:04X}".format(i)
-        out_string += f" {op.name}"
+        i += 1
+        operands: List[int] = []
+        for width in DEFINITIONS[op].operand_widths:
+            if wide:
+                width = WIDE_OPERAND_WIDTH
+            operands.append(int.from_bytes(instructions[i : i + width], byteorder="big"))
+            i += width
+        yield pos, op, operands, wide
+
 
-        operands, read = read_operands(op, instructions[i + 1 :])
-        for operand in operands:
-            out_string += f" {operand}"
+def format_instruction(decoded: DecodedInstruction) -> str:
+    pos, op, operands, wide = decoded
+    prefix = " WIDE" if wide else ""
+    return f"{pos:04X}{prefix} {op.name}" + "".join(f" {operand}" for operand in operands)
 
-        out_string += "\n"
-        i += 1 + read
 
-    return out_string
+def instructions_to_str(instructions: Instructions) -> str:
+    return "".join(format_instruction(decoded) + "\n" for decoded in iter_instructions(instructions))
 
 
 def lookup_opcode(op_bytes: int) -> Opcode:
-    op = Opcode.NULL
-    for member in Opcode:
-        if op_bytes == member.value:
-            op = member
-            break
+    op = OPCODES[op_bytes]
+    if op is None:
+        return Opcode.NULL
     return op
 
 
-def read_operands(op: Opcode, operands: bytearray) -> Tuple[List[int], int]:
-    if (
-        op == Opcode.CONSTANT
-        or op == Opcode.JUMPCOND
-        or op == Opcode.JUMP
-        or op == Opcode.GETGLOBAL
-        or op == Opcode.SETGLOBAL
-        or op == Opcode.ARRAY
-        or op == Opcode.MAP
-    ):
-        return [int.from_bytes(operands[0:2], byteorder="big")], 2
-    elif (
-        op == Opcode.GETLOCAL
-        or op == Opcode.SETLOCAL
-        or op == Opcode.GETBUILTIN
-        or op == Opcode.GETFREE
-        or op == Opcode.CALL
-    ):
-        return [int.from_bytes(operands[0:1], byteorder="big")], 1
-    elif op == Opcode.CLOSURE:
-        return [int.from_bytes(operands[0:2], byteorder="big"), int.from_bytes(operands[2:3], byteorder="big")], 3
-    else:
-        return [], 0
+def operand_widths(op: Opcode) -> List[int]:
+    return DEFINITIONS[op].operand_widths
+
+
+def read_operands(op: Opcode, operands: bytearray, wide: bool = False) -> Tuple[List[int], int]:
+    values: List[int] = []
+    offset: int = 0
+    for width in DEFINITIONS[op].operand_widths:
+        if wide:
+            width = WIDE_OPERAND_WIDTH
+        values.append(int.from_bytes(operands[offset : offset + width], byteorder="big"))
+        offset += width
+    return values, offset
 
 
 def make(op: Opcode, operands: List[int] = []) -> Instructions:
-    instruction: bytearray = bytearray(1)
+    widths: List[int] = DEFINITIONS[op].operand_widths
+    if not widths:
+        return bytearray((op.value,))
+
+    # Operands too large for the compact encoding use a WIDE prefix
+    if any(operand >= 1 << (8 * width) for operand, width in zip(operands, widths)):
+        instruction: bytearray = bytearray(2)
+        instruction[0] = Opcode.WIDE.value
+        instruction[1] = op.value
+        for operand in operands[: len(widths)]:
+            instruction += operand.to_bytes(WIDE_OPERAND_WIDTH, byteorder="big")
+        return instruction
+
+    instruction = bytearray(1)
     instruction[0] = op.value
-
-    if (
-        op == Opcode.CONSTANT
-        or op == Opcode.JUMPCOND
-        or op == Opcode.JUMP
-        or op == Opcode.GETGLOBAL
-        or op == Opcode.SETGLOBAL
-        or op == Opcode.ARRAY
-        or op == Opcode.MAP
-    ):
-        instruction += bytearray(2)
-        instruction[1:] = operands[0].to_bytes(2, byteorder="big")
-    elif (
-        op == Opcode.GETLOCAL
-        or op == Opcode.SETLOCAL
-        or op == Opcode.GETBUILTIN
-        or op == Opcode.GETFREE
-        or op == Opcode.CALL
-    ):
-        instruction += bytearray(1)
-        instruction[1:] = operands[0].to_bytes(1, byteorder="big")
-    elif op == Opcode.CLOSURE:
-        instruction += bytearray(3)
-        instruction[1:3] = operands[0].to_bytes(2, byteorder="big")
-        instruction[3:] = operands[1].to_bytes(1, byteorder="big")
+    for operand, width in zip(operands, widths):
+        instruction += operand.to_bytes(width, byteorder="big")
 
     return instruction
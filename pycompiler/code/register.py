@@ -0,0 +1,86 @@
+from typing import List, Tuple
+from enum import Enum, auto
+
+
+class RegOpcode(Enum):
+    LOADK = auto()
+    LOADTRUE = auto()
+    LOADFALSE = auto()
+    LOADNULL = auto()
+    MOVE = auto()
+    ADD = auto()
+    SUB = auto()
+    MUL = auto()
+    DIV = auto()
+    EQUAL = auto()
+    NOTEQUAL = auto()
+    GREATERTHAN = auto()
+    MINUS = auto()
+    BANG = auto()
+    JUMPCOND = auto()
+    JUMP = auto()
+    GETGLOBAL = auto()
+    SETGLOBAL = auto()
+    GETBUILTIN = auto()
+    GETFREE = auto()
+    CURRENTCLOSURE = auto()
+    ARRAY = auto()
+    MAP = auto()
+    INDEX = auto()
+    CALL = auto()
+    CLOSURE = auto()
+    RETURNVALUE = auto()
+    RETURN = auto()
+    RESULT = auto()
+    ITER_INIT = auto()
+    ITER_NEXT = auto()
+    SETINDEX = auto()
+
+
+# Every register instruction is an opcode followed by three operands, unused ones are 0
+RegInstruction = Tuple[RegOpcode, int, int, int]
+RegInstructions = List[RegInstruction]
+
+
+def register_operand_count(op: RegOpcode) -> int:
+    if op in (RegOpcode.RETURN,):
+        return 0
+    elif op in (
+        RegOpcode.LOADTRUE,
+        RegOpcode.LOADFALSE,
+        RegOpcode.LOADNULL,
+        RegOpcode.CURRENTCLOSURE,
+        RegOpcode.JUMP,
+        RegOpcode.RETURNVALUE,
+        RegOpcode.RESULT,
+    ):
+        return 1
+    elif op in (
+        RegOpcode.LOADK,
+        RegOpcode.MOVE,
+        RegOpcode.MINUS,
+        RegOpcode.BANG,
+        RegOpcode.JUMPCOND,
+        RegOpcode.GETGLOBAL,
+        RegOpcode.SETGLOBAL,
+        RegOpcode.GETBUILTIN,
+        RegOpcode.GETFREE,
+        RegOpcode.ITER_INIT,
+    ):
+        return 2
+    return 3
+
+
+def make_register(op: RegOpcode, operands: List[int]) -> RegInstruction:
+    padded = operands + [0] * (3 - len(operands))
+    return op, padded[0], padded[1], padded[2]
+
+
+def register_instructions_to_str(instructions: RegInstructions) -> str:
+    out_string: str = ""
+    for i, ins in enumerate(instructions):
+        out_string += "{:04}".format(i) + f" {ins[0].name}"
+        for operand in ins[1 : 1 + register_operand_count(ins[0])]:
+            out_string += f" {operand}"
+        out_string += "\n"
+    return out_string
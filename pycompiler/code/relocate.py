@@ -0,0 +1,56 @@
+from typing import List, Dict, Optional
+from .code import Instructions, Opcode, JUMP_OPCODES, lookup_opcode, read_operands
+from .assembler import Ins, assemble_instructions
+
+
+def decode(instructions: Instructions, targets: Dict[int, int] = {}) -> List[Ins]:
+    # targets overrides the jump target of the instruction at a position
+    decoded: List[Ins] = []
+    by_pos: Dict[int, Ins] = {}
+    jump_targets: List[int] = []
+    view = memoryview(instructions)
+
+    i: int = 0
+    while i < len(instructions):
+        pos: int = i
+        wide: bool = instructions[i] == Opcode.WIDE.value
+        if wide:
+            i += 1
+        op: Opcode = lookup_opcode(instructions[i])
+        operands, read = read_operands(op, view[i + 1 :], wide)
+        ins = Ins(op, operands)
+        by_pos[pos] = ins
+        decoded.append(ins)
+        if op in JUMP_OPCODES:
+            jump_targets.append(targets.get(pos, operands[0]))
+        i += 1 + read
+
+    jumps = [ins for ins in decoded if ins.op in JUMP_OPCODES]
+    for ins, target in zip(jumps, jump_targets):
+        ins.target = by_pos.get(target)
+
+    return decoded
+
+
+def compact(decoded: List[Ins]) -> List[Ins]:
+    # Dead instructions hand their incoming jumps to the next live one
+    next_live: Optional[Ins] = None
+    for ins in reversed(decoded):
+        if ins.dead:
+            ins.forward = next_live
+        else:
+            next_live = ins
+
+    live: List[Ins] = []
+    for ins in decoded:
+        if ins.dead:
+            continue
+        if ins.op in JUMP_OPCODES:
+            while ins.target is not None and ins.target.dead:
+                ins.target = ins.target.forward
+        live.append(ins)
+    return live
+
+
+def encode(decoded: List[Ins]) -> Instructions:
+    return assemble_instructions(decoded)
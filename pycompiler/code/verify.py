@@ -0,0 +1,88 @@
+from typing import List, Dict, Tuple, Any
+from .code import Instructions, Opcode, JUMP_OPCODES, DEFINITIONS, OPCODES, read_operands
+
+Error = str
+
+# Control never reaches the next instruction
+TERMINATORS = (Opcode.JUMP, Opcode.RETURNVALUE, Opcode.RETURN)
+
+
+def stack_effect(op: Opcode, operands: List[int]) -> Tuple[int, int]:
+    return DEFINITIONS[op].stack_effect(operands)
+
+
+def _decode(instructions: Instructions) -> Tuple[Dict[int, Tuple[Opcode, List[int], int]], Error | None]:
+    # Position of every instruction to its opcode, operands and the position after it
+    decoded: Dict[int, Tuple[Opcode, List[int], int]] = {}
+    view = memoryview(instructions)
+    i: int = 0
+    while i < len(instructions):
+        pos: int = i
+        wide: bool = instructions[i] == Opcode.WIDE.value
+        if wide:
+            i += 1
+        op: Opcode | None = OPCODES[instructions[i]] if i < len(instructions) else None
+        if op is None:
+            return decoded, f"invalid bytecode at {pos:04X}: unknown opcode"
+        if op == Opcode.WIDE or (wide and not DEFINITIONS[op].operand_widths):
+            return decoded, f"invalid bytecode at {pos:04X}: WIDE prefix on {op.name}"
+        operands, read = read_operands(op, view[i + 1 :], wide)
+        i += 1 + read
+        if i > len(instructions):
+            return decoded, f"invalid bytecode at {pos:04X}: truncated {op.name}"
+        decoded[pos] = (op, operands, i)
+    return decoded, None
+
+
+def verify(instructions: Instructions) -> Tuple[int, Error | None]:
+    # The deepest the operand stack gets above the locals, found by following every path from the start
+    decoded, err = _decode(instructions)
+    if err:
+        return 0, err
+    end = len(instructions)
+    depths: Dict[int, int] = {}
+    pending: List[Tuple[int, int]] = [(0, 0)]
+    max_depth: int = 0
+
+    while pending:
+        pos, depth = pending.pop()
+        if pos == end:
+            continue
+        if pos in depths:
+            if depths[pos] != depth:
+                return 0, f"invalid bytecode at {pos:04X}: stack depth {depth} here, {depths[pos]} on another path"
+            continue
+        depths[pos] = depth
+        op, operands, next_pos = decoded[pos]
+
+        successors: List[Tuple[int, int]] = []
+        if op == Opcode.ITER_NEXT:
+            # The definition covers continuing, leaving the loop drops the iterator instead
+            if depth < 1:
+                return 0, f"invalid bytecode at {pos:04X}: stack underflow in {op.name}"
+            successors = [(next_pos, depth + 1), (operands[0], depth - 1)]
+        else:
+            pops, pushes = stack_effect(op, operands)
+            if depth < pops:
+                return 0, f"invalid bytecode at {pos:04X}: stack underflow in {op.name}"
+            after = depth - pops + pushes
+            if op not in TERMINATORS:
+                successors.append((next_pos, after))
+            if op in JUMP_OPCODES:
+                successors.append((operands[0], after))
+
+        for target, target_depth in successors:
+            if target != end and target not in decoded:
+                return 0, f"invalid bytecode at {pos:04X}: {op.name} to {target:04X} is not an instruction"
+            max_depth = max(max_depth, target_depth)
+            pending.append((target, target_depth))
+    return max_depth, None
+
+
+def verify_function(func: Any) -> Error | None:
+    # Stores the result on the function, so each one is verified once however often it runs
+    max_stack, err = verify(func.value)
+    if err:
+        return err
+    func.max_stack = max_stack
+    return None
@@ -1,2 +1,6 @@
 from .compiler import *
 from .symbols import *
+from .register import *
+from .ir import *
+from .transpiler import *
+from .disassemble import *
@@ -1,17 +1,21 @@
-from typing import List, Tuple
+from typing import List, Tuple, Optional
 from pycompiler.lexer import TokenType
-from pycompiler.objects import Object, IntObject, StringObject, CompiledFunctionObject, BUILTINS
-from pycompiler.code import Instructions, Opcode, make
+from pycompiler.objects import Object, IntObject, StringObject, CompiledFunctionObject, ClosureObject, BUILTINS
+from pycompiler.code import Instructions, Opcode, Ins, INT_OPCODES
 from pycompiler.parser import (
     Statement,
     LetStatement,
     ReturnStatement,
     ExpressionStatement,
+    ImportStatement,
+    IndexAssignStatement,
     Expression,
     LiteralExpression,
     InfixExpression,
     PrefixExpression,
     IfExpression,
+    WhileExpression,
+    ForExpression,
     CallExpression,
     Literal,
     IntLiteral,
@@ -23,7 +27,9 @@ from pycompiler.parser import (
     IdentifierLiteral,
 )
 
+from .resolver import Resolver
 from .symbols import SymbolTable, GLOBALSCOPE, LOCALSCOPE, BUILTINSCOPE, FREESCOPE, FUNCTIONSCOPE
+from .ir import BasicBlock, IRPass, TERMINATOR_OPCODES, assemble
 
 
 Bytecode = Tuple[Instructions, List[Object]]
@@ -38,14 +44,21 @@ class EmittedInstruction:
 
 class CompilerScope():
     def __init__(self) -> None:
-        self.instructions: Instructions = Instructions()
+        self.blocks: List[BasicBlock] = [BasicBlock(0)]
+        self.current_block: BasicBlock = self.blocks[0]
         self.last_ins = EmittedInstruction(Opcode.NULL, 9999)
         self.prev_ins = EmittedInstruction(Opcode.NULL, 9999)
 
+    @property
+    def instructions(self) -> Instructions:
+        return assemble(self.blocks)
+
 
 class Compiler:
-    def __init__(self) -> None:
+    def __init__(self, ir_passes: Optional[List[IRPass]] = None) -> None:
         self.constants: List[Object] = []
+        # Run over the blocks of every scope before it is linearized
+        self.ir_passes: List[IRPass] = list(ir_passes) if ir_passes else []
 
         self.symbol_table: SymbolTable = SymbolTable()
         for i, builtin in enumerate(BUILTINS):
@@ -54,7 +67,15 @@ class Compiler:
         self.scopes: List[CompilerScope] = [CompilerScope()]
         self.scope_index: int = 0
 
+        # (module path, name, global index) for every name bound by an import, resolved when linking
+        self.imports: List[Tuple[str, str, int]] = []
+
     def compile(self, ast: List[Statement]) -> Error | None:
+        # Names are bound once up front, code generation only reads the annotations
+        Resolver(self.symbol_table).resolve(ast)
+        return self._compile_statements(ast)
+
+    def _compile_statements(self, ast: List[Statement]) -> Error | None:
         for statement in ast:
             match statement:
                 case ExpressionStatement():
@@ -64,28 +85,40 @@ class Compiler:
                     # Need to cleanup the expression from the stack once its executed
                     self._emit(Opcode.POP, [])
                 case LetStatement():
-                    symbol = self.symbol_table.define(statement.ident.token_value)
+                    symbol = statement.symbol
                     err = self._compile_expression(statement.expr)
                     if err:
                         return err
 
                     # Assign result of expression to identifier
-                    if symbol.scope == GLOBALSCOPE:
-                        self._emit(Opcode.SETGLOBAL, [symbol.index])
-                    else:
-                        self._emit(Opcode.SETLOCAL, [symbol.index])
+                    self._store_symbol(symbol)
                 case ReturnStatement():
                     err = self._compile_expression(statement.expr)
                     if err:
                         return err
                     self._emit(Opcode.RETURNVALUE, [])
+                    # Anything after the return is left in a block of its own
+                    self._new_block()
+                case ImportStatement():
+                    if self.scope_index != 0:
+                        return f"import {statement.path} must be at the top level"
+                    if statement.names is None:
+                        return f"import {statement.path} was not resolved"
+                    for name, symbol in zip(statement.names, statement.symbols):
+                        self.imports.append((statement.path, name, symbol.index))
+                case IndexAssignStatement():
+                    for expression in (statement.collection, statement.index, statement.value):
+                        err = self._compile_expression(expression)
+                        if err:
+                            return err
+                    self._emit(Opcode.SETINDEX, [])
                 case _:
                     return f"{statement} type not implemented."
 
         return None
 
     def bytecode(self) -> Bytecode:
-        return self._current_instructions(), self.constants
+        return self._scope_instructions(self._current_scope()), self.constants
 
     def _compile_expression(self, expression: Expression) -> Error | None:
         match expression:
@@ -100,7 +133,7 @@ class Compiler:
 
                 match expression.operator.token_type:
                     case TokenType.MINUS:
-                        self._emit(Opcode.MINUS, [])
+                        self._emit_operator(Opcode.MINUS, expression)
                     case TokenType.BANG:
                         self._emit(Opcode.BANG, [])
                     case _:
@@ -114,7 +147,7 @@ class Compiler:
                     err = self._compile_expression(expression.left)
                     if err:
                         return err
-                    self._emit(Opcode.GREATERTHAN, [])
+                    self._emit_operator(Opcode.GREATERTHAN, expression)
                     return None
 
                 err = self._compile_expression(expression.left)
@@ -126,19 +159,19 @@ class Compiler:
 
                 match expression.operator.token_type:
                     case TokenType.PLUS:
-                        self._emit(Opcode.ADD, [])
+                        self._emit_operator(Opcode.ADD, expression)
                     case TokenType.MINUS:
-                        self._emit(Opcode.SUB, [])
+                        self._emit_operator(Opcode.SUB, expression)
                     case TokenType.ASTERISK:
-                        self._emit(Opcode.MUL, [])
+                        self._emit_operator(Opcode.MUL, expression)
                     case TokenType.SLASH:
-                        self._emit(Opcode.DIV, [])
+                        self._emit_operator(Opcode.DIV, expression)
                     case TokenType.EQ:
-                        self._emit(Opcode.EQUAL, [])
+                        self._emit_operator(Opcode.EQUAL, expression)
                     case TokenType.NOT_EQ:
-                        self._emit(Opcode.NOTEQUAL, [])
+                        self._emit_operator(Opcode.NOTEQUAL, expression)
                     case TokenType.GT:
-                        self._emit(Opcode.GREATERTHAN, [])
+                        self._emit_operator(Opcode.GREATERTHAN, expression)
                     case TokenType.LBRACKET:
                         self._emit(Opcode.INDEX, [])
                     case _:
@@ -147,26 +180,51 @@ class Compiler:
                 err = self._compile_expression(expression.condition)
                 if err:
                     return err
-                jumpcond_op_pos: int = self._emit(Opcode.JUMPCOND, [9999])
-                err = self.compile(expression.consequence.statements)
+                jumpcond = self._emit_jump(Opcode.JUMPCOND)
+                self._new_block()
+                err = self._compile_arm(expression.consequence.statements)
                 if err:
                     return err
-                if self._last_ins_is(Opcode.POP):
-                    self._remove_last_ins()
-                jump_op_pos: int = self._emit(Opcode.JUMP, [9999])
-                after_cons_pos = len(self._current_instructions())
-                self._change_operand(jumpcond_op_pos, [after_cons_pos])
+                jump = self._emit_jump(Opcode.JUMP)
+                jumpcond.target = self._new_block()
 
                 if expression.alternative:
-                    err = self.compile(expression.alternative.statements)
+                    err = self._compile_arm(expression.alternative.statements)
                     if err:
                         return err
-                    if self._last_ins_is(Opcode.POP):
-                        self._remove_last_ins()
                 else:
                     self._emit(Opcode.NULL, [])
-                after_alt_pos = len(self._current_instructions())
-                self._change_operand(jump_op_pos, [after_alt_pos])
+                jump.target = self._new_block()
+            case WhileExpression():
+                loop = self._new_block()
+                err = self._compile_expression(expression.condition)
+                if err:
+                    return err
+                jumpcond = self._emit_jump(Opcode.JUMPCOND)
+                self._new_block()
+                err = self._compile_statements(expression.body.statements)
+                if err:
+                    return err
+                self._emit_jump(Opcode.JUMP).target = loop
+                jumpcond.target = self._new_block()
+                # A loop evaluates to null
+                self._emit(Opcode.NULL, [])
+            case ForExpression():
+                err = self._compile_expression(expression.iterable)
+                if err:
+                    return err
+                # The iterator stays on the stack until ITER_NEXT runs out and pops it
+                self._emit(Opcode.ITER_INIT, [])
+                loop = self._new_block()
+                iter_next = self._emit_jump(Opcode.ITER_NEXT)
+                self._new_block()
+                self._store_symbol(expression.symbol)
+                err = self._compile_statements(expression.body.statements)
+                if err:
+                    return err
+                self._emit_jump(Opcode.JUMP).target = loop
+                iter_next.target = self._new_block()
+                self._emit(Opcode.NULL, [])
             case CallExpression():
                 err = self._compile_expression(expression.func)
                 if err:
@@ -181,6 +239,17 @@ class Compiler:
 
         return None
 
+    def _compile_arm(self, statements: List[Statement]) -> Error | None:
+        err = self._compile_statements(statements)
+        if err:
+            return err
+        # An arm evaluates to its last expression, or null when it ends with anything else
+        if self._last_ins_is(Opcode.POP):
+            self._remove_last_ins()
+        elif not self._last_ins_is(Opcode.RETURNVALUE):
+            self._emit(Opcode.NULL, [])
+        return None
+
     def _compile_literal(self, literal: Literal):
         match literal:
             case IntLiteral():
@@ -204,19 +273,14 @@ class Compiler:
                 if err:
                     return err
             case IdentifierLiteral():
-                result, symbol = self.symbol_table.resolve(literal.token.token_value)
-                if not result or not symbol:
+                if literal.symbol is None:
                     return f"Cannot resolve identifier {literal.token.token_value}"
-                err = self._load_symbol(symbol)
+                err = self._load_symbol(literal.symbol)
                 if err:
                     return err
             case FunctionLiteral():
                 self._enter_scope()
-                for arg in literal.arguments:
-                    symbol = self.symbol_table.define(arg.token_value)
-                if literal.name:
-                    self.symbol_table.define_function_name(literal.name)
-                err = self.compile(literal.body.statements)
+                err = self._compile_statements(literal.body.statements)
                 if err:
                     return err
                 if self._last_ins_is(Opcode.POP):
@@ -224,14 +288,20 @@ class Compiler:
                     self._emit(Opcode.RETURNVALUE, [])
                 if not self._last_ins_is(Opcode.RETURNVALUE):
                     self._emit(Opcode.RETURN, [])
-                free_symbols = self.symbol_table.free_symbols
-                num_locals = self.symbol_table.num_defs
+                free_symbols = literal.free_symbols
+                num_locals = literal.num_locals
                 instructions = self._leave_scope()
 
+                func = CompiledFunctionObject(instructions, num_locals, len(literal.arguments), literal)
+                if not free_symbols:
+                    # Nothing to capture, so every evaluation can share one closure
+                    self._emit(Opcode.CONSTANT, [self._add_constant(ClosureObject(func, []))])
+                    return None
+
                 for s in free_symbols:
                     self._load_symbol(s)
 
-                self._emit(Opcode.CLOSURE, [self._add_constant(CompiledFunctionObject(instructions, num_locals, len(literal.arguments))), len(free_symbols)])
+                self._emit(Opcode.CLOSURE, [self._add_constant(func), len(free_symbols)])
             case _:
                 return f"Literal {literal} not implemented"
 
@@ -247,6 +317,12 @@ class Compiler:
         else:
             self._emit(Opcode.GETLOCAL, [symbol.index])
 
+    def _store_symbol(self, symbol):
+        if symbol.scope == GLOBALSCOPE:
+            self._emit(Opcode.SETGLOBAL, [symbol.index])
+        else:
+            self._emit(Opcode.SETLOCAL, [symbol.index])
+
     def _compile_int(self, literal: IntLiteral):
         integer: IntObject = IntObject(literal.value)
         self._emit(Opcode.CONSTANT, [self._add_constant(integer)])
@@ -282,17 +358,32 @@ class Compiler:
         self.constants.append(constant)
         return len(self.constants) - 1
 
-    def _add_instruction(self, instruction: Instructions) -> int:
-        pos: int = len(self._current_instructions())
-        self._current_scope().instructions += instruction
-        return pos
-
-    def _emit(self, op: Opcode, operands: List[int] = []) -> int:
-        ins: Instructions = make(op, operands)
-        pos: int = self._add_instruction(ins)
-        self._current_scope().prev_ins = self._current_scope().last_ins
-        self._current_scope().last_ins = EmittedInstruction(op, pos)
-        return pos
+    def _emit(self, op: Opcode, operands: List[int] = []) -> Ins:
+        scope = self._current_scope()
+        ins = Ins(op, operands)
+        scope.current_block.instructions.append(ins)
+        scope.prev_ins = scope.last_ins
+        scope.last_ins = EmittedInstruction(op, len(scope.current_block.instructions) - 1)
+        return ins
+
+    def _emit_jump(self, op: Opcode) -> Ins:
+        # The target block is filled in later and resolved when the scope is assembled
+        return self._emit(op, [])
+
+    def _emit_operator(self, op: Opcode, expression: PrefixExpression | InfixExpression) -> Ins:
+        if expression.int_operands:
+            return self._emit(INT_OPCODES[op], [])
+        return self._emit(op, [])
+
+    def _new_block(self) -> BasicBlock:
+        scope = self._current_scope()
+        block = BasicBlock(len(scope.blocks))
+        last = scope.current_block.terminator()
+        if last is None or last.op not in TERMINATOR_OPCODES:
+            scope.current_block.fallthrough = block
+        scope.blocks.append(block)
+        scope.current_block = block
+        return block
 
     def _enter_scope(self):
         self.scope_index += 1
@@ -303,24 +394,24 @@ class Compiler:
         self.scope_index -= 1
         scope = self.scopes.pop()
         self.symbol_table = self.symbol_table.outer
-        return scope.instructions
+        return self._scope_instructions(scope)
+
+    def _scope_instructions(self, scope: CompilerScope) -> Instructions:
+        blocks = scope.blocks
+        for ir_pass in self.ir_passes:
+            blocks = ir_pass(blocks)
+        return assemble(blocks)
 
     def _current_scope(self) -> CompilerScope:
         return self.scopes[self.scope_index]
 
-    def _current_instructions(self) -> Instructions:
-        return self._current_scope().instructions
-
     def _last_ins_is(self, opcode: Opcode) -> bool:
         return self._current_scope().last_ins.opcode == opcode
 
     def _remove_last_ins(self) -> None:
-        self._current_scope().instructions = self._current_instructions()[: self._current_scope().last_ins.pos]
-        self.last_ins = self._current_scope().prev_ins
-
-    def _replace_ins(self, pos: int, new_ins: Instructions) -> None:
-        self._current_scope().instructions[pos : pos + len(new_ins)] = new_ins
-
-    def _change_operand(self, op_pos: int, operands: List[int]) -> None:
-        new_ins = make(Opcode(self._current_instructions()[op_pos]), operands)
-        self._replace_ins(op_pos, new_ins)
+        scope = self._current_scope()
+        for block in reversed(scope.blocks):
+            if block.instructions:
+                block.instructions.pop()
+                break
+        scope.last_ins = scope.prev_ins
@@ -0,0 +1,69 @@
+import json
+from typing import List, Dict, Iterator, Optional, TextIO, Tuple
+
+from pycompiler.objects import Object, CompiledFunctionObject, ClosureObject
+from pycompiler.code import Instructions, Opcode, DecodedInstruction, iter_instructions, format_instruction
+
+from .compiler import Bytecode
+
+# Constant index of the function an instruction belongs to, None for the main program
+FunctionIndex = Optional[int]
+
+DISASSEMBLY_FORMATS = ("text", "json")
+
+
+def _function_constant(constants: List[Object], index: int) -> Optional[CompiledFunctionObject]:
+    if index >= len(constants):
+        return None
+    const = constants[index]
+    # Closures without free variables are stored already built
+    if isinstance(const, ClosureObject):
+        const = const.func
+    if isinstance(const, CompiledFunctionObject):
+        return const
+    return None
+
+
+def disassemble(bytecode: Bytecode) -> Iterator[Tuple[FunctionIndex, DecodedInstruction]]:
+    # The main program, then every function it reaches through CONSTANT or CLOSURE, each once and in order of use
+    instructions, constants = bytecode
+    seen: set = set()
+    pending: List[Tuple[FunctionIndex, Instructions]] = [(None, instructions)]
+    while pending:
+        index, ins = pending.pop()
+        nested: List[Tuple[FunctionIndex, Instructions]] = []
+        for decoded in iter_instructions(ins):
+            yield index, decoded
+            op, operands = decoded[1], decoded[2]
+            if (op == Opcode.CONSTANT or op == Opcode.CLOSURE) and operands[0] not in seen:
+                func = _function_constant(constants, operands[0])
+                if func is not None:
+                    seen.add(operands[0])
+                    nested.append((operands[0], func.value))
+        pending.extend(reversed(nested))
+
+
+def disassembly_to_text(bytecode: Bytecode) -> Iterator[str]:
+    current: FunctionIndex = -1
+    for index, decoded in disassemble(bytecode):
+        if index != current:
+            current = index
+            if index is None:
+                yield "main:\n"
+            else:
+                func = _function_constant(bytecode[1], index)
+                yield f"\nconstant {index}: fn(args={func.num_args}, locals={func.num_locals})\n"
+        yield "  " + format_instruction(decoded) + "\n"
+
+
+def disassembly_to_json(bytecode: Bytecode) -> Iterator[str]:
+    # One object per line, so a reader can start before the whole program is decoded
+    for index, (pos, op, operands, wide) in disassemble(bytecode):
+        record: Dict = {"function": index, "pos": pos, "op": op.name, "operands": operands, "wide": wide}
+        yield json.dumps(record) + "\n"
+
+
+def write_disassembly(bytecode: Bytecode, out: TextIO, fmt: str = "text") -> None:
+    lines = disassembly_to_json(bytecode) if fmt == "json" else disassembly_to_text(bytecode)
+    for line in lines:
+        out.write(line)
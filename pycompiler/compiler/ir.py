@@ -0,0 +1,57 @@
+from typing import List, Dict, Optional, Callable
+from pycompiler.code import Instructions, Opcode, JUMP_OPCODES, Ins, Label, Assembler
+
+
+# Opcodes after which control never reaches the next instruction
+TERMINATOR_OPCODES = (Opcode.JUMP, Opcode.RETURNVALUE, Opcode.RETURN)
+
+
+class BasicBlock:
+    def __init__(self, label: int) -> None:
+        self.label: int = label
+        # Jumps inside a block target another BasicBlock
+        self.instructions: List[Ins] = []
+        # Block that runs next when control falls off the end of this one
+        self.fallthrough: Optional[BasicBlock] = None
+
+    def terminator(self) -> Optional[Ins]:
+        if self.instructions and self.instructions[-1].op in JUMP_OPCODES + TERMINATOR_OPCODES:
+            return self.instructions[-1]
+        return None
+
+    def successors(self) -> List["BasicBlock"]:
+        out: List[BasicBlock] = []
+        last = self.terminator()
+        if last is not None and last.op in JUMP_OPCODES and last.target is not None:
+            out.append(last.target)
+        if self.fallthrough is not None:
+            out.append(self.fallthrough)
+        return out
+
+    def __repr__(self):
+        return f"<BasicBlock: label={self.label}, instructions={self.instructions}>"
+
+
+IRPass = Callable[[List[BasicBlock]], List[BasicBlock]]
+
+
+def linearize(blocks: List[BasicBlock]) -> Assembler:
+    # Lay blocks out in order, jumping explicitly where a fallthrough was moved away
+    assembler = Assembler()
+    labels: Dict[int, Label] = {id(block): assembler.label() for block in blocks}
+    for i, block in enumerate(blocks):
+        # An empty block's label is bound to whatever is laid out after it
+        assembler.bind(labels[id(block)])
+        for ins in block.instructions:
+            if ins.op in JUMP_OPCODES:
+                assembler.emit_jump(ins.op, labels[id(ins.target)] if ins.target is not None else None)
+            else:
+                assembler.emit(ins.op, list(ins.operands))
+        following = blocks[i + 1] if i + 1 < len(blocks) else None
+        if block.fallthrough is not None and block.fallthrough is not following:
+            assembler.emit_jump(Opcode.JUMP, labels[id(block.fallthrough)])
+    return assembler
+
+
+def assemble(blocks: List[BasicBlock]) -> Instructions:
+    return linearize(blocks).assemble()
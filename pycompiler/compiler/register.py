@@ -0,0 +1,387 @@
+from typing import List, Tuple, Optional
+from pycompiler.lexer import TokenType
+from pycompiler.objects import Object, IntObject, StringObject, RegisterFunctionObject, ClosureObject, BUILTINS
+from pycompiler.code import RegOpcode, RegInstructions, make_register
+from pycompiler.parser import (
+    Statement,
+    LetStatement,
+    ReturnStatement,
+    ExpressionStatement,
+    IndexAssignStatement,
+    BlockStatement,
+    Expression,
+    LiteralExpression,
+    InfixExpression,
+    PrefixExpression,
+    IfExpression,
+    WhileExpression,
+    ForExpression,
+    CallExpression,
+    Literal,
+    IntLiteral,
+    FunctionLiteral,
+    BooleanLiteral,
+    StringLiteral,
+    ArrayLiteral,
+    MapLiteral,
+    IdentifierLiteral,
+)
+
+from .resolver import Resolver
+from .symbols import Symbol, SymbolTable, GLOBALSCOPE, BUILTINSCOPE, FREESCOPE, FUNCTIONSCOPE
+
+
+# Main program instructions, constants and the size of the main register file
+RegisterBytecode = Tuple[RegInstructions, List[Object], int]
+Error = str
+
+INFIX_OPCODES = {
+    TokenType.PLUS: RegOpcode.ADD,
+    TokenType.MINUS: RegOpcode.SUB,
+    TokenType.ASTERISK: RegOpcode.MUL,
+    TokenType.SLASH: RegOpcode.DIV,
+    TokenType.EQ: RegOpcode.EQUAL,
+    TokenType.NOT_EQ: RegOpcode.NOTEQUAL,
+    TokenType.GT: RegOpcode.GREATERTHAN,
+    TokenType.LBRACKET: RegOpcode.INDEX,
+}
+
+
+class RegisterScope:
+    def __init__(self, num_locals: int) -> None:
+        self.instructions: RegInstructions = []
+        # Locals live in the lowest registers, temporaries are allocated above them
+        self.next_register: int = num_locals
+        self.num_registers: int = num_locals
+
+
+class RegisterCompiler:
+    def __init__(self) -> None:
+        self.constants: List[Object] = []
+
+        self.symbol_table: SymbolTable = SymbolTable()
+        for i, builtin in enumerate(BUILTINS):
+            self.symbol_table.define_builtin(i, builtin.name)
+
+        self.scopes: List[RegisterScope] = [RegisterScope(0)]
+
+    def compile(self, ast: List[Statement]) -> Error | None:
+        Resolver(self.symbol_table).resolve(ast)
+        for statement in ast:
+            err = self._compile_statement(statement, True)
+            if err:
+                return err
+        return None
+
+    def bytecode(self) -> RegisterBytecode:
+        scope = self._current_scope()
+        return scope.instructions, self.constants, scope.num_registers
+
+    def _compile_statement(self, statement: Statement, top_level: bool) -> Error | None:
+        mark = self._current_scope().next_register
+        match statement:
+            case ExpressionStatement():
+                reg, err = self._compile_expression(statement.expr)
+                if err:
+                    return err
+                if top_level:
+                    self._emit(RegOpcode.RESULT, [reg])
+            case LetStatement():
+                symbol = statement.symbol
+                if symbol.scope == GLOBALSCOPE:
+                    reg, err = self._compile_expression(statement.expr)
+                    if err:
+                        return err
+                    self._emit(RegOpcode.SETGLOBAL, [symbol.index, reg])
+                    if top_level:
+                        self._emit(RegOpcode.RESULT, [reg])
+                else:
+                    _, err = self._compile_expression(statement.expr, symbol.index)
+                    if err:
+                        return err
+            case ReturnStatement():
+                reg, err = self._compile_expression(statement.expr)
+                if err:
+                    return err
+                self._emit(RegOpcode.RETURNVALUE, [reg])
+            case IndexAssignStatement():
+                registers: List[int] = []
+                for expression in (statement.collection, statement.index, statement.value):
+                    reg, err = self._compile_expression(expression)
+                    if err:
+                        return err
+                    registers.append(reg)
+                self._emit(RegOpcode.SETINDEX, registers)
+            case _:
+                return f"{statement} type not implemented."
+
+        self._current_scope().next_register = mark
+        return None
+
+    def _compile_block(self, block: Optional[BlockStatement], target: int) -> Error | None:
+        statements = block.statements if block else []
+        for i, statement in enumerate(statements):
+            if i == len(statements) - 1 and isinstance(statement, ExpressionStatement):
+                _, err = self._compile_expression(statement.expr, target)
+                return err
+            err = self._compile_statement(statement, False)
+            if err:
+                return err
+        if not statements or not isinstance(statements[-1], ReturnStatement):
+            self._emit(RegOpcode.LOADNULL, [target])
+        return None
+
+    def _compile_loop_body(self, body: BlockStatement) -> Error | None:
+        for statement in body.statements:
+            err = self._compile_statement(statement, False)
+            if err:
+                return err
+        return None
+
+    def _compile_expression(self, expression: Expression, dst: Optional[int] = None) -> Tuple[int, Error | None]:
+        scope = self._current_scope()
+        mark = scope.next_register
+        match expression:
+            case LiteralExpression():
+                return self._compile_literal(expression.literal, dst)
+            case PrefixExpression():
+                right, err = self._compile_expression(expression.right)
+                if err:
+                    return 0, err
+                match expression.operator.token_type:
+                    case TokenType.MINUS:
+                        op = RegOpcode.MINUS
+                    case TokenType.BANG:
+                        op = RegOpcode.BANG
+                    case _:
+                        return 0, f"Prefix for {expression.operator.token_type} not implemented."
+                scope.next_register = mark
+                target = self._target(dst)
+                self._emit(op, [target, right])
+                return target, None
+            case InfixExpression():
+                left_expr, right_expr = expression.left, expression.right
+                # Swap order of operands for <
+                if expression.operator.token_type == TokenType.LT:
+                    op = RegOpcode.GREATERTHAN
+                    left_expr, right_expr = right_expr, left_expr
+                elif expression.operator.token_type in INFIX_OPCODES:
+                    op = INFIX_OPCODES[expression.operator.token_type]
+                else:
+                    return 0, f"Infix for {expression.operator.token_type} not implemented."
+
+                left, err = self._compile_expression(left_expr)
+                if err:
+                    return 0, err
+                right, err = self._compile_expression(right_expr)
+                if err:
+                    return 0, err
+                scope.next_register = mark
+                target = self._target(dst)
+                self._emit(op, [target, left, right])
+                return target, None
+            case IfExpression():
+                cond, err = self._compile_expression(expression.condition)
+                if err:
+                    return 0, err
+                scope.next_register = mark
+                target = self._target(dst)
+                jumpcond_pos = self._emit(RegOpcode.JUMPCOND, [cond, 9999])
+                err = self._compile_block(expression.consequence, target)
+                if err:
+                    return 0, err
+                jump_pos = self._emit(RegOpcode.JUMP, [9999])
+                self._change_operands(jumpcond_pos, [cond, len(scope.instructions)])
+                err = self._compile_block(expression.alternative, target)
+                if err:
+                    return 0, err
+                self._change_operands(jump_pos, [len(scope.instructions)])
+                return target, None
+            case WhileExpression():
+                loop = len(scope.instructions)
+                cond, err = self._compile_expression(expression.condition)
+                if err:
+                    return 0, err
+                scope.next_register = mark
+                jumpcond_pos = self._emit(RegOpcode.JUMPCOND, [cond, 9999])
+                err = self._compile_loop_body(expression.body)
+                if err:
+                    return 0, err
+                self._emit(RegOpcode.JUMP, [loop])
+                self._change_operands(jumpcond_pos, [cond, len(scope.instructions)])
+                target = self._target(dst)
+                self._emit(RegOpcode.LOADNULL, [target])
+                return target, None
+            case ForExpression():
+                iterable, err = self._compile_expression(expression.iterable)
+                if err:
+                    return 0, err
+                scope.next_register = mark
+                # The iterator keeps its register for the whole loop
+                iterator = self._alloc()
+                self._emit(RegOpcode.ITER_INIT, [iterator, iterable])
+                symbol = expression.symbol
+                element = self._alloc() if symbol.scope == GLOBALSCOPE else symbol.index
+                next_pos = self._emit(RegOpcode.ITER_NEXT, [iterator, 9999, element])
+                if symbol.scope == GLOBALSCOPE:
+                    self._emit(RegOpcode.SETGLOBAL, [symbol.index, element])
+                err = self._compile_loop_body(expression.body)
+                if err:
+                    return 0, err
+                self._emit(RegOpcode.JUMP, [next_pos])
+                self._change_operands(next_pos, [iterator, len(scope.instructions), element])
+                scope.next_register = mark
+                target = self._target(dst)
+                self._emit(RegOpcode.LOADNULL, [target])
+                return target, None
+            case CallExpression():
+                # The callee and its arguments sit in consecutive registers
+                base = self._alloc()
+                _, err = self._compile_expression(expression.func, base)
+                if err:
+                    return 0, err
+                for arg in expression.args:
+                    _, err = self._compile_expression(arg, self._alloc())
+                    if err:
+                        return 0, err
+                scope.next_register = mark
+                target = self._target(dst)
+                self._emit(RegOpcode.CALL, [target, base, len(expression.args)])
+                return target, None
+        return 0, f"Expression {expression} not implemented"
+
+    def _compile_literal(self, literal: Literal, dst: Optional[int]) -> Tuple[int, Error | None]:
+        scope = self._current_scope()
+        mark = scope.next_register
+        match literal:
+            case IntLiteral():
+                target = self._target(dst)
+                self._emit(RegOpcode.LOADK, [target, self._add_constant(IntObject(literal.value))])
+            case StringLiteral():
+                target = self._target(dst)
+                self._emit(RegOpcode.LOADK, [target, self._add_constant(StringObject(literal.value))])
+            case BooleanLiteral():
+                target = self._target(dst)
+                self._emit(RegOpcode.LOADTRUE if literal.value else RegOpcode.LOADFALSE, [target])
+            case ArrayLiteral():
+                base = scope.next_register
+                for member in literal.members:
+                    _, err = self._compile_expression(member, self._alloc())
+                    if err:
+                        return 0, err
+                scope.next_register = mark
+                target = self._target(dst)
+                self._emit(RegOpcode.ARRAY, [target, base, len(literal.members)])
+            case MapLiteral():
+                base = scope.next_register
+                for pair in literal.pairs:
+                    _, err = self._compile_expression(pair[0], self._alloc())
+                    if err:
+                        return 0, err
+                    _, err = self._compile_expression(pair[1], self._alloc())
+                    if err:
+                        return 0, err
+                scope.next_register = mark
+                target = self._target(dst)
+                self._emit(RegOpcode.MAP, [target, base, len(literal.pairs)])
+            case IdentifierLiteral():
+                if literal.symbol is None:
+                    return 0, f"Cannot resolve identifier {literal.token.token_value}"
+                return self._load_symbol(literal.symbol, dst), None
+            case FunctionLiteral():
+                return self._compile_function(literal, dst)
+            case _:
+                return 0, f"Literal {literal} not implemented"
+        return target, None
+
+    def _compile_function(self, literal: FunctionLiteral, dst: Optional[int]) -> Tuple[int, Error | None]:
+        # Parameters and every let in the body each own a register
+        self._enter_scope(literal.num_locals)
+
+        statements = literal.body.statements
+        for i, statement in enumerate(statements):
+            if i == len(statements) - 1 and isinstance(statement, ExpressionStatement):
+                reg, err = self._compile_expression(statement.expr)
+                if err:
+                    return 0, err
+                self._emit(RegOpcode.RETURNVALUE, [reg])
+            else:
+                err = self._compile_statement(statement, False)
+                if err:
+                    return 0, err
+        if not statements or not isinstance(statements[-1], (ExpressionStatement, ReturnStatement)):
+            self._emit(RegOpcode.RETURN, [])
+
+        free_symbols = literal.free_symbols
+        scope = self._leave_scope()
+        func = RegisterFunctionObject(scope.instructions, scope.num_registers, len(literal.arguments), len(free_symbols))
+
+        if not free_symbols:
+            target = self._target(dst)
+            self._emit(RegOpcode.LOADK, [target, self._add_constant(ClosureObject(func, []))])
+            return target, None
+
+        mark = self._current_scope().next_register
+        for s in free_symbols:
+            self._load_symbol(s, self._alloc())
+        self._current_scope().next_register = mark
+        target = self._target(dst)
+        self._emit(RegOpcode.CLOSURE, [target, self._add_constant(func), mark])
+        return target, None
+
+    def _load_symbol(self, symbol: Symbol, dst: Optional[int]) -> int:
+        if symbol.scope == GLOBALSCOPE:
+            target = self._target(dst)
+            self._emit(RegOpcode.GETGLOBAL, [target, symbol.index])
+        elif symbol.scope == BUILTINSCOPE:
+            target = self._target(dst)
+            self._emit(RegOpcode.GETBUILTIN, [target, symbol.index])
+        elif symbol.scope == FREESCOPE:
+            target = self._target(dst)
+            self._emit(RegOpcode.GETFREE, [target, symbol.index])
+        elif symbol.scope == FUNCTIONSCOPE:
+            target = self._target(dst)
+            self._emit(RegOpcode.CURRENTCLOSURE, [target])
+        else:
+            # Locals already live in their own register
+            if dst is None or dst == symbol.index:
+                return symbol.index
+            target = dst
+            self._emit(RegOpcode.MOVE, [target, symbol.index])
+        return target
+
+    def _target(self, dst: Optional[int]) -> int:
+        if dst is not None:
+            return dst
+        return self._alloc()
+
+    def _alloc(self) -> int:
+        scope = self._current_scope()
+        register = scope.next_register
+        scope.next_register += 1
+        scope.num_registers = max(scope.num_registers, scope.next_register)
+        return register
+
+    def _add_constant(self, constant: Object) -> int:
+        self.constants.append(constant)
+        return len(self.constants) - 1
+
+    def _emit(self, op: RegOpcode, operands: List[int]) -> int:
+        instructions = self._current_scope().instructions
+        instructions.append(make_register(op, operands))
+        return len(instructions) - 1
+
+    def _change_operands(self, pos: int, operands: List[int]) -> None:
+        instructions = self._current_scope().instructions
+        instructions[pos] = make_register(instructions[pos][0], operands)
+
+    def _enter_scope(self, num_locals: int) -> None:
+        self.scopes.append(RegisterScope(num_locals))
+        self.symbol_table = SymbolTable(self.symbol_table)
+
+    def _leave_scope(self) -> RegisterScope:
+        self.symbol_table = self.symbol_table.outer
+        return self.scopes.pop()
+
+    def _current_scope(self) -> RegisterScope:
+        return self.scopes[-1]
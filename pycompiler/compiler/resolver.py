@@ -0,0 +1,134 @@
+from typing import List, Optional
+from pycompiler.lexer import TokenType
+from pycompiler.parser import (
+    Statement,
+    LetStatement,
+    ReturnStatement,
+    ExpressionStatement,
+    ImportStatement,
+    IndexAssignStatement,
+    Expression,
+    LiteralExpression,
+    InfixExpression,
+    PrefixExpression,
+    IfExpression,
+    WhileExpression,
+    ForExpression,
+    CallExpression,
+    FunctionLiteral,
+    ArrayLiteral,
+    MapLiteral,
+    IdentifierLiteral,
+)
+
+from .symbols import Symbol, SymbolTable, GLOBALSCOPE, LOCALSCOPE, BUILTINSCOPE
+
+
+class Resolver:
+    def __init__(self, symbol_table: SymbolTable) -> None:
+        self.symbol_table: SymbolTable = symbol_table
+        # Loops entered in the current function
+        self.loop_depth: int = 0
+
+    def resolve(self, ast: List[Statement]) -> None:
+        # Visits names in the order code generation emits them, so free variable indices match
+        for statement in ast:
+            self._statement(statement)
+
+    def lookup(self, name: str) -> Optional[Symbol]:
+        missing: List[SymbolTable] = []
+        table: Optional[SymbolTable] = self.symbol_table
+        symbol: Optional[Symbol] = None
+        while table is not None:
+            symbol = table.store.get(name)
+            if symbol is not None:
+                break
+            missing.append(table)
+            table = table.outer
+        if symbol is None or symbol.scope in (GLOBALSCOPE, BUILTINSCOPE):
+            return symbol
+        # Every function between the use and the definition captures the name
+        for table in reversed(missing):
+            symbol = table.define_free(symbol)
+        return symbol
+
+    def define(self, name: str) -> Symbol:
+        # Inside a loop a let assigns the binding it repeats, otherwise nothing would ever change between iterations
+        if self.loop_depth > 0:
+            symbol = self.symbol_table.store.get(name)
+            if symbol is not None and symbol.scope in (GLOBALSCOPE, LOCALSCOPE):
+                return symbol
+        return self.symbol_table.define(name)
+
+    def _statement(self, statement: Statement) -> None:
+        match statement:
+            case LetStatement():
+                statement.symbol = self.define(statement.ident.token_value)
+                self._expression(statement.expr)
+            case ReturnStatement() | ExpressionStatement():
+                self._expression(statement.expr)
+            case ImportStatement():
+                statement.symbols = [self.symbol_table.define(name) for name in statement.names or []]
+            case IndexAssignStatement():
+                self._expression(statement.collection)
+                self._expression(statement.index)
+                self._expression(statement.value)
+
+    def _expression(self, expression: Expression) -> None:
+        match expression:
+            case LiteralExpression():
+                self._literal(expression)
+            case PrefixExpression():
+                self._expression(expression.right)
+            case InfixExpression():
+                if expression.operator.token_type == TokenType.LT:
+                    self._expression(expression.right)
+                    self._expression(expression.left)
+                else:
+                    self._expression(expression.left)
+                    self._expression(expression.right)
+            case IfExpression():
+                self._expression(expression.condition)
+                self.resolve(expression.consequence.statements)
+                if expression.alternative:
+                    self.resolve(expression.alternative.statements)
+            case WhileExpression():
+                self.loop_depth += 1
+                self._expression(expression.condition)
+                self.resolve(expression.body.statements)
+                self.loop_depth -= 1
+            case ForExpression():
+                self._expression(expression.iterable)
+                self.loop_depth += 1
+                expression.symbol = self.define(expression.ident.token_value)
+                self.resolve(expression.body.statements)
+                self.loop_depth -= 1
+            case CallExpression():
+                self._expression(expression.func)
+                for arg in expression.args:
+                    self._expression(arg)
+
+    def _literal(self, expression: LiteralExpression) -> None:
+        literal = expression.literal
+        match literal:
+            case ArrayLiteral():
+                for member in literal.members:
+                    self._expression(member)
+            case MapLiteral():
+                for key, value in literal.pairs:
+                    self._expression(key)
+                    self._expression(value)
+            case IdentifierLiteral():
+                literal.symbol = self.lookup(literal.token.token_value)
+            case FunctionLiteral():
+                loop_depth, self.loop_depth = self.loop_depth, 0
+                self.symbol_table = SymbolTable(self.symbol_table)
+                for arg in literal.arguments:
+                    self.symbol_table.define(arg.token_value)
+                if literal.name:
+                    self.symbol_table.define_function_name(literal.name)
+                self.resolve(literal.body.statements)
+                literal.free_symbols = self.symbol_table.free_symbols
+                literal.num_locals = self.symbol_table.num_defs
+                self.symbol_table = self.symbol_table.outer
+                self.loop_depth = loop_depth
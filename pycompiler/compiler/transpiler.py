@@ -0,0 +1,563 @@
+import ast as py
+import warnings
+from types import CodeType
+from typing import List, Tuple, Set, Optional, Callable
+from pycompiler.lexer import TokenType
+from pycompiler.objects import BUILTINS
+from pycompiler.parser import (
+    Statement,
+    LetStatement,
+    ReturnStatement,
+    ExpressionStatement,
+    ImportStatement,
+    IndexAssignStatement,
+    Expression,
+    LiteralExpression,
+    InfixExpression,
+    PrefixExpression,
+    IfExpression,
+    WhileExpression,
+    ForExpression,
+    CallExpression,
+    Literal,
+    IntLiteral,
+    FunctionLiteral,
+    BooleanLiteral,
+    StringLiteral,
+    ArrayLiteral,
+    MapLiteral,
+    IdentifierLiteral,
+)
+
+from .resolver import Resolver
+from .symbols import Symbol, SymbolTable, GLOBALSCOPE, BUILTINSCOPE, FREESCOPE, FUNCTIONSCOPE
+
+
+# A code object whose execution defines main(), which runs the program and returns its last value
+NativeBytecode = CodeType
+Error = str
+
+# Destination of a block's value: a temporary's name, RETURN_VALUE, or None to drop it
+RETURN_VALUE = "return"
+
+# Python operator for the integer fast path and the runtime helper for everything else
+NATIVE_ARITHMETIC = {
+    TokenType.PLUS: (py.Add, "native_add"),
+    TokenType.MINUS: (py.Sub, "native_sub"),
+    TokenType.ASTERISK: (py.Mult, "native_mul"),
+    TokenType.SLASH: (py.FloorDiv, "native_div"),
+}
+
+NATIVE_COMPARISON = {
+    TokenType.EQ: (py.Eq, "native_equal"),
+    TokenType.NOT_EQ: (py.NotEq, "native_not_equal"),
+    TokenType.GT: (py.Gt, "native_greater_than"),
+}
+
+
+def _name(id: str) -> py.Name:
+    return py.Name(id, py.Load())
+
+
+def _store(id: str) -> py.Name:
+    return py.Name(id, py.Store())
+
+
+def _call(func: str, args: List[py.expr]) -> py.Call:
+    return py.Call(_name(func), args, [])
+
+
+def _type_is(value: py.expr, type_name: str) -> py.Compare:
+    return py.Compare(_call("type", [value]), [py.Is()], [_name(type_name)])
+
+
+def _all(checks: List[py.expr]) -> py.expr:
+    if len(checks) == 1:
+        return checks[0]
+    return py.BoolOp(py.And(), checks)
+
+
+def _is_simple(value: py.expr) -> bool:
+    # Reading it again costs nothing and cannot observe anything the first read did not
+    return isinstance(value, (py.Name, py.Constant))
+
+
+def _is_int_constant(value: py.expr) -> bool:
+    return isinstance(value, py.Constant) and type(value.value) is int
+
+
+class PythonScope:
+    def __init__(self, function_name: str) -> None:
+        # Statements of whatever is being lowered, swapped out for arms and operands
+        self.body: List[py.stmt] = []
+        self.function_name: str = function_name
+        self.temps: int = 0
+
+
+class Transpiler:
+    def __init__(self) -> None:
+        self.symbol_table: SymbolTable = SymbolTable()
+        for i, builtin in enumerate(BUILTINS):
+            self.symbol_table.define_builtin(i, builtin.name)
+
+        self.scopes: List[PythonScope] = [PythonScope("main")]
+        # Every function definition, hoisted into main so they only close over each other
+        self.functions: List[py.stmt] = []
+        self.function_count: int = 0
+        self.assigned_globals: Set[str] = set()
+        self.module: Optional[py.Module] = None
+        self.code: Optional[NativeBytecode] = None
+
+    def compile(self, ast: List[Statement]) -> Error | None:
+        first_global = self.symbol_table.num_defs
+        Resolver(self.symbol_table).resolve(ast)
+        # Globals read before their let see the same placeholder the VM starts with
+        for index in range(first_global, self.symbol_table.num_defs):
+            self._emit(py.Assign([_store(self._global(index))], _name("native_unset")))
+
+        for i, statement in enumerate(ast):
+            if i == len(ast) - 1:
+                err = self._result_statement(statement)
+            else:
+                err = self._statement(statement)
+            if err:
+                return err
+        if not ast:
+            self._emit(py.Return(_name("native_unset")))
+
+        body: List[py.stmt] = []
+        if self.assigned_globals:
+            body.append(py.Global(sorted(self.assigned_globals)))
+        body += self.functions + self._current_scope().body
+        self.module = py.Module([self._function_def("main", [], body)], [])
+        py.fix_missing_locations(self.module)
+        with warnings.catch_warnings():
+            # Calling a constant is a runtime error in Monkey, not something to warn about here
+            warnings.simplefilter("ignore", SyntaxWarning)
+            self.code = compile(self.module, "<monkey>", "exec")
+        return None
+
+    def bytecode(self) -> NativeBytecode:
+        return self.code
+
+    def source(self) -> str:
+        return py.unparse(self.module)
+
+    def _result_statement(self, statement: Statement) -> Error | None:
+        # The last top-level statement hands back what the VM would leave as last popped
+        match statement:
+            case ExpressionStatement():
+                return self._value_to(statement.expr, RETURN_VALUE)
+            case LetStatement():
+                err = self._statement(statement)
+                if err:
+                    return err
+                self._emit(py.Return(_name(self._symbol_name(statement.symbol))))
+            case IndexAssignStatement():
+                collection, err = self._index_assign(statement)
+                if err:
+                    return err
+                self._emit(py.Return(collection))
+            case _:
+                return self._statement(statement)
+        return None
+
+    def _statement(self, statement: Statement) -> Error | None:
+        match statement:
+            case LetStatement():
+                value, err = self._expression(statement.expr)
+                if err:
+                    return err
+                self._emit(py.Assign([self._store_symbol(statement.symbol)], value))
+            case ReturnStatement():
+                value, err = self._expression(statement.expr)
+                if err:
+                    return err
+                self._emit(py.Return(value))
+            case ExpressionStatement():
+                return self._value_to(statement.expr, None)
+            case IndexAssignStatement():
+                _, err = self._index_assign(statement)
+                return err
+            case ImportStatement():
+                return f"import {statement.path} is not supported by the native backend"
+            case _:
+                return f"{statement} type not implemented."
+        return None
+
+    def _block(self, statements: List[Statement], dest: Optional[str]) -> Error | None:
+        # A block evaluates to its last expression, or null when it ends with anything else
+        for i, statement in enumerate(statements):
+            if i == len(statements) - 1 and isinstance(statement, ExpressionStatement):
+                return self._value_to(statement.expr, dest)
+            err = self._statement(statement)
+            if err:
+                return err
+        if not statements or not isinstance(statements[-1], ReturnStatement):
+            self._deliver(py.Constant(None), dest)
+        return None
+
+    def _lower_block(self, statements: List[Statement], dest: Optional[str]) -> Tuple[List[py.stmt], Error | None]:
+        scope = self._current_scope()
+        outer, scope.body = scope.body, []
+        err = self._block(statements, dest)
+        lowered, scope.body = scope.body, outer
+        return lowered, err
+
+    def _value_to(self, expression: Expression, dest: Optional[str]) -> Error | None:
+        match expression:
+            case IfExpression():
+                # Each arm delivers its own value, so no temporary is needed
+                condition, err = self._expression(expression.condition)
+                if err:
+                    return err
+                consequence, err = self._lower_block(expression.consequence.statements, dest)
+                if err:
+                    return err
+                alternative_statements = expression.alternative.statements if expression.alternative else []
+                alternative, err = self._lower_block(alternative_statements, dest)
+                if err:
+                    return err
+                self._emit(py.If(condition, consequence or [py.Pass()], alternative))
+            case WhileExpression() | ForExpression():
+                err = self._loop(expression)
+                if err:
+                    return err
+                self._deliver(py.Constant(None), dest)
+            case _:
+                value, err = self._expression(expression)
+                if err:
+                    return err
+                self._deliver(value, dest)
+        return None
+
+    def _deliver(self, value: py.expr, dest: Optional[str]) -> None:
+        if dest is None:
+            if not _is_simple(value):
+                self._emit(py.Expr(value))
+        elif dest == RETURN_VALUE:
+            self._emit(py.Return(value))
+        else:
+            self._emit(py.Assign([_store(dest)], value))
+
+    def _loop(self, expression: WhileExpression | ForExpression) -> Error | None:
+        scope = self._current_scope()
+        if isinstance(expression, WhileExpression):
+            outer, scope.body = scope.body, []
+            condition, err = self._expression(expression.condition)
+            if err:
+                return err
+            prelude, scope.body = scope.body, []
+            for statement in expression.body.statements:
+                err = self._statement(statement)
+                if err:
+                    return err
+            body, scope.body = scope.body, outer
+            if prelude:
+                # The condition needs statements of its own, so it is checked at the top of the body
+                stop = py.If(py.UnaryOp(py.Not(), condition), [py.Break()], [])
+                self._emit(py.While(py.Constant(True), prelude + [stop] + body, []))
+            else:
+                self._emit(py.While(condition, body or [py.Pass()], []))
+            return None
+
+        iterable, err = self._expression(expression.iterable)
+        if err:
+            return err
+        outer, scope.body = scope.body, []
+        for statement in expression.body.statements:
+            err = self._statement(statement)
+            if err:
+                return err
+        body, scope.body = scope.body, outer
+        # A list iterator walks the live list by index, as ITER_NEXT does
+        iterator = _call("native_iterate", [iterable])
+        self._emit(py.For(self._store_symbol(expression.symbol), iterator, body or [py.Pass()], []))
+        return None
+
+    def _index_assign(self, statement: IndexAssignStatement) -> Tuple[py.expr, Error | None]:
+        values, err = self._operands([statement.collection, statement.index, statement.value])
+        if err:
+            return _name("native_unset"), err
+        collection, index, value = [self._spill(value) for value in values]
+        checks: List[py.expr] = [_type_is(collection, "list")]
+        if not _is_int_constant(index):
+            checks.append(_type_is(index, "int"))
+        checks.append(py.Compare(py.Constant(0), [py.LtE(), py.Lt()], [index, _call("len", [collection])]))
+        fast = py.Assign([py.Subscript(collection, index, py.Store())], value)
+        slow = py.Expr(_call("native_set_index", [collection, index, value]))
+        self._emit(py.If(_all(checks), [fast], [slow]))
+        return collection, None
+
+    def _operands(self, expressions: List[Expression]) -> Tuple[List[py.expr], Error | None]:
+        # Statements needed by a later operand must not run before the earlier operands are evaluated
+        scope = self._current_scope()
+        outer = scope.body
+        lowered: List[Tuple[List[py.stmt], py.expr]] = []
+        for expression in expressions:
+            scope.body = []
+            value, err = self._expression(expression)
+            if err:
+                scope.body = outer
+                return [], err
+            lowered.append((scope.body, value))
+        scope.body = outer
+
+        values: List[py.expr] = []
+        for i, (statements, value) in enumerate(lowered):
+            scope.body.extend(statements)
+            if not isinstance(value, py.Constant) and any(later for later, _ in lowered[i + 1 :]):
+                value = self._spill(value, True)
+            values.append(value)
+        return values, None
+
+    def _expression(self, expression: Expression) -> Tuple[py.expr, Error | None]:
+        match expression:
+            case LiteralExpression():
+                return self._literal(expression.literal)
+            case PrefixExpression():
+                right, err = self._expression(expression.right)
+                if err:
+                    return right, err
+                match expression.operator.token_type:
+                    case TokenType.MINUS:
+                        if expression.int_operands:
+                            return py.UnaryOp(py.USub(), right), None
+                        return self._guarded([right], lambda v: py.UnaryOp(py.USub(), v), "native_minus"), None
+                    case TokenType.BANG:
+                        # Python's truthiness of the native values is is_truthy
+                        return py.UnaryOp(py.Not(), right), None
+                return right, f"Prefix for {expression.operator.token_type} not implemented."
+            case InfixExpression():
+                return self._infix(expression)
+            case IfExpression():
+                return self._if_value(expression)
+            case WhileExpression() | ForExpression():
+                err = self._loop(expression)
+                return py.Constant(None), err
+            case CallExpression():
+                values, err = self._operands([expression.func] + expression.args)
+                if err:
+                    return py.Constant(None), err
+                func, args = values[0], values[1:]
+                if self._is_builtin(expression.func, "len") and len(args) == 1:
+                    return self._guarded_len(args[0], func), None
+                return py.Call(func, args, []), None
+        return py.Constant(None), f"Expression {expression} not implemented"
+
+    def _infix(self, expression: InfixExpression) -> Tuple[py.expr, Error | None]:
+        token_type = expression.operator.token_type
+        # < evaluates its right operand first, the compiler swaps it into a >
+        swapped = token_type == TokenType.LT
+        order = [expression.right, expression.left] if swapped else [expression.left, expression.right]
+        operands, err = self._operands(order)
+        if err:
+            return py.Constant(None), err
+
+        if token_type == TokenType.LBRACKET:
+            return self._guarded_index(*operands), None
+        if token_type in NATIVE_ARITHMETIC:
+            op, helper = NATIVE_ARITHMETIC[token_type]
+            build = lambda left, right: py.BinOp(left, op(), right)
+        elif swapped:
+            helper = "native_greater_than"
+            build = lambda right, left: py.Compare(left, [py.Lt()], [right])
+        elif token_type in NATIVE_COMPARISON:
+            op, helper = NATIVE_COMPARISON[token_type]
+            build = lambda left, right: py.Compare(left, [op()], [right])
+        else:
+            return py.Constant(None), f"Infix for {token_type} not implemented."
+
+        if expression.int_operands:
+            return build(*operands), None
+        return self._guarded(operands, build, helper), None
+
+    def _guarded(self, operands: List[py.expr], fast: Callable[..., py.expr], helper: str) -> py.expr:
+        # Integers take the Python operator, anything else goes through the runtime helper
+        if any(isinstance(operand, py.Constant) and not _is_int_constant(operand) for operand in operands):
+            return _call(helper, operands)
+        checked: List[py.expr] = []
+        uses: List[py.expr] = []
+        for operand in operands:
+            if _is_int_constant(operand):
+                uses.append(operand)
+                continue
+            if _is_simple(operand):
+                checked.append(_call("type", [operand]))
+                uses.append(operand)
+                continue
+            temp = self._temp()
+            checked.append(_call("type", [py.NamedExpr(_store(temp), operand)]))
+            uses.append(_name(temp))
+        slow = _call(helper, uses)
+        if not checked:
+            return fast(*uses)
+        # A chain of is evaluates every operand before it can stop early
+        test = py.Compare(checked[0], [py.Is()] * len(checked), checked[1:] + [_name("int")])
+        return py.IfExp(test, fast(*uses), slow)
+
+    def _guarded_index(self, collection: py.expr, index: py.expr) -> py.expr:
+        if isinstance(index, py.Constant) and type(index.value) is str and _is_simple(collection):
+            get = py.Call(py.Attribute(collection, "get", py.Load()), [index], [])
+            return py.IfExp(_type_is(collection, "dict"), get, _call("native_index", [collection, index]))
+        if not _is_simple(collection) and not _is_simple(index):
+            return _call("native_index", [collection, index])
+        # The operand that still has to be evaluated is tested first so the fallback always sees it
+        collection_use, index_use = collection, index
+        checks: List[py.expr] = []
+        if not _is_simple(collection):
+            temp = self._temp()
+            checks.append(_type_is(py.NamedExpr(_store(temp), collection), "list"))
+            collection_use = _name(temp)
+        if not _is_simple(index):
+            temp = self._temp()
+            checks.append(_type_is(py.NamedExpr(_store(temp), index), "int"))
+            index_use = _name(temp)
+        if _is_simple(collection):
+            checks.append(_type_is(collection, "list"))
+        if _is_simple(index) and not _is_int_constant(index):
+            checks.append(_type_is(index, "int"))
+
+        in_range = py.Compare(py.Constant(0), [py.LtE(), py.Lt()], [index_use, _call("len", [collection_use])])
+        element = py.Subscript(collection_use, index_use, py.Load())
+        fast = py.IfExp(in_range, element, py.Constant(None))
+        slow = _call("native_index", [collection_use, index_use])
+        return py.IfExp(_all(checks), fast, slow)
+
+    def _guarded_len(self, arg: py.expr, func: py.expr) -> py.expr:
+        use = arg
+        if not _is_simple(arg):
+            temp = self._temp()
+            arg, use = py.NamedExpr(_store(temp), arg), _name(temp)
+        return py.IfExp(_type_is(arg, "list"), _call("len", [use]), py.Call(func, [use], []))
+
+    def _if_value(self, expression: IfExpression) -> Tuple[py.expr, Error | None]:
+        condition, err = self._expression(expression.condition)
+        if err:
+            return condition, err
+        temp = self._temp()
+        consequence, err = self._lower_block(expression.consequence.statements, temp)
+        if err:
+            return condition, err
+        alternative_statements = expression.alternative.statements if expression.alternative else []
+        alternative, err = self._lower_block(alternative_statements, temp)
+        if err:
+            return condition, err
+        # Arms that are a single value become a conditional expression
+        arms = [consequence, alternative]
+        if all(len(arm) == 1 and isinstance(arm[0], py.Assign) for arm in arms):
+            return py.IfExp(condition, consequence[0].value, alternative[0].value), None
+        self._emit(py.If(condition, consequence, alternative))
+        return _name(temp), None
+
+    def _literal(self, literal: Literal) -> Tuple[py.expr, Error | None]:
+        match literal:
+            case IntLiteral() | StringLiteral() | BooleanLiteral():
+                return py.Constant(literal.value), None
+            case ArrayLiteral():
+                members, err = self._operands(literal.members)
+                return py.List(members, py.Load()), err
+            case MapLiteral():
+                values, err = self._operands([e for pair in literal.pairs for e in pair])
+                if err:
+                    return py.Constant(None), err
+                keys: List[py.expr] = []
+                for key in values[0::2]:
+                    # Only ints and strings can be keys, anything else is checked when it is built
+                    if isinstance(key, py.Constant) and type(key.value) in (int, str):
+                        keys.append(key)
+                    else:
+                        keys.append(_call("native_key", [key]))
+                return py.Dict(keys, values[1::2]), None
+            case IdentifierLiteral():
+                if literal.symbol is None:
+                    return py.Constant(None), f"Cannot resolve identifier {literal.token.token_value}"
+                return _name(self._symbol_name(literal.symbol)), None
+            case FunctionLiteral():
+                return self._function(literal)
+        return py.Constant(None), f"Literal {literal} not implemented"
+
+    def _function(self, literal: FunctionLiteral) -> Tuple[py.expr, Error | None]:
+        number = self.function_count
+        self.function_count += 1
+        name = f"fn{number}"
+        self.scopes.append(PythonScope(name))
+        num_args = len(literal.arguments)
+        params = [f"l{i}" for i in range(num_args)]
+        # Missing and extra arguments are caught here, so the message matches the VM's
+        mismatch: py.expr = _name("extra")
+        if params:
+            missing = py.Compare(_name(params[-1]), [py.Is()], [_name("native_missing")])
+            mismatch = py.BoolOp(py.Or(), [mismatch, missing])
+        check = py.Expr(_call("native_wrong_args", [py.Constant(num_args), _name("extra")] + [_name(p) for p in params]))
+        self._emit(py.If(mismatch, [check], []))
+        err = self._block(literal.body.statements, RETURN_VALUE)
+        scope = self.scopes.pop()
+        if err:
+            return py.Constant(None), err
+
+        func = self._function_def(name, params, scope.body)
+        if not literal.free_symbols:
+            # Nothing to capture, so every evaluation can share one function
+            self.functions.append(func)
+            return _name(name), None
+
+        # Captured values are fixed when the closure is created, so they are passed to a factory
+        factory = f"mk{number}"
+        free_params = [f"f{i}" for i in range(len(literal.free_symbols))]
+        self.functions.append(self._function_def(factory, free_params, [func, py.Return(_name(name))], False))
+        free_values: List[py.expr] = [_name(self._symbol_name(s)) for s in literal.free_symbols]
+        return _call(factory, free_values), None
+
+    def _function_def(self, name: str, params: List[str], body: List[py.stmt], checked: bool = True) -> py.FunctionDef:
+        if name == "main" or not checked:
+            arguments = py.arguments([], [py.arg(p) for p in params], None, [], [], None, [])
+        else:
+            defaults: List[py.expr] = [_name("native_missing") for _ in params]
+            arguments = py.arguments([], [py.arg(p) for p in params], py.arg("extra"), [], [], None, defaults)
+        return py.FunctionDef(name, arguments, body or [py.Pass()], [], None)
+
+    def _is_builtin(self, func: Expression, name: str) -> bool:
+        if not isinstance(func, LiteralExpression) or not isinstance(func.literal, IdentifierLiteral):
+            return False
+        symbol = func.literal.symbol
+        return symbol is not None and symbol.scope == BUILTINSCOPE and symbol.name == name
+
+    def _symbol_name(self, symbol: Symbol) -> str:
+        # Builtins are bound in the runtime namespace under the same b prefix
+        if symbol.scope == GLOBALSCOPE:
+            return self._global(symbol.index)
+        elif symbol.scope == BUILTINSCOPE:
+            return f"b{symbol.index}"
+        elif symbol.scope == FREESCOPE:
+            return f"f{symbol.index}"
+        elif symbol.scope == FUNCTIONSCOPE:
+            return self._current_scope().function_name
+        return f"l{symbol.index}"
+
+    def _store_symbol(self, symbol: Symbol) -> py.Name:
+        return _store(self._symbol_name(symbol))
+
+    def _global(self, index: int) -> str:
+        # main declares every global it touches, functions only ever read them
+        name = f"g{index}"
+        self.assigned_globals.add(name)
+        return name
+
+    def _spill(self, value: py.expr, force: bool = False) -> py.expr:
+        if not force and _is_simple(value):
+            return value
+        temp = self._temp()
+        self._emit(py.Assign([_store(temp)], value))
+        return _name(temp)
+
+    def _temp(self) -> str:
+        scope = self._current_scope()
+        scope.temps += 1
+        return f"t{scope.temps - 1}"
+
+    def _emit(self, statement: py.stmt) -> None:
+        self._current_scope().body.append(statement)
+
+    def _current_scope(self) -> PythonScope:
+        return self.scopes[-1]
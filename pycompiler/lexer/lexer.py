@@ -45,6 +45,10 @@ class TokenType(Enum):
     IF = "if"
     ELSE = "else"
     RETURN = "return"
+    IMPORT = "import"
+    WHILE = "while"
+    FOR = "for"
+    IN = "in"
 
 
 class Token:
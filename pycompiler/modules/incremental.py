@@ -0,0 +1,98 @@
+import hashlib
+from typing import List, Dict, Tuple, Optional
+from pycompiler.parser import Statement
+from pycompiler.compiler import Compiler, Bytecode, SymbolTable, Symbol, GLOBALSCOPE
+from pycompiler.code import Instructions, JUMP_OPCODES, Assembler, decode, encode
+from pycompiler.objects import Object
+from pycompiler.optimizer import PassManager, map_functions, identifier_names, let_names
+
+from .modules import relocate_operands
+
+Error = str
+
+
+class CompiledStatement:
+    def __init__(self, instructions: Instructions, constants: List[Object], symbols: Dict[str, Symbol], num_defs: int):
+        self.instructions: Instructions = instructions
+        # Numbered from zero, moved up when the statement is spliced in
+        self.constants: List[Object] = constants
+        # Globals the statement defines and how many slots they took
+        self.symbols: Dict[str, Symbol] = symbols
+        self.num_defs: int = num_defs
+
+
+class IncrementalCompiler:
+    def __init__(self, opt_level: int = 0) -> None:
+        # AST passes only ever see one statement, so nothing is inlined or shared across statements
+        self.pass_manager: PassManager = PassManager(opt_level)
+        self.symbol_table: SymbolTable = Compiler().symbol_table
+        self.statements: Dict[str, CompiledStatement] = {}
+        self.compiled: int = 0
+        self.reused: int = 0
+
+    def compile(self, ast: List[Statement]) -> Tuple[Optional[Bytecode], Error | None]:
+        # Every compile starts from a fresh global layout, entries unused by it are dropped
+        self.symbol_table = Compiler().symbol_table
+        used: Dict[str, CompiledStatement] = {}
+        compiled: List[CompiledStatement] = []
+        for statement in ast:
+            key = self._key(statement)
+            entry = self.statements.get(key) or used.get(key)
+            if entry is None:
+                entry, err = self._compile_statement(statement)
+                if err:
+                    # Keep what did compile for the corrected resubmit
+                    self.statements.update(used)
+                    return None, err
+                self.compiled += 1
+            else:
+                self.symbol_table.store.update(entry.symbols)
+                self.symbol_table.num_defs += entry.num_defs
+                self.reused += 1
+            used[key] = entry
+            compiled.append(entry)
+        self.statements = used
+        return self._splice(compiled), None
+
+    def _key(self, statement: Statement) -> str:
+        # The statement plus everything its code was generated against
+        digest = hashlib.sha256()
+        digest.update(f"{self.symbol_table.num_defs}\0{statement!r}\0".encode())
+        # A let inside a loop assigns an existing global instead of defining one
+        for name in sorted(identifier_names(statement) | let_names([statement])):
+            symbol = self.symbol_table.store.get(name)
+            digest.update(f"{name}={symbol!r}\0".encode())
+        return digest.hexdigest()
+
+    def _compile_statement(self, statement: Statement) -> Tuple[Optional[CompiledStatement], Error | None]:
+        compiler = Compiler()
+        compiler.symbol_table = self.symbol_table
+        before = self.symbol_table.num_defs
+        bytecode, err = self.pass_manager.compile([statement], compiler)
+        if err:
+            return None, err
+        symbols = {
+            name: symbol
+            for name, symbol in self.symbol_table.store.items()
+            if symbol.scope == GLOBALSCOPE and symbol.index >= before
+        }
+        return CompiledStatement(bytecode[0], bytecode[1], symbols, self.symbol_table.num_defs - before), None
+
+    def _splice(self, compiled: List[CompiledStatement]) -> Bytecode:
+        assembler = Assembler()
+        constants: List[Object] = []
+        for entry in compiled:
+            constant_base = len(constants)
+            constants.extend(
+                map_functions(
+                    entry.constants, lambda ins: encode(relocate_operands(decode(ins), None, constant_base))
+                )
+            )
+            # Falling off the end of a statement continues with the next one
+            end = assembler.label()
+            for ins in relocate_operands(decode(entry.instructions), None, constant_base):
+                if ins.op in JUMP_OPCODES and ins.target is None:
+                    ins.target = end
+                assembler.instructions.append(ins)
+            assembler.bind(end)
+        return assembler.assemble(), constants
@@ -0,0 +1,257 @@
+import os
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Tuple, Optional
+from pycompiler.lexer import Lexer, TokenType
+from pycompiler.parser import Parser, Statement, ImportStatement, UnexpectedTokenError
+from pycompiler.compiler import Compiler, Bytecode, GLOBALSCOPE
+from pycompiler.code import Instructions, Opcode, JUMP_OPCODES, Ins, Assembler, decode, encode
+from pycompiler.objects import Object
+from pycompiler.optimizer import PassManager, map_functions, let_names
+from pycompiler.cache import BytecodeCache
+from pycompiler.vm import GLOBALS_SIZE
+
+Error = str
+
+# Module path and exported names for every import string of a module
+ResolvedImports = Dict[str, Tuple[str, List[str]]]
+
+
+class CompiledUnit:
+    def __init__(
+        self,
+        path: str,
+        instructions: Instructions,
+        constants: List[Object],
+        num_globals: int,
+        exports: Dict[str, int],
+        imports: List[Tuple[str, str, int]],
+    ) -> None:
+        self.path: str = path
+        self.instructions: Instructions = instructions
+        self.constants: List[Object] = constants
+        # Globals and constants are numbered from zero within the unit until it is linked
+        self.num_globals: int = num_globals
+        self.exports: Dict[str, int] = exports
+        # (module path, name, global index) of every slot that is bound by an import
+        self.imports: List[Tuple[str, str, int]] = imports
+
+
+def scan_imports(source: str) -> List[str]:
+    # Import strings in the order they appear, found without parsing
+    if TokenType.IMPORT.value not in source:
+        return []
+    paths: List[str] = []
+    lexer = Lexer(source)
+    previous: Optional[TokenType] = None
+    while True:
+        token = lexer.next_token()
+        if token.token_type == TokenType.EOF:
+            return paths
+        if previous == TokenType.IMPORT and token.token_type == TokenType.STRING:
+            paths.append(token.token_value)
+        previous = token.token_type
+
+
+def resolve_path(importer: str, path: str) -> str:
+    return os.path.normpath(os.path.join(os.path.dirname(importer), path))
+
+
+def compile_unit(path: str, source: str, resolved: ResolvedImports, opt_level: int) -> Tuple[Optional[CompiledUnit], Error | None]:
+    try:
+        ast: List[Statement] = Parser(Lexer(source)).parse()
+    except UnexpectedTokenError as e:
+        return None, f"{path}: {e}"
+
+    # A module exports its own top-level bindings, not the ones it imported
+    own: List[str] = sorted(let_names(ast))
+    for statement in ast:
+        if isinstance(statement, ImportStatement) and statement.path in resolved:
+            statement.names = resolved[statement.path][1]
+
+    compiler = Compiler()
+    bytecode, err = PassManager(opt_level).compile(ast, compiler)
+    if err:
+        return None, f"{path}: {err}"
+
+    store = compiler.symbol_table.store
+    exports = {name: store[name].index for name in own if store[name].scope == GLOBALSCOPE}
+    imports = [(resolved[literal][0], name, index) for literal, name, index in compiler.imports]
+    return CompiledUnit(path, bytecode[0], bytecode[1], compiler.symbol_table.num_defs, exports, imports), None
+
+
+def relocate_operands(decoded: List[Ins], globals_map: Optional[Dict[int, int]], constant_base: int) -> List[Ins]:
+    # Without a globals_map global slots are left as they are
+    for ins in decoded:
+        if ins.op in (Opcode.GETGLOBAL, Opcode.SETGLOBAL) and globals_map is not None:
+            ins.operands = [globals_map[ins.operands[0]]]
+        elif ins.op == Opcode.CONSTANT:
+            ins.operands = [ins.operands[0] + constant_base]
+        elif ins.op == Opcode.CLOSURE:
+            ins.operands = [ins.operands[0] + constant_base, ins.operands[1]]
+    return decoded
+
+
+def link(units: List[CompiledUnit]) -> Tuple[Optional[Bytecode], Error | None]:
+    # units must come after everything they import, the last one runs last
+    assembler = Assembler()
+    constants: List[Object] = []
+    global_bases: Dict[str, int] = {}
+    placed: Dict[str, CompiledUnit] = {}
+    global_base: int = 0
+
+    for unit in units:
+        globals_map: Dict[int, int] = {}
+        for path, name, index in unit.imports:
+            if path not in placed:
+                return None, f"{unit.path}: module {path} is not linked before it"
+            if name not in placed[path].exports:
+                return None, f"{unit.path}: module {path} has no export {name}"
+            globals_map[index] = global_bases[path] + placed[path].exports[name]
+        for index in range(unit.num_globals):
+            globals_map.setdefault(index, global_base + index)
+        constant_base = len(constants)
+
+        def relocate(instructions: Instructions) -> Instructions:
+            return encode(relocate_operands(decode(instructions), globals_map, constant_base))
+
+        moved = any(index != target for index, target in globals_map.items())
+        constants.extend(map_functions(unit.constants, relocate, keep_literal=not moved))
+
+        # Falling off the end of a unit continues with the next one
+        end = assembler.label()
+        for ins in relocate_operands(decode(unit.instructions), globals_map, constant_base):
+            if ins.op in JUMP_OPCODES and ins.target is None:
+                ins.target = end
+            assembler.instructions.append(ins)
+        assembler.bind(end)
+
+        global_bases[unit.path] = global_base
+        placed[unit.path] = unit
+        global_base += unit.num_globals
+
+    if global_base > GLOBALS_SIZE:
+        return None, f"linked program needs {global_base} globals, the limit is {GLOBALS_SIZE}"
+    return (assembler.assemble(), constants), None
+
+
+class ModuleBuilder:
+    def __init__(self, opt_level: int = 0, workers: Optional[int] = None, cache: Optional[BytecodeCache] = None) -> None:
+        self.opt_level: int = opt_level
+        # Size of the process pool, 1 compiles everything in this process
+        self.workers: Optional[int] = workers
+        self.cache: Optional[BytecodeCache] = cache
+        # Units by a hash of everything that shapes them, reused across builds
+        self.units: Dict[str, CompiledUnit] = {}
+        self.compiled: int = 0
+
+    def build(self, path: str) -> Tuple[Optional[Bytecode], Error | None]:
+        path = os.path.normpath(path)
+        sources: Dict[str, str] = {}
+        imports: Dict[str, List[str]] = {}
+        order: List[str] = []
+        err = self._discover(path, sources, imports, order, [])
+        if err:
+            return None, err
+
+        key = None
+        if self.cache is not None:
+            # Same key as a single file compiled on its own when there is nothing to import
+            modules = [f"{p}\0{sources[p]}" for p in order[:-1]]
+            key = self.cache.key(sources[path], "stack", str(self.opt_level), *modules)
+            bytecode = self.cache.get(key)
+            if bytecode is not None:
+                return bytecode, None
+
+        units: Dict[str, CompiledUnit] = {}
+        for wave in self._waves(order, imports):
+            err = self._compile_wave(wave, sources, imports, units)
+            if err:
+                return None, err
+
+        bytecode, err = link([units[p] for p in order])
+        if err:
+            return None, err
+        if self.cache is not None:
+            self.cache.put(key, bytecode)
+        return bytecode, None
+
+    def _discover(
+        self, path: str, sources: Dict[str, str], imports: Dict[str, List[str]], order: List[str], stack: List[str]
+    ) -> Error | None:
+        if path in sources:
+            return None
+        if path in stack:
+            return f"import cycle: {' -> '.join(stack[stack.index(path) :] + [path])}"
+        try:
+            with open(path) as f:
+                source = f.read()
+        except OSError as e:
+            return f"cannot import {path}: {e.strerror}"
+
+        stack.append(path)
+        imports[path] = scan_imports(source)
+        for literal in imports[path]:
+            err = self._discover(resolve_path(path, literal), sources, imports, order, stack)
+            if err:
+                return err
+        stack.pop()
+        sources[path] = source
+        order.append(path)
+        return None
+
+    def _waves(self, order: List[str], imports: Dict[str, List[str]]) -> List[List[str]]:
+        # Modules in one wave only import from earlier waves
+        depth: Dict[str, int] = {}
+        for path in order:
+            depth[path] = 1 + max((depth[resolve_path(path, literal)] for literal in imports[path]), default=-1)
+        waves: List[List[str]] = [[] for _ in range(max(depth.values()) + 1)]
+        for path in order:
+            waves[depth[path]].append(path)
+        return waves
+
+    def _compile_wave(
+        self, wave: List[str], sources: Dict[str, str], imports: Dict[str, List[str]], units: Dict[str, CompiledUnit]
+    ) -> Error | None:
+        pending: List[Tuple[str, str, ResolvedImports]] = []
+        for path in wave:
+            resolved: ResolvedImports = {}
+            for literal in imports[path]:
+                dep = resolve_path(path, literal)
+                resolved[literal] = (dep, sorted(units[dep].exports))
+            key = self._unit_key(path, sources[path], resolved)
+            if key in self.units:
+                units[path] = self.units[key]
+            else:
+                pending.append((key, path, resolved))
+        if not pending:
+            return None
+
+        args = (
+            [path for _, path, _ in pending],
+            [sources[path] for _, path, _ in pending],
+            [resolved for _, _, resolved in pending],
+            [self.opt_level] * len(pending),
+        )
+        if len(pending) > 1 and self.workers != 1:
+            with ProcessPoolExecutor(self.workers) as pool:
+                results = list(pool.map(compile_unit, *args))
+        else:
+            results = list(map(compile_unit, *args))
+
+        for (key, path, _), (unit, err) in zip(pending, results):
+            if err:
+                return err
+            self.units[key] = unit
+            units[path] = unit
+            self.compiled += 1
+        return None
+
+    def _unit_key(self, path: str, source: str, resolved: ResolvedImports) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{path}\0{self.opt_level}\0".encode())
+        for literal in sorted(resolved):
+            dep, names = resolved[literal]
+            digest.update(f"{literal}\0{dep}\0{','.join(names)}\0".encode())
+        digest.update(source.encode())
+        return digest.hexdigest()
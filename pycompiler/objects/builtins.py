@@ -1,3 +1,4 @@
+from copy import copy
 from typing import List
 from pycompiler.objects import (
     Object,
@@ -6,11 +7,14 @@ from pycompiler.objects import (
     NullObject,
     StringObject,
     ArrayObject,
+    IntArrayObject,
     MapObject,
 )
 
 
 class Builtin(Object):
+    __slots__ = ("func", "name")
+
     def __init__(self, func, name):
         self.func = func
         self.name = name
@@ -18,7 +22,7 @@ class Builtin(Object):
 
 def builtin_puts(args: List[Object]) -> Object | str:
     for arg in args:
-        print(arg.value)
+        print(arg.elements() if isinstance(arg, ArrayObject) else arg.value)
     return NullObject()
 
 
@@ -28,9 +32,8 @@ def builtin_first(args: List[Object]) -> Object | str:
     if not isinstance(args[0], ArrayObject):
         return "arg is wrong type, must be array"
 
-    arr: List[Object] = args[0].value
-    if len(arr) > 1:
-        return args[0].value[0]
+    if args[0].length() > 1:
+        return args[0].item(0)
     return NullObject()
 
 
@@ -40,9 +43,8 @@ def builtin_last(args: List[Object]) -> Object | str:
     if not isinstance(args[0], ArrayObject):
         return "arg is wrong type, must be array"
 
-    arr: List[Object] = args[0].value
-    if len(arr) > 1:
-        return args[0].value[-1]
+    if args[0].length() > 1:
+        return args[0].item(args[0].length() - 1)
     return NullObject()
 
 
@@ -52,6 +54,11 @@ def builtin_rest(args: List[Object]) -> Object | str:
     if not isinstance(args[0], ArrayObject):
         return "arg is wrong type, must be array"
 
+    if isinstance(args[0], IntArrayObject):
+        if len(args[0].ints) > 1:
+            return IntArrayObject(args[0].ints[1:])
+        return NullObject()
+
     arr: List[Object] = args[0].value
     if len(arr) > 1:
         new_arr = []
@@ -67,12 +74,22 @@ def builtin_push(args: List[Object]) -> Object | str:
     if not isinstance(args[0], ArrayObject):
         return "arg is wrong type, must be array"
 
-    arr: List[Object] = args[0].value
-    new_arr = []
-    for obj in arr[1:]:
-        new_arr.append(copy(obj))
-    new_arr.append(args[1])
-    return ArrayObject(new_arr)
+    # push leaves its argument untouched, append is the in place form
+    if isinstance(args[0], IntArrayObject):
+        pushed = IntArrayObject(args[0].ints[:])
+        pushed.append(args[1])
+        return pushed
+    return ArrayObject(args[0].value + [args[1]])
+
+
+def builtin_append(args: List[Object]) -> Object | str:
+    if len(args) != 2:
+        return "wrong number of args: need 2"
+    if not isinstance(args[0], ArrayObject):
+        return "arg is wrong type, must be array"
+
+    args[0].append(args[1])
+    return args[0]
 
 
 def builtin_len(args: List[Object]) -> Object | str:
@@ -80,7 +97,7 @@ def builtin_len(args: List[Object]) -> Object | str:
         return "wrong number of args: need 1"
     if not isinstance(args[0], ArrayObject):
         return "arg is wrong type, must be array"
-    return IntObject(len(args[0].value))
+    return IntObject(args[0].length())
 
 
 BUILTINS: List[Builtin] = [
@@ -90,5 +107,6 @@ BUILTINS: List[Builtin] = [
     Builtin(builtin_last, "last"),
     Builtin(builtin_push, "push"),
     Builtin(builtin_rest, "rest"),
+    Builtin(builtin_append, "append"),
 ]
 
@@ -1,14 +1,39 @@
+from array import array
 from typing import Dict, List, Tuple
 from pycompiler.parser import FunctionLiteral
-from pycompiler.code import Instructions, instructions_to_str
+from pycompiler.code import Instructions, instructions_to_str, RegInstructions, register_instructions_to_str
 
 
 
+# Range of an element in an unboxed int array
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+
 class Object:
-    pass
+    # Every object is slotted, scripts create millions of them and a __dict__ each would dwarf the payload
+    __slots__ = ()
+
+
+# Every null is equal, so they all share one hash
+NULL_HASH = hash(None)
+
+
+def _immutable(self, name: str, *value) -> None:
+    raise AttributeError(f"{type(self).__name__} is immutable")
 
 
 class NullObject(Object):
+    __slots__ = ()
+    __setattr__ = _immutable
+    __delattr__ = _immutable
+
+    def __copy__(self):
+        return self
+
+    def __reduce__(self):
+        return NullObject, ()
+
     def __eq__(self, other: object):
         if not isinstance(other, NullObject):
             return NotImplemented
@@ -17,10 +42,24 @@ class NullObject(Object):
     def __repr__(self):
         return f"<NullObject>"
 
+    def __hash__(self):
+        return NULL_HASH
+
 
 class IntObject(Object):
+    # Immutable, so its hash is that of the value for good, and Python caches a str's hash itself
+    __slots__ = ("value",)
+    __setattr__ = _immutable
+    __delattr__ = _immutable
+
     def __init__(self, value: int):
-        self.value: int = value
+        object.__setattr__(self, "value", value)
+
+    def __copy__(self):
+        return self
+
+    def __reduce__(self):
+        return type(self), (self.value,)
 
     def __eq__(self, other: object):
         if not isinstance(other, IntObject):
@@ -35,8 +74,18 @@ class IntObject(Object):
 
 
 class StringObject(Object):
+    __slots__ = ("value",)
+    __setattr__ = _immutable
+    __delattr__ = _immutable
+
     def __init__(self, value: str):
-        self.value: str = value
+        object.__setattr__(self, "value", value)
+
+    def __copy__(self):
+        return self
+
+    def __reduce__(self):
+        return type(self), (self.value,)
 
     def __eq__(self, other: object):
         if not isinstance(other, StringObject):
@@ -51,6 +100,9 @@ class StringObject(Object):
 
 
 class ArrayObject(Object):
+    # ints is only set while an IntArrayObject, both share this layout so one can become the other
+    __slots__ = ("value", "ints")
+
     def __init__(self, value: List[Object]):
         self.value: List[Object] = value
 
@@ -59,10 +111,29 @@ class ArrayObject(Object):
             return NullObject()
         return self.value[index.value]
 
+    def length(self) -> int:
+        return len(self.value)
+
+    def item(self, index: int) -> Object:
+        return self.value[index]
+
+    def set(self, index: int, value: Object) -> None:
+        self.value[index] = value
+
+    def append(self, value: Object) -> None:
+        self.value.append(value)
+
+    def elements(self) -> List[Object]:
+        return self.value
+
+    def __copy__(self):
+        # Arrays are mutable, a copy must not share its elements list with the original
+        return ArrayObject(list(self.value))
+
     def __eq__(self, other: object):
         if not isinstance(other, ArrayObject):
             return NotImplemented
-        return self.value == other.value
+        return self.elements() == other.elements()
 
     def __repr__(self):
         return f"<ArrayObject: value={self.value}>"
@@ -71,7 +142,87 @@ class ArrayObject(Object):
         return hash(self.value)
 
 
+class IntArrayObject(ArrayObject):
+    # An array of only ints, kept unboxed until something stores another kind of value
+    __slots__ = ()
+
+    def __init__(self, ints: array):
+        self.ints: array = ints
+
+    def box(self) -> List[Object]:
+        # Becomes an ordinary array for good, everything holding it sees the same elements
+        value = [IntObject(i) for i in self.ints]
+        self.value = value
+        del self.ints
+        self.__class__ = ArrayObject
+        return value
+
+    def get(self, index: IntObject) -> Object:
+        if index.value < 0 or index.value >= len(self.ints):
+            return NullObject()
+        return IntObject(self.ints[index.value])
+
+    def length(self) -> int:
+        return len(self.ints)
+
+    def item(self, index: int) -> Object:
+        return IntObject(self.ints[index])
+
+    def set(self, index: int, value: Object) -> None:
+        if type(value) is IntObject and INT64_MIN <= value.value <= INT64_MAX:
+            self.ints[index] = value.value
+        else:
+            self.box()[index] = value
+
+    def append(self, value: Object) -> None:
+        if type(value) is IntObject and INT64_MIN <= value.value <= INT64_MAX:
+            self.ints.append(value.value)
+        else:
+            self.box().append(value)
+
+    def elements(self) -> List[Object]:
+        # Boxed copies, the array itself stays unboxed
+        return [IntObject(i) for i in self.ints]
+
+    def __copy__(self):
+        return IntArrayObject(array("q", self.ints))
+
+    def __reduce__(self):
+        return IntArrayObject, (self.ints,)
+
+    def __eq__(self, other: object):
+        if isinstance(other, IntArrayObject):
+            return self.ints == other.ints
+        return super().__eq__(other)
+
+    def __repr__(self):
+        # Prints as any other array, the representation is not part of the value
+        return f"<ArrayObject: value={self.elements()}>"
+
+
+def int_array(values: List[Object]) -> ArrayObject:
+    # Unboxed when every element is an int that fits the buffer
+    for value in values:
+        if type(value) is not IntObject or not INT64_MIN <= value.value <= INT64_MAX:
+            return ArrayObject(values)
+    return IntArrayObject(array("q", [value.value for value in values]))
+
+
+class IteratorObject(Object):
+    __slots__ = ("value", "index")
+
+    def __init__(self, value: ArrayObject):
+        # Walks the array itself by index, nothing is copied and elements added while it runs are seen
+        self.value: ArrayObject = value
+        self.index: int = 0
+
+    def __repr__(self):
+        return f"<IteratorObject: index={self.index}, value={self.value}>"
+
+
 class MapObject(Object):
+    __slots__ = ("value",)
+
     def __init__(self, value: Dict[Object, Object]):
         self.value: Dict[Object, Object] = value
 
@@ -91,6 +242,8 @@ class MapObject(Object):
 
 
 class FunctionObject(Object):
+    __slots__ = ("value", "environment")
+
     def __init__(self, value: FunctionLiteral):
         self.value: FunctionLiteral = value
         self.environment = None
@@ -105,10 +258,20 @@ class FunctionObject(Object):
 
 
 class CompiledFunctionObject(Object):
-    def __init__(self, value: Instructions, num_locals: int, num_args: int):
+    __slots__ = ("value", "num_locals", "num_args", "literal", "max_stack", "calls", "back_edges", "tier")
+
+    def __init__(self, value: Instructions, num_locals: int, num_args: int, literal: FunctionLiteral | None = None):
         self.value: Instructions = value
         self.num_locals: int = num_locals
         self.num_args: int = num_args
+        # The resolved source it was compiled from, unset once loaded from disk or relocated
+        self.literal: FunctionLiteral | None = literal
+        # Deepest the operand stack gets above the locals, set by the verifier before the first run
+        self.max_stack: int | None = None
+        # Profile for tiered execution, and the faster tier or its pending compile once promoted
+        self.calls: int = 0
+        self.back_edges: int = 0
+        self.tier = None
 
     def __eq__(self, other: object):
         if not isinstance(other, CompiledFunctionObject):
@@ -123,15 +286,95 @@ class CompiledFunctionObject(Object):
         return f"<CompiledFunctionObject: value={instructions_to_str(self.value)}>"
 
 
+class RegisterFunctionObject(Object):
+    __slots__ = ("value", "num_registers", "num_args", "num_free")
+
+    def __init__(self, value: RegInstructions, num_registers: int, num_args: int, num_free: int):
+        self.value: RegInstructions = value
+        self.num_registers: int = num_registers
+        self.num_args: int = num_args
+        self.num_free: int = num_free
+
+    def __eq__(self, other: object):
+        if not isinstance(other, RegisterFunctionObject):
+            return NotImplemented
+        return (
+            self.value == other.value
+            and self.num_registers == other.num_registers
+            and self.num_args == other.num_args
+            and self.num_free == other.num_free
+        )
+
+    def __repr__(self):
+        return f"<RegisterFunctionObject: value={register_instructions_to_str(self.value)}>"
+
+
 class ClosureObject(Object):
+    __slots__ = ("func", "free")
+
     def __init__(self, func, free):
         self.func = func
         self.free = free
 
+    def __eq__(self, other: object):
+        if not isinstance(other, ClosureObject):
+            return NotImplemented
+        return self.func == other.func and self.free == other.free
+
+    def __repr__(self):
+        return f"<ClosureObject: func={self.func}, free={self.free}>"
+
+
+class NativeFunctionObject(Object):
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        # A Python function produced by the native backend
+        self.value = value
+
+    def __eq__(self, other: object):
+        if not isinstance(other, NativeFunctionObject):
+            return NotImplemented
+        return self.value is other.value
+
+    def __repr__(self):
+        return f"<NativeFunctionObject: value={self.value.__name__}>"
+
+
+class ClosureFunctionObject(Object):
+    __slots__ = ("value", "num_locals", "num_args", "padding")
+
+    def __init__(self, value, num_locals: int, num_args: int):
+        # The body as compiled by the closure backend, called with a fresh frame
+        self.value = value
+        self.num_locals: int = num_locals
+        self.num_args: int = num_args
+        # Locals past the arguments start out empty
+        self.padding: List[Object] = [Object()] * (num_locals - num_args)
+
+    def __eq__(self, other: object):
+        if not isinstance(other, ClosureFunctionObject):
+            return NotImplemented
+        return self.value is other.value
+
+    def __repr__(self):
+        return f"<ClosureFunctionObject: num_args={self.num_args}, num_locals={self.num_locals}>"
+
 
 class BooleanObject(Object):
+    __slots__ = ("value", "_hash")
+    __setattr__ = _immutable
+    __delattr__ = _immutable
+
     def __init__(self, value: bool):
-        self.value: bool = value
+        object.__setattr__(self, "value", value)
+        object.__setattr__(self, "_hash", hash(value))
+
+    def __copy__(self):
+        return self
+
+    def __reduce__(self):
+        return type(self), (self.value,)
 
     def __eq__(self, other: object):
         if not isinstance(other, BooleanObject):
@@ -141,8 +384,13 @@ class BooleanObject(Object):
     def __repr__(self):
         return f"<BooleanObject: value={self.value}>"
 
+    def __hash__(self):
+        return self._hash
+
 
 class ReturnObject(Object):
+    __slots__ = ("value",)
+
     def __init__(self, value: Object):
         self.value = value
 
@@ -0,0 +1,8 @@
+from .peephole import *
+from .walk import *
+from .deadcode import *
+from .inline import *
+from .cfg import *
+from .passes import *
+from .types import *
+from .cse import *
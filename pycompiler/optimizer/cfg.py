@@ -0,0 +1,54 @@
+from typing import List, Set, Optional
+from pycompiler.code import Opcode, JUMP_OPCODES
+from pycompiler.compiler import BasicBlock
+
+
+def _forward(block: BasicBlock, limit: int) -> BasicBlock:
+    # Follow blocks that do nothing but hand control on to another block
+    hops: int = 0
+    while hops < limit:
+        nxt: Optional[BasicBlock] = None
+        if not block.instructions:
+            nxt = block.fallthrough
+        elif len(block.instructions) == 1 and block.instructions[0].op == Opcode.JUMP:
+            nxt = block.instructions[0].target
+        if nxt is None or nxt is block:
+            break
+        block = nxt
+        hops += 1
+    return block
+
+
+def fold_constant_branches(blocks: List[BasicBlock]) -> List[BasicBlock]:
+    for block in blocks:
+        ins = block.instructions
+        if len(ins) < 2 or ins[-1].op != Opcode.JUMPCOND:
+            continue
+        if ins[-2].op == Opcode.TRUE:
+            del ins[-2:]
+        elif ins[-2].op in (Opcode.FALSE, Opcode.NULL):
+            jump = ins.pop()
+            ins[-1] = jump
+            jump.op = Opcode.JUMP
+            block.fallthrough = None
+    return blocks
+
+
+def thread_jumps(blocks: List[BasicBlock]) -> List[BasicBlock]:
+    for block in blocks:
+        last = block.terminator()
+        if last is not None and last.op in JUMP_OPCODES and last.target is not None:
+            last.target = _forward(last.target, len(blocks))
+    return blocks
+
+
+def remove_unreachable_blocks(blocks: List[BasicBlock]) -> List[BasicBlock]:
+    reachable: Set[int] = set()
+    worklist: List[BasicBlock] = [blocks[0]]
+    while worklist:
+        block = worklist.pop()
+        if id(block) in reachable:
+            continue
+        reachable.add(id(block))
+        worklist.extend(block.successors())
+    return [block for block in blocks if id(block) in reachable]
@@ -0,0 +1,266 @@
+from typing import List, Dict, Set, Tuple, Optional
+from pycompiler.lexer import Token, TokenType
+from pycompiler.compiler import SymbolTable, BUILTINSCOPE
+from pycompiler.parser import (
+    Statement,
+    LetStatement,
+    ReturnStatement,
+    ExpressionStatement,
+    ImportStatement,
+    IndexAssignStatement,
+    BlockStatement,
+    Expression,
+    LiteralExpression,
+    InfixExpression,
+    PrefixExpression,
+    IfExpression,
+    WhileExpression,
+    ForExpression,
+    CallExpression,
+    IntLiteral,
+    FunctionLiteral,
+    BooleanLiteral,
+    StringLiteral,
+    ArrayLiteral,
+    MapLiteral,
+    IdentifierLiteral,
+)
+
+from .inline import BUILTIN_NAMES, identifier, node_size, let_names, identifier_names
+from .walk import Node, is_function, walk, rebuild
+
+
+# Builtins without side effects that hand back existing values, calls to anything else are treated as impure
+PURE_BUILTINS = ("len", "first", "last")
+
+# Operators whose result depends on the contents of an array or map operand
+CONTENT_OPERATORS = (TokenType.LBRACKET, TokenType.EQ, TokenType.NOT_EQ, TokenType.LT, TokenType.GT)
+
+
+def reads_contents(expression: Expression) -> bool:
+    # Collections are mutable, so these values can change without any name being rebound
+    match expression:
+        case LiteralExpression():
+            literal = expression.literal
+            match literal:
+                case ArrayLiteral():
+                    return any(reads_contents(m) for m in literal.members)
+                case MapLiteral():
+                    return any(reads_contents(k) or reads_contents(v) for k, v in literal.pairs)
+            return False
+        case PrefixExpression():
+            return expression.operator.token_type == TokenType.BANG or reads_contents(expression.right)
+        case InfixExpression():
+            return (
+                expression.operator.token_type in CONTENT_OPERATORS
+                or reads_contents(expression.left)
+                or reads_contents(expression.right)
+            )
+    return True
+
+
+def builds_collection(expression: Expression) -> bool:
+    # Each evaluation may make a new array or map, one shared result would alias what were separate values
+    match expression:
+        case LiteralExpression():
+            return isinstance(expression.literal, (ArrayLiteral, MapLiteral))
+        case InfixExpression():
+            return expression.operator.token_type == TokenType.LBRACKET and builds_collection(expression.left)
+        case CallExpression():
+            return any(builds_collection(arg) for arg in expression.args)
+    return False
+
+
+def binding_names(statements: List[Statement]) -> Set[str]:
+    # Every name bound by let, import, for or as a parameter, in nested functions too
+    names: Set[str] = set()
+    for statement in statements:
+        for node in walk(statement):
+            match node:
+                case LetStatement() | ForExpression():
+                    names.add(node.ident.token_value)
+                case ImportStatement():
+                    names.update(node.names or [])
+                case LiteralExpression():
+                    if isinstance(node.literal, FunctionLiteral):
+                        names.update(arg.token_value for arg in node.literal.arguments)
+    return names
+
+
+class Occurrence:
+    def __init__(self, expression: Expression, hoistable: bool):
+        self.expression: Expression = expression
+        self.key: str = repr(expression)
+        # False once something with a side effect ran earlier in the same statement
+        self.hoistable: bool = hoistable
+
+
+class Candidate:
+    def __init__(self, expression: Expression, first: int):
+        self.expression: Expression = expression
+        self.first: int = first
+        self.last: int = first
+        self.count: int = 1
+        self.names: Set[str] = identifier_names(ExpressionStatement(expression))
+        self.size: int = node_size(expression)
+        self.reads_contents: bool = reads_contents(expression)
+
+
+class CommonSubexpressionEliminator:
+    def __init__(self) -> None:
+        self.eliminated: int = 0
+        self.symbol_table: Optional[SymbolTable] = None
+        self.rebound: Set[str] = set()
+
+    def eliminate(self, ast: List[Statement], symbol_table: Optional[SymbolTable] = None) -> List[Statement]:
+        self.symbol_table = symbol_table
+        self.rebound = binding_names(ast)
+        return self._block(ast)
+
+    def _block(self, statements: List[Statement]) -> List[Statement]:
+        statements = [self._nested(s) for s in statements]
+        while True:
+            candidate = self._find(statements)
+            if candidate is None:
+                return statements
+            name = f"$cse{self.eliminated}"
+            self.eliminated += 1
+            for i in range(candidate.first, candidate.last + 1):
+                statements[i] = self._replace(statements[i], candidate.expression, name)
+            hoisted = LetStatement(Token(TokenType.IDENT, name), candidate.expression)
+            statements.insert(candidate.first, hoisted)
+
+    def _find(self, statements: List[Statement]) -> Optional[Candidate]:
+        live: Dict[str, Candidate] = {}
+        done: List[Candidate] = []
+        for i, statement in enumerate(statements):
+            # Names rebound by this statement refer to new slots from here on
+            killed = let_names([statement])
+            # A call or an index assignment may change what reading a collection returns
+            found, clobbers = self._occurrences(statement)
+            for occurrence in found:
+                if clobbers and reads_contents(occurrence.expression):
+                    continue
+                candidate = live.get(occurrence.key)
+                if candidate is not None:
+                    if not candidate.names & killed:
+                        candidate.count += 1
+                        candidate.last = i
+                elif occurrence.hoistable:
+                    candidate = Candidate(occurrence.expression, i)
+                    if not candidate.names & killed:
+                        live[occurrence.key] = candidate
+            for key, candidate in list(live.items()):
+                if candidate.names & killed or (clobbers and candidate.reads_contents):
+                    done.append(live.pop(key))
+        done.extend(live.values())
+
+        best: Optional[Candidate] = None
+        for candidate in done:
+            if candidate.count >= 2 and (best is None or candidate.size > best.size):
+                best = candidate
+        return best
+
+    def _occurrences(self, statement: Statement) -> Tuple[List[Occurrence], bool]:
+        found: List[Occurrence] = []
+        effect = [False]
+        self._scan_statement(statement, found, effect)
+        return found, effect[0]
+
+    def _scan_statement(self, statement: Statement, found: List[Occurrence], effect: List[bool]) -> None:
+        match statement:
+            case LetStatement() | ReturnStatement() | ExpressionStatement():
+                self._scan(statement.expr, found, effect)
+            case IndexAssignStatement():
+                for expression in (statement.collection, statement.index, statement.value):
+                    self._scan(expression, found, effect)
+                effect[0] = True
+
+    def _scan(self, expression: Expression, found: List[Occurrence], effect: List[bool]) -> bool:
+        # Walks in evaluation order and reports whether the expression is pure
+        pure: bool = False
+        match expression:
+            case LiteralExpression():
+                literal = expression.literal
+                match literal:
+                    case ArrayLiteral():
+                        return all([self._scan(m, found, effect) for m in literal.members])
+                    case MapLiteral():
+                        pairs = [(self._scan(k, found, effect), self._scan(v, found, effect)) for k, v in literal.pairs]
+                        return all(k and v for k, v in pairs)
+                return isinstance(
+                    literal, (IntLiteral, StringLiteral, BooleanLiteral, IdentifierLiteral, FunctionLiteral)
+                )
+            case PrefixExpression():
+                pure = self._scan(expression.right, found, effect)
+                # Negating a plain value is cheaper than reloading it
+                if isinstance(expression.right, LiteralExpression):
+                    return pure
+            case InfixExpression():
+                left = self._scan(expression.left, found, effect)
+                right = self._scan(expression.right, found, effect)
+                pure = left and right
+            case CallExpression():
+                func = self._scan(expression.func, found, effect)
+                args = all([self._scan(arg, found, effect) for arg in expression.args])
+                pure = func and args and self._is_pure_builtin(expression.func)
+                if not pure:
+                    effect[0] = True
+            case IfExpression():
+                self._scan(expression.condition, found, effect)
+                # Arms run after the condition, so they can reuse but never hoist
+                for block in (expression.consequence, expression.alternative):
+                    for statement in block.statements if block else []:
+                        self._scan_statement(statement, found, [True])
+                if self._has_call(expression.consequence) or self._has_call(expression.alternative):
+                    effect[0] = True
+                return False
+            case WhileExpression() | ForExpression():
+                # Only the iterable runs once, before the loop, everything else repeats and can only reuse
+                if isinstance(expression, ForExpression):
+                    self._scan(expression.iterable, found, effect)
+                else:
+                    self._scan(expression.condition, found, [True])
+                for statement in expression.body.statements:
+                    self._scan_statement(statement, found, [True])
+                effect[0] = True
+                return False
+        if pure and not builds_collection(expression):
+            found.append(Occurrence(expression, not effect[0]))
+        return pure
+
+    def _is_pure_builtin(self, func: Expression) -> bool:
+        if not isinstance(func, LiteralExpression) or not isinstance(func.literal, IdentifierLiteral):
+            return False
+        name = func.literal.token.token_value
+        if name not in PURE_BUILTINS or name in self.rebound or name not in BUILTIN_NAMES:
+            return False
+        if self.symbol_table is None:
+            return True
+        _, symbol = self.symbol_table.resolve(name)
+        return symbol is not None and symbol.scope == BUILTINSCOPE
+
+    def _has_call(self, block: Optional[BlockStatement]) -> bool:
+        if block is None:
+            return False
+        found: List[Occurrence] = []
+        effect = [False]
+        for statement in block.statements:
+            self._scan_statement(statement, found, effect)
+            if effect[0]:
+                return True
+        return False
+
+    def _nested(self, node: Node) -> Node:
+        # Every if arm, loop body and function body is a region of its own
+        if isinstance(node, BlockStatement):
+            return BlockStatement(self._block(node.statements))
+        return rebuild(node, self._nested)
+
+    def _replace(self, node: Node, target: Expression, name: str) -> Node:
+        # Only positions that _scan visits are rewritten
+        if isinstance(node, Expression) and node == target:
+            return identifier(name)
+        if is_function(node):
+            return node
+        return rebuild(node, lambda child: self._replace(child, target, name))
@@ -0,0 +1,206 @@
+from typing import List, Set, Callable, Optional
+from pycompiler.lexer import Token, TokenType
+from pycompiler.code import Instructions, Opcode, JUMP_OPCODES, Ins, decode, compact, encode
+from pycompiler.compiler import Bytecode, SymbolTable
+from pycompiler.parser import (
+    Statement,
+    LetStatement,
+    ReturnStatement,
+    ExpressionStatement,
+    BlockStatement,
+    Expression,
+    LiteralExpression,
+    InfixExpression,
+    PrefixExpression,
+    IfExpression,
+    ForExpression,
+    IntLiteral,
+    FunctionLiteral,
+    BooleanLiteral,
+    StringLiteral,
+    ArrayLiteral,
+    MapLiteral,
+    IdentifierLiteral,
+)
+
+from .peephole import map_functions
+from .walk import Node, rebuild
+from .inline import BUILTIN_NAMES
+
+
+# Infix operators that cannot fail on two integers
+PURE_INT_OPERATORS = (
+    TokenType.PLUS,
+    TokenType.MINUS,
+    TokenType.ASTERISK,
+    TokenType.LT,
+    TokenType.GT,
+    TokenType.EQ,
+    TokenType.NOT_EQ,
+)
+
+
+def constant_truth(expression: Expression) -> Optional[bool]:
+    match expression:
+        case LiteralExpression():
+            if isinstance(expression.literal, (BooleanLiteral, IntLiteral, StringLiteral)):
+                return bool(expression.literal.value)
+        case PrefixExpression():
+            if expression.operator.token_type != TokenType.BANG:
+                return None
+            truth = constant_truth(expression.right)
+            if truth is None:
+                return None
+            return not truth
+    return None
+
+
+def is_pure(expression: Expression, resolves: Callable[[str], bool] = lambda name: False) -> bool:
+    # An identifier is only pure once it is known to resolve, reading an undefined one is a compile error
+    match expression:
+        case LiteralExpression():
+            literal = expression.literal
+            match literal:
+                case IntLiteral() | BooleanLiteral() | StringLiteral() | FunctionLiteral():
+                    return True
+                case IdentifierLiteral():
+                    return resolves(literal.token.token_value)
+                case ArrayLiteral():
+                    return all(is_pure(member, resolves) for member in literal.members)
+                case MapLiteral():
+                    return all(
+                        isinstance(key, LiteralExpression)
+                        and isinstance(key.literal, (IntLiteral, BooleanLiteral, StringLiteral))
+                        and is_pure(value, resolves)
+                        for key, value in literal.pairs
+                    )
+        case PrefixExpression():
+            if expression.operator.token_type == TokenType.BANG:
+                return is_pure(expression.right, resolves)
+            return isinstance(expression.right, LiteralExpression) and isinstance(
+                expression.right.literal, IntLiteral
+            )
+        case InfixExpression():
+            return (
+                expression.operator.token_type in PURE_INT_OPERATORS
+                and isinstance(expression.left, LiteralExpression)
+                and isinstance(expression.left.literal, IntLiteral)
+                and isinstance(expression.right, LiteralExpression)
+                and isinstance(expression.right.literal, IntLiteral)
+            )
+    return False
+
+
+class DeadCodeEliminator:
+    def __init__(self) -> None:
+        self.statements_removed: int = 0
+        self.branches_removed: int = 0
+        self.bytes_removed: int = 0
+        self.symbol_table: Optional[SymbolTable] = None
+        # Names bound so far in the function being walked and the ones enclosing it
+        self.bound: Set[str] = set()
+
+    def eliminate(self, ast: List[Statement], symbol_table: Optional[SymbolTable] = None) -> List[Statement]:
+        self.symbol_table = symbol_table
+        self.bound = set()
+        return self._block(ast)
+
+    def eliminate_bytecode(self, bytecode: Bytecode) -> Bytecode:
+        return self.eliminate_instructions(bytecode[0]), map_functions(bytecode[1], self.eliminate_instructions)
+
+    def eliminate_instructions(self, instructions: Instructions) -> Instructions:
+        decoded: List[Ins] = decode(instructions)
+        if not decoded:
+            return instructions
+        index = {id(ins): i for i, ins in enumerate(decoded)}
+
+        reached = [False] * len(decoded)
+        work: List[int] = [0]
+        while work:
+            i = work.pop()
+            if i >= len(decoded) or reached[i]:
+                continue
+            reached[i] = True
+            ins = decoded[i]
+            if ins.op in JUMP_OPCODES and ins.target is not None:
+                work.append(index[id(ins.target)])
+            if ins.op not in (Opcode.JUMP, Opcode.RETURNVALUE, Opcode.RETURN):
+                work.append(i + 1)
+
+        for i, ins in enumerate(decoded):
+            ins.dead = not reached[i]
+
+        eliminated = encode(compact(decoded))
+        self.bytes_removed += len(instructions) - len(eliminated)
+        return eliminated
+
+    def _block(self, statements: List[Statement]) -> List[Statement]:
+        kept: List[Statement] = []
+        for i, statement in enumerate(statements):
+            is_last = i == len(statements) - 1
+            match statement:
+                case ExpressionStatement():
+                    # The last statement of a block is its value
+                    if not is_last and is_pure(statement.expr, self._resolves):
+                        self.statements_removed += 1
+                        continue
+                    kept.append(self._node(statement))
+                case LetStatement():
+                    kept.append(self._node(statement))
+                    self.bound.add(statement.ident.token_value)
+                case ReturnStatement():
+                    kept.append(self._node(statement))
+                    self.statements_removed += len(statements) - i - 1
+                    break
+                case _:
+                    kept.append(self._node(statement))
+        return kept
+
+    def _node(self, node: Node) -> Node:
+        match node:
+            case BlockStatement():
+                return BlockStatement(self._block(node.statements))
+            case LiteralExpression():
+                literal = node.literal
+                if isinstance(literal, FunctionLiteral):
+                    outer = self.bound
+                    self.bound = outer | {arg.token_value for arg in literal.arguments}
+                    if literal.name:
+                        self.bound.add(literal.name)
+                    function = rebuild(node, self._node)
+                    self.bound = outer
+                    return function
+            case IfExpression():
+                return self._if(node)
+            case ForExpression():
+                iterable = self._node(node.iterable)
+                self.bound.add(node.ident.token_value)
+                return ForExpression(node.ident, iterable, self._node(node.body))
+        return rebuild(node, self._node)
+
+    def _resolves(self, name: str) -> bool:
+        if name in self.bound:
+            return True
+        if self.symbol_table is None:
+            return name in BUILTIN_NAMES
+        _, symbol = self.symbol_table.resolve(name)
+        return symbol is not None
+
+    def _if(self, expression: IfExpression) -> IfExpression:
+        truth = constant_truth(expression.condition)
+        if truth is None:
+            return rebuild(expression, self._node)
+
+        # Keep only the taken arm behind a literal condition so the
+        # bytecode passes can drop the branch entirely
+        self.branches_removed += 1
+        if truth:
+            taken = expression.consequence
+        elif expression.alternative:
+            taken = expression.alternative
+        else:
+            return IfExpression(LiteralExpression(BooleanLiteral(Token(TokenType.FALSE), False)), BlockStatement([]))
+        return IfExpression(
+            LiteralExpression(BooleanLiteral(Token(TokenType.TRUE), True)),
+            BlockStatement(self._block(taken.statements)),
+        )
@@ -0,0 +1,242 @@
+import copy
+from typing import List, Dict, Set, FrozenSet, Optional
+from pycompiler.lexer import Token, TokenType
+from pycompiler.objects import BUILTINS
+from pycompiler.compiler import SymbolTable
+from pycompiler.parser import (
+    Statement,
+    LetStatement,
+    ReturnStatement,
+    ExpressionStatement,
+    ImportStatement,
+    BlockStatement,
+    Expression,
+    LiteralExpression,
+    IfExpression,
+    ForExpression,
+    CallExpression,
+    IntLiteral,
+    FunctionLiteral,
+    BooleanLiteral,
+    StringLiteral,
+    IdentifierLiteral,
+)
+
+from .walk import Node, is_function, walk, rebuild
+
+
+# Maximum number of AST nodes in the body of an inlined function
+INLINE_THRESHOLD = 24
+
+BUILTIN_NAMES = set(builtin.name for builtin in BUILTINS)
+
+
+class InlineCandidate:
+    def __init__(self, function: FunctionLiteral, locals: Set[str], free_names: Set[str]):
+        self.function: FunctionLiteral = function
+        self.params: List[str] = [arg.token_value for arg in function.arguments]
+        self.locals: Set[str] = locals
+        self.free_names: Set[str] = free_names
+
+
+def identifier(name: str) -> LiteralExpression:
+    return LiteralExpression(IdentifierLiteral(Token(TokenType.IDENT, name)))
+
+
+def node_size(node: Node) -> int:
+    # Blocks only group statements, they do not count themselves
+    return sum(1 for n in walk(node) if not isinstance(n, BlockStatement))
+
+
+def let_names(statements: List[Statement]) -> Set[str]:
+    # Names bound by let, import or for in a function scope, including inside if and loop blocks
+    names: Set[str] = set()
+    for statement in statements:
+        for node in walk(statement, functions=False):
+            match node:
+                case LetStatement() | ForExpression():
+                    names.add(node.ident.token_value)
+                case ImportStatement():
+                    names.update(node.names or [])
+    return names
+
+
+def identifier_names(node: Node) -> Set[str]:
+    return set(
+        n.literal.token.token_value
+        for n in walk(node)
+        if isinstance(n, LiteralExpression) and isinstance(n.literal, IdentifierLiteral)
+    )
+
+
+def _has_nested_return_or_function(node: Node) -> bool:
+    return any(isinstance(n, ReturnStatement) or is_function(n) for n in walk(node, functions=False))
+
+
+class Inliner:
+    def __init__(self, threshold: int = INLINE_THRESHOLD):
+        # A threshold of zero or less turns inlining off
+        self.threshold: int = threshold
+        self.inlined: int = 0
+        self._expansions: int = 0
+        self._candidates: Dict[str, InlineCandidate] = {}
+        self._global_lets: Dict[str, int] = {}
+        # Globals of this unit bound by the statements before the one being registered
+        self._defined: Set[str] = set()
+        self.symbol_table: Optional[SymbolTable] = None
+
+    def inline(self, ast: List[Statement], symbol_table: Optional[SymbolTable] = None) -> List[Statement]:
+        if self.threshold <= 0:
+            return ast
+
+        self.symbol_table = symbol_table
+        self._candidates = {}
+        self._global_lets = {}
+        self._defined = set()
+        for statement in ast:
+            # A let inside a top level loop assigns the global it names
+            for name in let_names([statement]):
+                self._global_lets[name] = self._global_lets.get(name, 0) + 1
+
+        output: List[Statement] = []
+        for statement in ast:
+            statement = self._node(statement, frozenset())
+            if isinstance(statement, LetStatement):
+                self._register(statement)
+            self._defined |= let_names([statement])
+            output.append(statement)
+        return output
+
+    def _register(self, statement: LetStatement) -> None:
+        name = statement.ident.token_value
+        if self._global_lets[name] != 1:
+            return
+        if not isinstance(statement.expr, LiteralExpression):
+            return
+        function = statement.expr.literal
+        if not isinstance(function, FunctionLiteral):
+            return
+
+        statements = function.body.statements
+        if not statements or node_size(function.body) > self.threshold:
+            return
+        for s in statements[:-1]:
+            if not isinstance(s, (LetStatement, ExpressionStatement)):
+                return
+        if not isinstance(statements[-1], (ExpressionStatement, ReturnStatement)):
+            return
+        if _has_nested_return_or_function(BlockStatement(statements[:-1])):
+            return
+        if _has_nested_return_or_function(statements[-1].expr):
+            return
+
+        params = set(arg.token_value for arg in function.arguments)
+        locals = let_names(statements)
+        # Locals that could also name a global are resolved by position, keep those calls
+        if locals & (params | set(self._global_lets) | BUILTIN_NAMES):
+            return
+        free_names = identifier_names(function.body) - params - locals
+        # Recursive, or depends on a global that is redefined later on
+        if name in free_names:
+            return
+        for free_name in free_names:
+            if self._global_lets.get(free_name, 0) > 1 or not self._resolves(free_name):
+                return
+
+        self._candidates[name] = InlineCandidate(function, locals, free_names)
+
+    def _resolves(self, name: str) -> bool:
+        # A free name must mean at every call site what it meant where the function was defined
+        if name in self._defined:
+            return True
+        if name in self._global_lets:
+            # Bound in this unit only after the definition, the function itself still sees an older meaning
+            return False
+        if self.symbol_table is None:
+            return name in BUILTIN_NAMES
+        _, symbol = self.symbol_table.resolve(name)
+        return symbol is not None
+
+    def _node(self, node: Node, shadowed: FrozenSet[str]) -> Node:
+        match node:
+            case LiteralExpression():
+                literal = node.literal
+                if isinstance(literal, FunctionLiteral):
+                    inner = shadowed | set(arg.token_value for arg in literal.arguments)
+                    inner |= let_names(literal.body.statements)
+                    if literal.name:
+                        inner |= {literal.name}
+                    return rebuild(node, lambda child: self._node(child, inner))
+            case CallExpression():
+                args = [self._node(arg, shadowed) for arg in node.args]
+                candidate = self._lookup(node.func, shadowed)
+                if candidate and len(candidate.params) == len(args):
+                    return self._expand(candidate, args)
+                return CallExpression(self._node(node.func, shadowed), args)
+        return rebuild(node, lambda child: self._node(child, shadowed))
+
+    def _lookup(self, func: Expression, shadowed: FrozenSet[str]) -> Optional[InlineCandidate]:
+        if not isinstance(func, LiteralExpression) or not isinstance(func.literal, IdentifierLiteral):
+            return None
+        name = func.literal.token.token_value
+        if name in shadowed:
+            return None
+        candidate = self._candidates.get(name)
+        if not candidate or candidate.free_names & shadowed:
+            return None
+        return candidate
+
+    def _expand(self, candidate: InlineCandidate, args: List[Expression]) -> Expression:
+        # Callee locals become uniquely named locals of the caller
+        prefix = f"$inline{self._expansions}_"
+        self._expansions += 1
+        self.inlined += 1
+
+        bindings: Dict[str, Expression] = {}
+        lets: List[Statement] = []
+        for param, arg in zip(candidate.params, args):
+            if isinstance(arg, LiteralExpression) and isinstance(
+                arg.literal, (IntLiteral, BooleanLiteral, StringLiteral, IdentifierLiteral)
+            ):
+                bindings[param] = arg
+            else:
+                bindings[param] = identifier(prefix + param)
+                lets.append(LetStatement(Token(TokenType.IDENT, prefix + param), arg))
+
+        for name in candidate.locals:
+            bindings[name] = identifier(prefix + name)
+        # The compiler annotates the nodes it resolves, every expansion needs nodes of its own
+        body = copy.deepcopy(candidate.function.body)
+        statements: List[Statement] = []
+        for statement in body.statements:
+            renamed = self._rename(statement, bindings)
+            # The final return yields the value of the expansion
+            if isinstance(renamed, ReturnStatement):
+                renamed = ExpressionStatement(renamed.expr)
+            statements.append(renamed)
+
+        if not lets and len(statements) == 1:
+            return statements[0].expr
+        return IfExpression(
+            LiteralExpression(BooleanLiteral(Token(TokenType.TRUE), True)),
+            BlockStatement(lets + statements),
+        )
+
+    def _rename(self, node: Node, bindings: Dict[str, Expression]) -> Node:
+        match node:
+            case LiteralExpression():
+                literal = node.literal
+                if isinstance(literal, IdentifierLiteral):
+                    bound = bindings.get(literal.token.token_value)
+                    if bound:
+                        return copy.deepcopy(bound)
+                    return node
+            case LetStatement():
+                renamed = bindings[node.ident.token_value].literal.token.token_value
+                return LetStatement(Token(TokenType.IDENT, renamed), self._rename(node.expr, bindings))
+            case ForExpression():
+                renamed = bindings[node.ident.token_value].literal.token
+                return ForExpression(
+                    renamed, self._rename(node.iterable, bindings), self._rename(node.body, bindings)
+                )
+        return rebuild(node, lambda child: self._rename(child, bindings))
@@ -0,0 +1,95 @@
+import time
+from typing import List, Dict, Tuple, Callable, Optional
+from pycompiler.compiler import Compiler, Bytecode, IRPass, SymbolTable
+from pycompiler.parser import Statement
+
+from .peephole import PeepholeOptimizer
+from .deadcode import DeadCodeEliminator
+from .inline import Inliner
+from .types import TypeInference
+from .cse import CommonSubexpressionEliminator
+from .cfg import fold_constant_branches, thread_jumps, remove_unreachable_blocks
+
+Error = str
+
+AstPass = Callable[[List[Statement]], List[Statement]]
+BytecodePass = Callable[[Bytecode], Bytecode]
+
+MAX_OPT_LEVEL = 2
+
+
+class PassManager:
+    def __init__(self, opt_level: int = 1) -> None:
+        self.opt_level: int = max(0, min(opt_level, MAX_OPT_LEVEL))
+        # Seconds spent in each pass, summed over every compile
+        self.timings: Dict[str, float] = {}
+
+        self.ast_passes: List[Tuple[str, AstPass]] = []
+        self.ir_passes: List[Tuple[str, IRPass]] = []
+        self.bytecode_passes: List[Tuple[str, BytecodePass]] = []
+        self.type_inference: Optional[TypeInference] = None
+        # Globals of the compiler being fed, for passes that must know what a name resolves to
+        self.symbol_table: Optional[SymbolTable] = None
+
+        if self.opt_level >= 2:
+            inliner = Inliner()
+            self.ast_passes.append(("inline", lambda ast: inliner.inline(ast, self.symbol_table)))
+        if self.opt_level >= 1:
+            deadcode = DeadCodeEliminator()
+            self.ast_passes.append(("deadcode", lambda ast: deadcode.eliminate(ast, self.symbol_table)))
+        if self.opt_level >= 2:
+            cse = CommonSubexpressionEliminator()
+            self.ast_passes.append(("cse", lambda ast: cse.eliminate(ast, self.symbol_table)))
+        if self.opt_level >= 1:
+            # Runs after every other AST pass so it annotates the nodes that get compiled
+            type_inference = TypeInference()
+            self.type_inference = type_inference
+            self.ast_passes.append(("types", lambda ast: type_inference.infer(ast, self.symbol_table)))
+            self.ir_passes.append(("fold-branches", fold_constant_branches))
+            self.ir_passes.append(("thread-jumps", thread_jumps))
+            self.ir_passes.append(("unreachable-blocks", remove_unreachable_blocks))
+            self.bytecode_passes.append(("peephole", PeepholeOptimizer().optimize))
+
+    def run_ast(self, ast: List[Statement], symbol_table: Optional[SymbolTable] = None) -> List[Statement]:
+        self.symbol_table = symbol_table
+        for name, ast_pass in self.ast_passes:
+            ast = self._timed(name, ast_pass)(ast)
+        return ast
+
+    def compile(self, ast: List[Statement], compiler: Optional[Compiler] = None) -> Tuple[Bytecode, Error | None]:
+        if compiler is None:
+            compiler = Compiler()
+        ast = self.run_ast(ast, compiler.symbol_table)
+
+        compiler.ir_passes = [self._timed(name, ir_pass) for name, ir_pass in self.ir_passes]
+        ir_time = sum(self.timings.get(name, 0.0) for name, _ in self.ir_passes)
+        start = time.perf_counter()
+        err = compiler.compile(ast)
+        bytecode = compiler.bytecode()
+        elapsed = time.perf_counter() - start
+        # IR passes run inside code generation, keep their time out of it
+        elapsed -= sum(self.timings.get(name, 0.0) for name, _ in self.ir_passes) - ir_time
+        self.timings["codegen"] = self.timings.get("codegen", 0.0) + elapsed
+        if err:
+            return bytecode, err
+
+        for name, bytecode_pass in self.bytecode_passes:
+            bytecode = self._timed(name, bytecode_pass)(bytecode)
+        return bytecode, None
+
+    def report(self) -> str:
+        out_string: str = f"-O{self.opt_level}\n"
+        for name, seconds in self.timings.items():
+            out_string += f"{name:<20} {seconds * 1000:10.3f} ms\n"
+        if self.type_inference:
+            out_string += self.type_inference.report() + "\n"
+        return out_string
+
+    def _timed(self, name: str, func: Callable) -> Callable:
+        def run(*args):
+            start = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+        return run
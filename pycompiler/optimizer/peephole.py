@@ -0,0 +1,106 @@
+from typing import List, Optional, Callable
+from pycompiler.code import Instructions, Opcode, JUMP_OPCODES, Ins, decode, compact, encode
+from pycompiler.compiler import Bytecode
+from pycompiler.objects import Object, CompiledFunctionObject, ClosureObject
+
+
+# Instructions that only push a value and have no other effect
+PURE_PUSHES = (
+    Opcode.CONSTANT,
+    Opcode.TRUE,
+    Opcode.FALSE,
+    Opcode.NULL,
+    Opcode.GETLOCAL,
+    Opcode.GETGLOBAL,
+    Opcode.GETFREE,
+    Opcode.GETBUILTIN,
+    Opcode.CURRENTCLOSURE,
+)
+
+
+def map_functions(
+    constants: List[Object], transform: Callable[[Instructions], Instructions], keep_literal: bool = True
+) -> List[Object]:
+    # keep_literal is off when the transform renumbers what the source refers to, such as globals
+    def mapped_function(func: CompiledFunctionObject) -> CompiledFunctionObject:
+        literal = func.literal if keep_literal else None
+        return CompiledFunctionObject(transform(func.value), func.num_locals, func.num_args, literal)
+
+    mapped: List[Object] = []
+    for constant in constants:
+        if isinstance(constant, CompiledFunctionObject):
+            constant = mapped_function(constant)
+        elif isinstance(constant, ClosureObject) and not constant.free:
+            constant = ClosureObject(mapped_function(constant.func), [])
+        mapped.append(constant)
+    return mapped
+
+
+class PeepholeOptimizer:
+    def __init__(self) -> None:
+        self.bytes_saved: int = 0
+
+    def optimize(self, bytecode: Bytecode) -> Bytecode:
+        constants = map_functions(bytecode[1], self.optimize_instructions)
+        # The final pop of the main program is what the VM reports as the result
+        return self.optimize_instructions(bytecode[0], keep_last_pop=True), constants
+
+    def optimize_instructions(self, instructions: Instructions, keep_last_pop: bool = False) -> Instructions:
+        decoded = decode(instructions)
+        while self._run_rules(decoded, keep_last_pop):
+            decoded = compact(decoded)
+
+        optimized = encode(decoded)
+        self.bytes_saved += len(instructions) - len(optimized)
+        return optimized
+
+    def _run_rules(self, decoded: List[Ins], keep_last_pop: bool) -> bool:
+        changed: bool = False
+        targeted = set(id(ins.target) for ins in decoded if ins.op in JUMP_OPCODES)
+
+        for i, ins in enumerate(decoded):
+            if ins.dead:
+                continue
+            nxt: Optional[Ins] = decoded[i + 1] if i + 1 < len(decoded) else None
+
+            if ins.op in JUMP_OPCODES:
+                # Jump threading
+                hops: int = 0
+                while (
+                    ins.target is not None
+                    and ins.target.op == Opcode.JUMP
+                    and ins.target.target is not ins.target
+                    and hops < len(decoded)
+                ):
+                    ins.target = ins.target.target
+                    hops += 1
+                    changed = True
+
+            if ins.op == Opcode.JUMP:
+                if ins.target is nxt:
+                    ins.dead = True
+                    changed = True
+                elif ins.target is not None and ins.target.op in (Opcode.RETURNVALUE, Opcode.RETURN):
+                    ins.op = ins.target.op
+                    ins.operands = []
+                    ins.target = None
+                    changed = True
+            elif ins.op in (Opcode.TRUE, Opcode.FALSE, Opcode.NULL) and nxt and nxt.op == Opcode.JUMPCOND:
+                if id(nxt) in targeted:
+                    continue
+                ins.dead = True
+                if ins.op == Opcode.TRUE:
+                    nxt.dead = True
+                else:
+                    nxt.op = Opcode.JUMP
+                changed = True
+            elif ins.op in PURE_PUSHES and nxt and nxt.op == Opcode.POP:
+                if id(nxt) in targeted:
+                    continue
+                if keep_last_pop and i + 2 == len(decoded):
+                    continue
+                ins.dead = True
+                nxt.dead = True
+                changed = True
+
+        return changed
@@ -0,0 +1,294 @@
+from enum import Enum, auto
+from typing import List, Dict, Set, Optional
+from pycompiler.lexer import TokenType
+from pycompiler.compiler import Symbol, SymbolTable, BUILTINSCOPE
+from pycompiler.parser import (
+    Statement,
+    LetStatement,
+    ReturnStatement,
+    ExpressionStatement,
+    ImportStatement,
+    IndexAssignStatement,
+    Expression,
+    LiteralExpression,
+    InfixExpression,
+    PrefixExpression,
+    IfExpression,
+    WhileExpression,
+    ForExpression,
+    CallExpression,
+    IntLiteral,
+    FunctionLiteral,
+    BooleanLiteral,
+    StringLiteral,
+    ArrayLiteral,
+    MapLiteral,
+    IdentifierLiteral,
+)
+
+from .deadcode import constant_truth
+from .inline import BUILTIN_NAMES, let_names
+from .walk import walk
+
+
+class StaticType(Enum):
+    INT = auto()
+    BOOLEAN = auto()
+    STRING = auto()
+    ARRAY = auto()
+    MAP = auto()
+    NULL = auto()
+    FUNCTION = auto()
+    UNKNOWN = auto()
+
+
+ARITHMETIC_OPERATORS = (TokenType.PLUS, TokenType.MINUS, TokenType.ASTERISK, TokenType.SLASH)
+COMPARISON_OPERATORS = (TokenType.LT, TokenType.GT, TokenType.EQ, TokenType.NOT_EQ)
+
+BUILTIN_RETURN_TYPES: Dict[str, StaticType] = {
+    "len": StaticType.INT,
+    "puts": StaticType.NULL,
+}
+
+Environment = Dict[str, StaticType]
+
+
+def loop_names(statements: List[Statement]) -> Set[str]:
+    # Names assigned inside a loop body anywhere, in nested functions too
+    names: Set[str] = set()
+    for statement in statements:
+        for node in walk(statement):
+            if isinstance(node, (WhileExpression, ForExpression)):
+                names.update(let_names([ExpressionStatement(node)]))
+    return names
+
+
+class TypeInference:
+    def __init__(self) -> None:
+        self.sites: int = 0
+        self.specialized: int = 0
+        self.symbol_table: Optional[SymbolTable] = None
+        self.loop_assigned: Set[str] = set()
+        # Names bound so far in the current function and how many loops deep it is
+        self.scope_names: Set[str] = set()
+        self.loop_depth: int = 0
+        # False at the top level of a compile, where every name bound is a global
+        self.in_function: bool = False
+
+    def infer(self, ast: List[Statement], symbol_table: Optional[SymbolTable] = None) -> List[Statement]:
+        # symbol_table holds the globals of earlier compiles, such as previous REPL lines
+        self.symbol_table = symbol_table
+        self.loop_assigned = loop_names(ast)
+        self.scope_names = set()
+        self.loop_depth = 0
+        self.in_function = False
+        self._statements(ast, {})
+        return ast
+
+    def infer_function(self, literal: FunctionLiteral, arg_types: List[StaticType]) -> FunctionLiteral:
+        # Specializes one function for the argument types it was called with, names from outside it are unknown
+        self.symbol_table = None
+        self.loop_assigned = loop_names(literal.body.statements)
+        self.scope_names = set(arg.token_value for arg in literal.arguments)
+        self.loop_depth = 0
+        self.in_function = True
+        env: Environment = {arg.token_value: arg_type for arg, arg_type in zip(literal.arguments, arg_types)}
+        if literal.name:
+            env[literal.name] = StaticType.FUNCTION
+        self._statements(literal.body.statements, env)
+        return literal
+
+    def fraction(self) -> float:
+        if self.sites == 0:
+            return 0.0
+        return self.specialized / self.sites
+
+    def report(self) -> str:
+        return f"specialized {self.specialized} of {self.sites} arithmetic sites ({self.fraction():.1%})"
+
+    def _statements(self, statements: List[Statement], env: Environment) -> StaticType:
+        value = StaticType.NULL
+        for statement in statements:
+            value = self._statement(statement, env)
+        return value
+
+    def _statement(self, statement: Statement, env: Environment) -> StaticType:
+        match statement:
+            case LetStatement():
+                name = statement.ident.token_value
+                # The name is bound before its value is compiled, unless a loop assigns the existing binding
+                if not (self.loop_depth and name in self.scope_names):
+                    env[name] = StaticType.UNKNOWN
+                self.scope_names.add(name)
+                env[name] = self._expression(statement.expr, env)
+            case ImportStatement():
+                for name in statement.names or []:
+                    env[name] = StaticType.UNKNOWN
+                    self.scope_names.add(name)
+            case ReturnStatement():
+                self._expression(statement.expr, env)
+            case IndexAssignStatement():
+                self._expression(statement.collection, env)
+                self._expression(statement.index, env)
+                self._expression(statement.value, env)
+            case ExpressionStatement():
+                return self._expression(statement.expr, env)
+        return StaticType.UNKNOWN
+
+    def _expression(self, expression: Expression, env: Environment) -> StaticType:
+        match expression:
+            case LiteralExpression():
+                return self._literal(expression, env)
+            case PrefixExpression():
+                right = self._expression(expression.right, env)
+                if expression.operator.token_type == TokenType.BANG:
+                    return StaticType.BOOLEAN
+                self.sites += 1
+                expression.int_operands = right == StaticType.INT
+                if expression.int_operands:
+                    self.specialized += 1
+                    return StaticType.INT
+                return StaticType.UNKNOWN
+            case InfixExpression():
+                left = self._expression(expression.left, env)
+                right = self._expression(expression.right, env)
+                op = expression.operator.token_type
+                if op not in ARITHMETIC_OPERATORS + COMPARISON_OPERATORS:
+                    return StaticType.UNKNOWN
+                self.sites += 1
+                expression.int_operands = left == StaticType.INT and right == StaticType.INT
+                if expression.int_operands:
+                    self.specialized += 1
+                if op in COMPARISON_OPERATORS:
+                    return StaticType.BOOLEAN
+                if expression.int_operands:
+                    return StaticType.INT
+                if op == TokenType.PLUS and left == right == StaticType.STRING:
+                    return StaticType.STRING
+                return StaticType.UNKNOWN
+            case IfExpression():
+                self._expression(expression.condition, env)
+                truth = constant_truth(expression.condition)
+                consequence_env = dict(env)
+                consequence = self._statements(expression.consequence.statements, consequence_env)
+                alternative_env = dict(env)
+                alternative = StaticType.NULL
+                if expression.alternative:
+                    alternative = self._statements(expression.alternative.statements, alternative_env)
+
+                if truth is True:
+                    env.update(consequence_env)
+                    return consequence
+                if truth is False:
+                    env.update(alternative_env)
+                    return alternative
+                # A binding made in only one arm may never have been assigned
+                bound = let_names(expression.consequence.statements)
+                if expression.alternative:
+                    bound |= let_names(expression.alternative.statements)
+                for name in bound:
+                    env[name] = StaticType.UNKNOWN
+                return consequence if consequence == alternative else StaticType.UNKNOWN
+            case WhileExpression() | ForExpression():
+                self._loop(expression, env)
+                return StaticType.NULL
+            case CallExpression():
+                self._expression(expression.func, env)
+                for arg in expression.args:
+                    self._expression(arg, env)
+                func = expression.func
+                if isinstance(func, LiteralExpression) and isinstance(func.literal, IdentifierLiteral):
+                    name = func.literal.token.token_value
+                    if self._is_builtin(name, env, func.literal.symbol):
+                        return BUILTIN_RETURN_TYPES.get(name, StaticType.UNKNOWN)
+                return StaticType.UNKNOWN
+        return StaticType.UNKNOWN
+
+    def _literal(self, expression: LiteralExpression, env: Environment) -> StaticType:
+        literal = expression.literal
+        match literal:
+            case IntLiteral():
+                return StaticType.INT
+            case BooleanLiteral():
+                return StaticType.BOOLEAN
+            case StringLiteral():
+                return StaticType.STRING
+            case ArrayLiteral():
+                for member in literal.members:
+                    self._expression(member, env)
+                return StaticType.ARRAY
+            case MapLiteral():
+                for key, value in literal.pairs:
+                    self._expression(key, env)
+                    self._expression(value, env)
+                return StaticType.MAP
+            case IdentifierLiteral():
+                name = literal.token.token_value
+                if name in env:
+                    return env[name]
+                if self._is_builtin(name, env, literal.symbol):
+                    return StaticType.FUNCTION
+                return StaticType.UNKNOWN
+            case FunctionLiteral():
+                # Captured values are fixed when the closure is created, but globals are read
+                # on every call and a later compile, such as the next REPL line, can assign them
+                if self.in_function:
+                    inner = dict(env)
+                else:
+                    inner = {name: StaticType.UNKNOWN for name in env}
+                # A loop can assign a global after the closure is created
+                for name in self.loop_assigned:
+                    inner[name] = StaticType.UNKNOWN
+                for arg in literal.arguments:
+                    inner[arg.token_value] = StaticType.UNKNOWN
+                if literal.name:
+                    inner[literal.name] = StaticType.FUNCTION
+                scope_names, loop_depth, in_function = self.scope_names, self.loop_depth, self.in_function
+                self.scope_names = set(arg.token_value for arg in literal.arguments)
+                self.loop_depth = 0
+                self.in_function = True
+                self._statements(literal.body.statements, inner)
+                self.scope_names, self.loop_depth, self.in_function = scope_names, loop_depth, in_function
+                return StaticType.FUNCTION
+        return StaticType.UNKNOWN
+
+    def _loop(self, expression: WhileExpression | ForExpression, env: Environment) -> None:
+        if isinstance(expression, ForExpression):
+            self._expression(expression.iterable, env)
+        # Widen the types at the top of the loop until another iteration cannot change them
+        head = dict(env)
+        sites, specialized = self.sites, self.specialized
+        self.loop_depth += 1
+        while True:
+            self.sites, self.specialized = sites, specialized
+            inner = dict(head)
+            if isinstance(expression, ForExpression):
+                inner[expression.ident.token_value] = StaticType.UNKNOWN
+                self.scope_names.add(expression.ident.token_value)
+            else:
+                self._expression(expression.condition, inner)
+            self._statements(expression.body.statements, inner)
+            changed = False
+            for name, value in inner.items():
+                if name in head and head[name] != value and head[name] != StaticType.UNKNOWN:
+                    head[name] = StaticType.UNKNOWN
+                    changed = True
+            if not changed:
+                break
+        self.loop_depth -= 1
+        env.update(head)
+        # The body may never have run
+        for name in let_names([ExpressionStatement(expression)]):
+            if name not in head:
+                env[name] = StaticType.UNKNOWN
+
+    def _is_builtin(self, name: str, env: Environment, symbol: Optional[Symbol] = None) -> bool:
+        if name in env or name not in BUILTIN_NAMES:
+            return False
+        # Code that was already resolved knows exactly what the name refers to
+        if symbol is not None:
+            return symbol.scope == BUILTINSCOPE
+        if self.symbol_table is None:
+            return True
+        _, symbol = self.symbol_table.resolve(name)
+        return symbol is not None and symbol.scope == BUILTINSCOPE
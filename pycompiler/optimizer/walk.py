@@ -0,0 +1,123 @@
+from typing import List, Callable, Iterator
+from pycompiler.parser import (
+    Statement,
+    LetStatement,
+    ReturnStatement,
+    ExpressionStatement,
+    IndexAssignStatement,
+    BlockStatement,
+    Expression,
+    LiteralExpression,
+    InfixExpression,
+    PrefixExpression,
+    IfExpression,
+    WhileExpression,
+    ForExpression,
+    CallExpression,
+    FunctionLiteral,
+    ArrayLiteral,
+    MapLiteral,
+)
+
+# A statement, block or expression
+Node = Statement | Expression
+
+
+def is_function(node: Node) -> bool:
+    return isinstance(node, LiteralExpression) and isinstance(node.literal, FunctionLiteral)
+
+
+def children(node: Node) -> Iterator[Node]:
+    # The nodes directly under node, in evaluation order
+    match node:
+        case LetStatement() | ReturnStatement() | ExpressionStatement():
+            yield node.expr
+        case IndexAssignStatement():
+            yield node.collection
+            yield node.index
+            yield node.value
+        case BlockStatement():
+            yield from node.statements
+        case LiteralExpression():
+            literal = node.literal
+            match literal:
+                case ArrayLiteral():
+                    yield from literal.members
+                case MapLiteral():
+                    for key, value in literal.pairs:
+                        yield key
+                        yield value
+                case FunctionLiteral():
+                    yield literal.body
+        case PrefixExpression():
+            yield node.right
+        case InfixExpression():
+            yield node.left
+            yield node.right
+        case IfExpression():
+            yield node.condition
+            yield node.consequence
+            if node.alternative:
+                yield node.alternative
+        case WhileExpression():
+            yield node.condition
+            yield node.body
+        case ForExpression():
+            yield node.iterable
+            yield node.body
+        case CallExpression():
+            yield node.func
+            yield from node.args
+
+
+def walk(node: Node, functions: bool = True) -> Iterator[Node]:
+    # node and everything under it, parents first; without functions, nested function bodies are skipped
+    stack: List[Node] = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        if functions or not is_function(node):
+            stack.extend(reversed(list(children(node))))
+
+
+def rebuild(node: Node, child: Callable[[Node], Node]) -> Node:
+    # A copy of node with child applied to every node directly under it, leaves come back as they are
+    match node:
+        case LetStatement():
+            return LetStatement(node.ident, child(node.expr))
+        case ReturnStatement():
+            return ReturnStatement(child(node.expr))
+        case ExpressionStatement():
+            return ExpressionStatement(child(node.expr))
+        case IndexAssignStatement():
+            return IndexAssignStatement(child(node.collection), child(node.index), child(node.value))
+        case BlockStatement():
+            return BlockStatement([child(s) for s in node.statements])
+        case LiteralExpression():
+            literal = node.literal
+            match literal:
+                case ArrayLiteral():
+                    return LiteralExpression(ArrayLiteral([child(m) for m in literal.members]))
+                case MapLiteral():
+                    return LiteralExpression(MapLiteral([(child(k), child(v)) for k, v in literal.pairs]))
+                case FunctionLiteral():
+                    function = FunctionLiteral(literal.arguments, child(literal.body))
+                    function.name = literal.name
+                    return LiteralExpression(function)
+            return node
+        case PrefixExpression():
+            return PrefixExpression(node.operator, child(node.right))
+        case InfixExpression():
+            return InfixExpression(child(node.left), node.operator, child(node.right))
+        case IfExpression():
+            condition = child(node.condition)
+            consequence = child(node.consequence)
+            alternative = child(node.alternative) if node.alternative else None
+            return IfExpression(condition, consequence, alternative)
+        case WhileExpression():
+            return WhileExpression(child(node.condition), child(node.body))
+        case ForExpression():
+            return ForExpression(node.ident, child(node.iterable), child(node.body))
+        case CallExpression():
+            return CallExpression(child(node.func), [child(arg) for arg in node.args])
+    return node
@@ -1,5 +1,5 @@
 from pycompiler.lexer import TokenType, Token, Lexer
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Any
 from enum import IntEnum
 
 
@@ -53,6 +53,8 @@ class LetStatement(Statement):
         assert ident.token_type == TokenType.IDENT
         self.ident: Token = ident
         self.expr: Expression = expr
+        # Symbols are filled in by the compiler's resolver
+        self.symbol: Any = None
         if isinstance(self.expr, LiteralExpression) and isinstance(self.expr.literal, FunctionLiteral):
             self.expr.literal.name = self.ident.token_value
 
@@ -91,6 +93,37 @@ class ExpressionStatement(Statement):
         return f"<ExpressionStatement: expr={self.expr}>"
 
 
+class ImportStatement(Statement):
+    def __init__(self, path: str):
+        self.path: str = path
+        # Names the module exports, filled in once the module has been resolved
+        self.names: Optional[List[str]] = None
+        self.symbols: List[Any] = []
+
+    def __eq__(self, other: object):
+        if not isinstance(other, ImportStatement):
+            return NotImplemented
+        return self.path == other.path
+
+    def __repr__(self):
+        return f"<ImportStatement: path={self.path}>"
+
+
+class IndexAssignStatement(Statement):
+    def __init__(self, collection: Expression, index: Expression, value: Expression):
+        self.collection: Expression = collection
+        self.index: Expression = index
+        self.value: Expression = value
+
+    def __eq__(self, other: object):
+        if not isinstance(other, IndexAssignStatement):
+            return NotImplemented
+        return self.collection == other.collection and self.index == other.index and self.value == other.value
+
+    def __repr__(self):
+        return f"<IndexAssignStatement: collection={self.collection}, index={self.index}, value={self.value}>"
+
+
 class BlockStatement(Statement):
     def __init__(self, statements: List[Statement]):
         self.statements: List[Statement] = statements
@@ -111,6 +144,7 @@ class Literal:
 class IdentifierLiteral(Literal):
     def __init__(self, token: Token):
         self.token: Token = token
+        self.symbol: Any = None
 
     def __eq__(self, other: object):
         if not isinstance(other, IdentifierLiteral):
@@ -154,6 +188,9 @@ class FunctionLiteral(Literal):
         self.arguments: List[Token] = arguments
         self.body: BlockStatement = body
         self.name: str = ""
+        # Symbols of the enclosing scope the closure captures, in GETFREE order
+        self.free_symbols: List[Any] = []
+        self.num_locals: int = 0
 
     def __eq__(self, other: object):
         if not isinstance(other, FunctionLiteral):
@@ -224,6 +261,8 @@ class PrefixExpression(Expression):
     def __init__(self, operator: Token, right: Expression):
         self.operator: Token = operator
         self.right: Expression = right
+        # Set by type inference when the operand is known to be an integer
+        self.int_operands: bool = False
 
     def __eq__(self, other: object):
         if not isinstance(other, PrefixExpression):
@@ -239,6 +278,8 @@ class InfixExpression(Expression):
         self.left: Expression = left
         self.operator: Token = operator
         self.right: Expression = right
+        # Set by type inference when both operands are known to be integers
+        self.int_operands: bool = False
 
     def __eq__(self, other: object):
         if not isinstance(other, InfixExpression):
@@ -277,6 +318,38 @@ class IfExpression(Expression):
         return f"<IfExpression: condition={self.condition}, consequence={self.consequence}, alternative={self.alternative}>"
 
 
+class WhileExpression(Expression):
+    def __init__(self, condition: Expression, body: BlockStatement):
+        self.condition: Expression = condition
+        self.body: BlockStatement = body
+
+    def __eq__(self, other: object):
+        if not isinstance(other, WhileExpression):
+            return NotImplemented
+        return self.condition == other.condition and self.body == other.body
+
+    def __repr__(self):
+        return f"<WhileExpression: condition={self.condition}, body={self.body}>"
+
+
+class ForExpression(Expression):
+    def __init__(self, ident: Token, iterable: Expression, body: BlockStatement):
+        assert ident.token_type == TokenType.IDENT
+        self.ident: Token = ident
+        self.iterable: Expression = iterable
+        self.body: BlockStatement = body
+        # Symbol of the loop variable, filled in by the compiler's resolver
+        self.symbol: Any = None
+
+    def __eq__(self, other: object):
+        if not isinstance(other, ForExpression):
+            return NotImplemented
+        return self.ident == other.ident and self.iterable == other.iterable and self.body == other.body
+
+    def __repr__(self):
+        return f"<ForExpression: ident={self.ident}, iterable={self.iterable}, body={self.body}>"
+
+
 class CallExpression(Expression):
     def __init__(self, func: Expression, args: List[Expression]):
         self.func: Expression = func
@@ -318,6 +391,8 @@ class Parser:
                 statement = self._parse_let_statement()
             case TokenType.RETURN:
                 statement = self._parse_return_statement()
+            case TokenType.IMPORT:
+                statement = self._parse_import_statement()
             case _:
                 statement = self._parse_expression_statement()
 
@@ -339,8 +414,22 @@ class Parser:
         self._next_token()
         return ReturnStatement(self._parse_expression(Precedence.LOWEST))
 
-    def _parse_expression_statement(self) -> ExpressionStatement:
-        return ExpressionStatement(self._parse_expression(Precedence.LOWEST))
+    def _parse_import_statement(self) -> ImportStatement:
+        return ImportStatement(self._expect_peek(TokenType.STRING).token_value)
+
+    def _parse_expression_statement(self) -> Statement:
+        expression: Expression = self._parse_expression(Precedence.LOWEST)
+        # An index followed by = assigns into the collection
+        if (
+            self.peek_token.token_type == TokenType.ASSIGN
+            and isinstance(expression, InfixExpression)
+            and expression.operator.token_type == TokenType.LBRACKET
+        ):
+            self._next_token()
+            self._next_token()
+            value: Expression = self._parse_expression(Precedence.LOWEST)
+            return IndexAssignStatement(expression.left, expression.right, value)
+        return ExpressionStatement(expression)
 
     def _parse_block_statement(self) -> BlockStatement:
         statements: List[Statement] = []
@@ -368,6 +457,10 @@ class Parser:
             left_expr = self._parse_group()
         elif self.cur_token.token_type == TokenType.IF:
             left_expr = self._parse_if()
+        elif self.cur_token.token_type == TokenType.WHILE:
+            left_expr = self._parse_while()
+        elif self.cur_token.token_type == TokenType.FOR:
+            left_expr = self._parse_for()
         else:
             raise Exception(
                 f"Did not find expression function for token type {self.cur_token.token_type.value}"
@@ -443,6 +536,28 @@ class Parser:
         else:
             return IfExpression(condition, consequence)
 
+    def _parse_while(self) -> WhileExpression:
+        self._expect_peek(TokenType.LPAREN)
+        self._next_token()
+        condition: Expression = self._parse_expression(Precedence.LOWEST)
+        self._expect_peek(TokenType.RPAREN)
+
+        self._expect_peek(TokenType.LBRACE)
+        self._next_token()
+        return WhileExpression(condition, self._parse_block_statement())
+
+    def _parse_for(self) -> ForExpression:
+        self._expect_peek(TokenType.LPAREN)
+        identifier: Token = self._expect_peek(TokenType.IDENT)
+        self._expect_peek(TokenType.IN)
+        self._next_token()
+        iterable: Expression = self._parse_expression(Precedence.LOWEST)
+        self._expect_peek(TokenType.RPAREN)
+
+        self._expect_peek(TokenType.LBRACE)
+        self._next_token()
+        return ForExpression(identifier, iterable, self._parse_block_statement())
+
     def _parse_function(self) -> FunctionLiteral:
         # Skip over fn keyword
         # Args list
@@ -1,24 +1,103 @@
-from pycompiler.parser import Parser
+from pycompiler.parser import Parser, Statement
 from pycompiler.lexer import Lexer
-from pycompiler.compiler import Compiler
-from pycompiler.vm import VM
+from pycompiler.compiler import Compiler, RegisterCompiler, Transpiler, write_disassembly
+from pycompiler.vm import VM, RegisterVM, NativeVM, ClosureCompiler, ClosureVM, TieredVM
+from pycompiler.optimizer import PassManager
+from pycompiler.cache import BytecodeCache
+from pycompiler.modules import ModuleBuilder
 
-from typing import List
+from typing import List, Tuple, Any, Optional, TextIO
+
+Error = str
+
+# Compiler and VM classes of every selectable backend
+BACKENDS = {
+    "stack": (Compiler, VM),
+    "register": (RegisterCompiler, RegisterVM),
+    "native": (Transpiler, NativeVM),
+    "closure": (ClosureCompiler, ClosureVM),
+    "tiered": (Compiler, TieredVM),
+}
+
+# Compiled closures cannot be written to disk, and rebuilding them is cheaper than a load anyway
+UNCACHED_BACKENDS = {"closure"}
 
 
 def new_compiler_with_state(old_compiler: Compiler) -> Compiler:
-    new_compiler = Compiler()
+    new_compiler = type(old_compiler)()
     new_compiler.symbol_table = old_compiler.symbol_table
     return new_compiler
 
 
 def new_vm_with_state(old_vm: VM, bytecode) -> VM:
-    new_vm = VM(bytecode)
+    new_vm = type(old_vm)(bytecode)
     new_vm.globals = old_vm.globals
     return new_vm
 
 
-def run():
+def compile_ast(ast: List[Statement], compiler, pass_manager: PassManager) -> Tuple[Any, Error | None]:
+    if isinstance(compiler, Compiler):
+        return pass_manager.compile(ast, compiler)
+    err = compiler.compile(pass_manager.run_ast(ast))
+    return compiler.bytecode(), err
+
+
+def compile_source(
+    source: str, backend: str = "stack", opt_level: int = 0, cache: Optional[BytecodeCache] = None
+) -> Tuple[Any, Error | None]:
+    key = None
+    if backend in UNCACHED_BACKENDS:
+        cache = None
+    if cache is not None:
+        key = cache.key(source, backend, str(opt_level))
+        bytecode = cache.get(key)
+        if bytecode is not None:
+            return bytecode, None
+
+    compiler_class, _ = BACKENDS[backend]
+    ast: List[Statement] = Parser(Lexer(source)).parse()
+    bytecode, err = compile_ast(ast, compiler_class(), PassManager(opt_level))
+    if err:
+        return bytecode, err
+    if cache is not None:
+        cache.put(key, bytecode)
+    return bytecode, None
+
+
+def compile_file(
+    path: str, backend: str = "stack", opt_level: int = 0, cache: Optional[BytecodeCache] = None
+) -> Tuple[Any, Error | None]:
+    if backend == "stack":
+        # Scripts on the stack backend may import modules
+        return ModuleBuilder(opt_level, cache=cache).build(path)
+    with open(path) as f:
+        source = f.read()
+    return compile_source(source, backend, opt_level, cache)
+
+
+def run_file(
+    path: str, backend: str = "stack", opt_level: int = 0, cache: Optional[BytecodeCache] = None
+) -> Error | None:
+    bytecode, err = compile_file(path, backend, opt_level, cache)
+    if err:
+        return err
+    _, vm_class = BACKENDS[backend]
+    return vm_class(bytecode).run()
+
+
+def disassemble_file(
+    path: str, out: TextIO, fmt: str = "text", opt_level: int = 0, cache: Optional[BytecodeCache] = None
+) -> Error | None:
+    bytecode, err = compile_file(path, "stack", opt_level, cache)
+    if err:
+        return err
+    write_disassembly(bytecode, out, fmt)
+    return None
+
+
+def run(backend: str = "stack", opt_level: int = 0):
+    compiler_class, vm_class = BACKENDS[backend]
+    pass_manager = PassManager(opt_level)
     compiler = None
     vm = None
     while True:
@@ -28,16 +107,16 @@ def run():
         if compiler:
             compiler = new_compiler_with_state(compiler)
         else:
-            compiler = Compiler()
-        err = compiler.compile(ast)
+            compiler = compiler_class()
+        bytecode, err = compile_ast(ast, compiler, pass_manager)
         if err:
             print(err)
             continue
 
         if vm:
-            vm = new_vm_with_state(vm, compiler.bytecode())
+            vm = new_vm_with_state(vm, bytecode)
         else:
-            vm = VM(compiler.bytecode())
+            vm = vm_class(bytecode)
         err = vm.run()
         if err:
             print(err)
@@ -1 +1,5 @@
 from .vm import *
+from .register import *
+from .native import *
+from .closures import *
+from .tiering import *
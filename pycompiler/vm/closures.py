@@ -0,0 +1,522 @@
+import operator
+import sys
+from typing import List, Tuple, Any, Callable, Optional
+
+from pycompiler.lexer import TokenType
+from pycompiler.objects import (
+    Object,
+    IntObject,
+    BooleanObject,
+    NullObject,
+    StringObject,
+    ArrayObject,
+    int_array,
+    ClosureObject,
+    ClosureFunctionObject,
+    Builtin,
+    BUILTINS,
+)
+from pycompiler.code import Opcode
+from pycompiler.compiler import Resolver, Symbol, SymbolTable, GLOBALSCOPE, BUILTINSCOPE, FREESCOPE, FUNCTIONSCOPE
+from pycompiler.parser import (
+    Statement,
+    LetStatement,
+    ReturnStatement,
+    ExpressionStatement,
+    ImportStatement,
+    IndexAssignStatement,
+    Expression,
+    LiteralExpression,
+    InfixExpression,
+    PrefixExpression,
+    IfExpression,
+    WhileExpression,
+    ForExpression,
+    CallExpression,
+    Literal,
+    IntLiteral,
+    FunctionLiteral,
+    BooleanLiteral,
+    StringLiteral,
+    ArrayLiteral,
+    MapLiteral,
+    IdentifierLiteral,
+)
+
+from .vm import binary_operation, comparison, index_operation, set_index, is_truthy, build_map
+
+Error = str
+
+# A frame is [globals, locals..., free values..., current closure]
+Frame = List[Any]
+Node = Callable[[Frame], Object]
+# The node that runs the whole program and the number of globals it needs
+ClosureProgram = Tuple[Node, int]
+# Calls a function value with evaluated arguments and the globals
+CallFunction = Callable[[Object, List[Object], List[Object]], Object]
+
+# Every Monkey call nests a handful of Python calls, so the limit is raised while a program runs
+RECURSION_LIMIT = 20000
+
+CLOSURE_ARITHMETIC = {
+    TokenType.PLUS: (Opcode.ADD, operator.add),
+    TokenType.MINUS: (Opcode.SUB, operator.sub),
+    TokenType.ASTERISK: (Opcode.MUL, operator.mul),
+    TokenType.SLASH: (Opcode.DIV, operator.floordiv),
+}
+
+CLOSURE_COMPARISON = {
+    TokenType.EQ: (Opcode.EQUAL, operator.eq),
+    TokenType.NOT_EQ: (Opcode.NOTEQUAL, operator.ne),
+    TokenType.GT: (Opcode.GREATERTHAN, operator.gt),
+}
+
+NULL = NullObject()
+
+
+class ClosureError(Exception):
+    pass
+
+
+class FunctionReturn(Exception):
+    # Unwinds a return that is not in tail position to the function that catches it
+    def __init__(self, value: Object) -> None:
+        self.value: Object = value
+
+
+def _checked(result: Object | Error) -> Object:
+    if isinstance(result, Error):
+        raise ClosureError(result)
+    return result
+
+
+def _constant(value: Object) -> Node:
+    return lambda frame: value
+
+
+def _sequence(nodes: List[Node]) -> Node:
+    # Evaluates to the value of the last node
+    if len(nodes) == 1:
+        return nodes[0]
+    head, last = nodes[:-1], nodes[-1]
+
+    def sequence(frame: Frame) -> Object:
+        for node in head:
+            node(frame)
+        return last(frame)
+
+    return sequence
+
+
+def _evaluate_all(nodes: List[Node]) -> Callable[[Frame], List[Object]]:
+    # Short lists are spelled out so the common calls skip the comprehension
+    match len(nodes):
+        case 0:
+            return lambda frame: []
+        case 1:
+            first = nodes[0]
+            return lambda frame: [first(frame)]
+        case 2:
+            first, second = nodes
+            return lambda frame: [first(frame), second(frame)]
+    return lambda frame: [node(frame) for node in nodes]
+
+
+def call_function(fn: Object, args: List[Object], globals: List[Object]) -> Object:
+    if type(fn) is ClosureObject:
+        func = fn.func
+        if len(args) != func.num_args:
+            raise ClosureError(f"wrong number of args: want {func.num_args}, got {len(args)}")
+        return func.value([globals, *args, *func.padding, *fn.free, fn])
+    elif type(fn) is Builtin:
+        return _checked(fn.func(args))
+    raise ClosureError("Error attempting to call non-function")
+
+
+class ClosureCompiler:
+    def __init__(self, call: CallFunction = call_function) -> None:
+        self.symbol_table: SymbolTable = SymbolTable()
+        for i, builtin in enumerate(BUILTINS):
+            self.symbol_table.define_builtin(i, builtin.name)
+
+        # Every call goes through this, so code embedded in another engine can call back into it
+        self.call: CallFunction = call
+
+        # Frame offset of the free values of each function being compiled, main has none
+        self.free_offsets: List[int] = [0]
+        # Whether each function being compiled has a return that must unwind
+        self.unwinds: List[bool] = [False]
+        self.program: Optional[ClosureProgram] = None
+
+    def compile(self, ast: List[Statement]) -> Error | None:
+        Resolver(self.symbol_table).resolve(ast)
+        # Each statement leaves what the VM would as last popped, the program returns the last one
+        nodes: List[Node] = []
+        for statement in ast:
+            node, err = self._statement(statement)
+            if err:
+                return err
+            nodes.append(node)
+        if not nodes:
+            nodes.append(_constant(Object()))
+        self.program = (self._catch_return(_sequence(nodes), self.unwinds[0]), self.symbol_table.num_defs)
+        return None
+
+    def bytecode(self) -> ClosureProgram:
+        return self.program
+
+    def compile_function(self, literal: FunctionLiteral) -> Tuple[Node, Error | None]:
+        # The body of an already resolved function, run with a frame laid out like a call's
+        self.free_offsets.append(1 + literal.num_locals)
+        self.unwinds.append(False)
+        body, err = self._block(literal.body.statements, True)
+        self.free_offsets.pop()
+        unwinds = self.unwinds.pop()
+        if err:
+            return body, err
+        return self._catch_return(body, unwinds), None
+
+    def _statement(self, statement: Statement) -> Tuple[Node, Error | None]:
+        match statement:
+            case LetStatement():
+                value, err = self._expression(statement.expr)
+                if err:
+                    return value, err
+                return self._store(statement.symbol, value), None
+            case ReturnStatement():
+                value, err = self._expression(statement.expr)
+                if err:
+                    return value, err
+                self.unwinds[-1] = True
+
+                def unwind(frame: Frame) -> Object:
+                    raise FunctionReturn(value(frame))
+
+                return unwind, None
+            case ExpressionStatement():
+                return self._expression(statement.expr)
+            case IndexAssignStatement():
+                return self._index_assign(statement)
+            case ImportStatement():
+                return NULL, f"import {statement.path} is not supported by the closure backend"
+        return NULL, f"{statement} type not implemented."
+
+    def _block(self, statements: List[Statement], tail: bool = False) -> Tuple[Node, Error | None]:
+        # A block evaluates to its last expression, or null when it ends with anything else.
+        # In tail position of a function a return is just that value.
+        nodes: List[Node] = []
+        for i, statement in enumerate(statements):
+            last = i == len(statements) - 1
+            if last and tail and isinstance(statement, ReturnStatement):
+                node, err = self._expression(statement.expr, True)
+            elif last and isinstance(statement, ExpressionStatement):
+                node, err = self._expression(statement.expr, tail)
+            else:
+                node, err = self._statement(statement)
+            if err:
+                return node, err
+            nodes.append(node)
+        if not statements or not isinstance(statements[-1], (ExpressionStatement, ReturnStatement)):
+            nodes.append(_constant(NULL))
+        return _sequence(nodes), None
+
+    def _store(self, symbol: Symbol, value: Node) -> Node:
+        if symbol.scope == GLOBALSCOPE:
+            index = symbol.index
+
+            def let_global(frame: Frame) -> Object:
+                result = frame[0][index] = value(frame)
+                return result
+
+            return let_global
+        slot = 1 + symbol.index
+
+        def let_local(frame: Frame) -> Object:
+            result = frame[slot] = value(frame)
+            return result
+
+        return let_local
+
+    def _index_assign(self, statement: IndexAssignStatement) -> Tuple[Node, Error | None]:
+        collection, err = self._expression(statement.collection)
+        if err:
+            return collection, err
+        index, err = self._expression(statement.index)
+        if err:
+            return index, err
+        value, err = self._expression(statement.value)
+        if err:
+            return value, err
+
+        def assign(frame: Frame) -> Object:
+            target = collection(frame)
+            err = set_index(target, index(frame), value(frame))
+            if err:
+                raise ClosureError(err)
+            return target
+
+        return assign, None
+
+    def _expression(self, expression: Expression, tail: bool = False) -> Tuple[Node, Error | None]:
+        match expression:
+            case LiteralExpression():
+                return self._literal(expression.literal)
+            case PrefixExpression():
+                return self._prefix(expression)
+            case InfixExpression():
+                return self._infix(expression)
+            case IfExpression():
+                return self._if(expression, tail)
+            case WhileExpression():
+                return self._while(expression)
+            case ForExpression():
+                return self._for(expression)
+            case CallExpression():
+                return self._call(expression)
+        return NULL, f"Expression {expression} not implemented"
+
+    def _prefix(self, expression: PrefixExpression) -> Tuple[Node, Error | None]:
+        right, err = self._expression(expression.right)
+        if err:
+            return right, err
+        match expression.operator.token_type:
+            case TokenType.BANG:
+                return lambda frame: BooleanObject(not is_truthy(right(frame))), None
+            case TokenType.MINUS:
+                if expression.int_operands:
+                    return lambda frame: IntObject(-right(frame).value), None
+
+                def minus(frame: Frame) -> Object:
+                    operand = right(frame)
+                    if type(operand) is not IntObject:
+                        raise ClosureError("- prefix is not supported for input type")
+                    return IntObject(-operand.value)
+
+                return minus, None
+        return right, f"Prefix for {expression.operator.token_type} not implemented."
+
+    def _infix(self, expression: InfixExpression) -> Tuple[Node, Error | None]:
+        token_type = expression.operator.token_type
+        # < evaluates its right operand first, like the GREATERTHAN the compiler swaps it into
+        swapped = token_type == TokenType.LT
+        first, err = self._expression(expression.right if swapped else expression.left)
+        if err:
+            return first, err
+        second, err = self._expression(expression.left if swapped else expression.right)
+        if err:
+            return second, err
+
+        if token_type == TokenType.LBRACKET:
+            return lambda frame: _checked(index_operation(first(frame), second(frame))), None
+        if token_type in CLOSURE_ARITHMETIC:
+            op, int_op = CLOSURE_ARITHMETIC[token_type]
+            if expression.int_operands:
+                return lambda frame: IntObject(int_op(first(frame).value, second(frame).value)), None
+
+            def arithmetic(frame: Frame) -> Object:
+                left = first(frame)
+                right = second(frame)
+                if type(left) is IntObject and type(right) is IntObject:
+                    return IntObject(int_op(left.value, right.value))
+                return _checked(binary_operation(op, left, right))
+
+            return arithmetic, None
+        if swapped:
+            op, int_op = Opcode.GREATERTHAN, operator.gt
+        elif token_type in CLOSURE_COMPARISON:
+            op, int_op = CLOSURE_COMPARISON[token_type]
+        else:
+            return NULL, f"Infix for {token_type} not implemented."
+        if expression.int_operands:
+            return lambda frame: BooleanObject(int_op(first(frame).value, second(frame).value)), None
+
+        def compare(frame: Frame) -> Object:
+            left = first(frame)
+            right = second(frame)
+            if type(left) is IntObject and type(right) is IntObject:
+                return BooleanObject(int_op(left.value, right.value))
+            return _checked(comparison(op, left, right))
+
+        return compare, None
+
+    def _if(self, expression: IfExpression, tail: bool) -> Tuple[Node, Error | None]:
+        condition, err = self._expression(expression.condition)
+        if err:
+            return condition, err
+        consequence, err = self._block(expression.consequence.statements, tail)
+        if err:
+            return consequence, err
+        alternative, err = self._block(expression.alternative.statements if expression.alternative else [], tail)
+        if err:
+            return alternative, err
+
+        def if_node(frame: Frame) -> Object:
+            if is_truthy(condition(frame)):
+                return consequence(frame)
+            return alternative(frame)
+
+        return if_node, None
+
+    def _while(self, expression: WhileExpression) -> Tuple[Node, Error | None]:
+        condition, err = self._expression(expression.condition)
+        if err:
+            return condition, err
+        body, err = self._block(expression.body.statements)
+        if err:
+            return body, err
+
+        def while_node(frame: Frame) -> Object:
+            while is_truthy(condition(frame)):
+                body(frame)
+            return NULL
+
+        return while_node, None
+
+    def _for(self, expression: ForExpression) -> Tuple[Node, Error | None]:
+        iterable, err = self._expression(expression.iterable)
+        if err:
+            return iterable, err
+        body, err = self._block(expression.body.statements)
+        if err:
+            return body, err
+        symbol = expression.symbol
+        is_global = symbol.scope == GLOBALSCOPE
+        slot = symbol.index if is_global else 1 + symbol.index
+
+        def for_node(frame: Frame) -> Object:
+            array = iterable(frame)
+            if not isinstance(array, ArrayObject):
+                raise ClosureError("for loop is not supported for input type")
+            variables = frame[0] if is_global else frame
+            if type(array) is ArrayObject:
+                # A list iterator walks the live list by index, as ITER_NEXT does
+                for value in array.value:
+                    variables[slot] = value
+                    body(frame)
+                return NULL
+            # Unboxed arrays from the baseline VM are read in place, boxing each element as it is reached
+            i = 0
+            while i < array.length():
+                variables[slot] = array.item(i)
+                i += 1
+                body(frame)
+            return NULL
+
+        return for_node, None
+
+    def _call(self, expression: CallExpression) -> Tuple[Node, Error | None]:
+        func, err = self._expression(expression.func)
+        if err:
+            return func, err
+        arg_nodes: List[Node] = []
+        for arg in expression.args:
+            node, err = self._expression(arg)
+            if err:
+                return node, err
+            arg_nodes.append(node)
+        args = _evaluate_all(arg_nodes)
+        call = self.call
+        return lambda frame: call(func(frame), args(frame), frame[0]), None
+
+    def _literal(self, literal: Literal) -> Tuple[Node, Error | None]:
+        match literal:
+            case IntLiteral():
+                return _constant(IntObject(literal.value)), None
+            case StringLiteral():
+                return _constant(StringObject(literal.value)), None
+            case BooleanLiteral():
+                return _constant(BooleanObject(literal.value)), None
+            case ArrayLiteral():
+                members: List[Node] = []
+                for member in literal.members:
+                    node, err = self._expression(member)
+                    if err:
+                        return node, err
+                    members.append(node)
+                values = _evaluate_all(members)
+                return lambda frame: int_array(values(frame)), None
+            case MapLiteral():
+                pairs: List[Node] = []
+                for key, value in literal.pairs:
+                    for part in (key, value):
+                        node, err = self._expression(part)
+                        if err:
+                            return node, err
+                        pairs.append(node)
+                flat = _evaluate_all(pairs)
+
+                def map_node(frame: Frame) -> Object:
+                    return _checked(build_map(flat(frame)))
+
+                return map_node, None
+            case IdentifierLiteral():
+                if literal.symbol is None:
+                    return NULL, f"Cannot resolve identifier {literal.token.token_value}"
+                return self._load(literal.symbol), None
+            case FunctionLiteral():
+                return self._function(literal)
+        return NULL, f"Literal {literal} not implemented"
+
+    def _load(self, symbol: Symbol) -> Node:
+        index = symbol.index
+        if symbol.scope == GLOBALSCOPE:
+            return lambda frame: frame[0][index]
+        elif symbol.scope == BUILTINSCOPE:
+            return _constant(BUILTINS[index])
+        elif symbol.scope == FREESCOPE:
+            slot = self.free_offsets[-1] + index
+            return lambda frame: frame[slot]
+        elif symbol.scope == FUNCTIONSCOPE:
+            return lambda frame: frame[-1]
+        slot = 1 + index
+        return lambda frame: frame[slot]
+
+    def _function(self, literal: FunctionLiteral) -> Tuple[Node, Error | None]:
+        body, err = self.compile_function(literal)
+        if err:
+            return body, err
+
+        func = ClosureFunctionObject(body, literal.num_locals, len(literal.arguments))
+        if not literal.free_symbols:
+            # Nothing to capture, so every evaluation can share one closure
+            return _constant(ClosureObject(func, [])), None
+        free = _evaluate_all([self._load(symbol) for symbol in literal.free_symbols])
+        return lambda frame: ClosureObject(func, free(frame)), None
+
+    def _catch_return(self, body: Node, unwinds: bool) -> Node:
+        if not unwinds:
+            return body
+
+        def function_body(frame: Frame) -> Object:
+            try:
+                return body(frame)
+            except FunctionReturn as ret:
+                return ret.value
+
+        return function_body
+
+
+class ClosureVM:
+    def __init__(self, program: ClosureProgram):
+        self.program: ClosureProgram = program
+        self.globals: List[Object] = []
+        self.result: Object = Object()
+
+    def last_popped(self) -> Object:
+        return self.result
+
+    def run(self) -> Error | None:
+        main, num_globals = self.program
+        if len(self.globals) < num_globals:
+            self.globals.extend([Object()] * (num_globals - len(self.globals)))
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(limit, RECURSION_LIMIT))
+        try:
+            self.result = main([self.globals])
+        except ClosureError as e:
+            return str(e)
+        except RecursionError:
+            return "Stack Overflow"
+        finally:
+            sys.setrecursionlimit(limit)
+        return None
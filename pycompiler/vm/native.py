@@ -0,0 +1,267 @@
+from types import CodeType
+from typing import List, Dict, Any, Callable
+
+from pycompiler.objects import (
+    Object,
+    IntObject,
+    BooleanObject,
+    NullObject,
+    StringObject,
+    ArrayObject,
+    MapObject,
+    NativeFunctionObject,
+    BUILTINS,
+)
+from pycompiler.code import Opcode
+
+from .vm import binary_operation, comparison
+
+Error = str
+
+
+class NativeError(Exception):
+    pass
+
+
+# Globals before their let and a program that produced nothing, like the VM's empty slots
+native_unset = Object()
+# Default of every parameter, so a call with too few arguments can be told apart
+native_missing = object()
+
+
+def box(value: Any) -> Object:
+    # Native values are ints, bools, strs, None, lists, dicts and functions
+    match value:
+        case bool():
+            return BooleanObject(value)
+        case int():
+            return IntObject(value)
+        case str():
+            return StringObject(value)
+        case None:
+            return NullObject()
+        case Object():
+            return value
+    return _box_container(value, {})
+
+
+def _box_container(value: Any, seen: Dict[int, Object]) -> Object:
+    # A list can hold itself once index assignment exists
+    if id(value) in seen:
+        return seen[id(value)]
+    if type(value) is list:
+        array = ArrayObject([])
+        seen[id(value)] = array
+        array.value = [_box_container(v, seen) if type(v) in (list, dict) else box(v) for v in value]
+        return array
+    if type(value) is dict:
+        map = MapObject({})
+        seen[id(value)] = map
+        map.value = {box(k): _box_container(v, seen) if type(v) in (list, dict) else box(v) for k, v in value.items()}
+        return map
+    builtin = BUILTIN_OBJECTS.get(value)
+    if builtin is not None:
+        return builtin
+    return NativeFunctionObject(value)
+
+
+def _binary(op: Opcode, left: Any, right: Any) -> Any:
+    # Anything past the integer fast path gets exactly the VM's semantics and messages
+    result = binary_operation(op, box(left), box(right))
+    if isinstance(result, Error):
+        raise NativeError(result)
+    return result.value
+
+
+def _comparison(op: Opcode, left: Any, right: Any) -> bool:
+    result = comparison(op, box(left), box(right))
+    if isinstance(result, Error):
+        raise NativeError(result)
+    return result.value
+
+
+def native_add(left: Any, right: Any) -> Any:
+    if type(left) is str and type(right) is str:
+        return left + right
+    return _binary(Opcode.ADD, left, right)
+
+
+def native_sub(left: Any, right: Any) -> Any:
+    return _binary(Opcode.SUB, left, right)
+
+
+def native_mul(left: Any, right: Any) -> Any:
+    return _binary(Opcode.MUL, left, right)
+
+
+def native_div(left: Any, right: Any) -> Any:
+    return _binary(Opcode.DIV, left, right)
+
+
+def native_equal(left: Any, right: Any) -> bool:
+    return _comparison(Opcode.EQUAL, left, right)
+
+
+def native_not_equal(left: Any, right: Any) -> bool:
+    return _comparison(Opcode.NOTEQUAL, left, right)
+
+
+def native_greater_than(left: Any, right: Any) -> bool:
+    return _comparison(Opcode.GREATERTHAN, left, right)
+
+
+def native_minus(operand: Any) -> Any:
+    if type(operand) is int:
+        return -operand
+    raise NativeError("- prefix is not supported for input type")
+
+
+def native_key(key: Any) -> Any:
+    # Only IntObject and StringObject hash, and a bool key must not collide with 0 or 1
+    if type(key) is int or type(key) is str:
+        return key
+    raise NativeError("unusable as hash key")
+
+
+def native_index(left: Any, index: Any) -> Any:
+    # Lists and dicts are indexed in place, boxing them would lose their identity
+    if type(left) is list and type(index) is int:
+        if index < 0 or index > len(left) - 1:
+            return None
+        return left[index]
+    elif type(left) is dict:
+        return left.get(native_key(index))
+    raise NativeError("Index operator not implemented for input types")
+
+
+def native_set_index(collection: Any, index: Any, value: Any) -> None:
+    if type(collection) is list and type(index) is int:
+        if index < 0 or index >= len(collection):
+            raise NativeError("Index out of range for assignment")
+        collection[index] = value
+    elif type(collection) is dict and (type(index) is int or type(index) is str):
+        collection[index] = value
+    else:
+        raise NativeError("Index assignment not implemented for input types")
+
+
+def native_iterate(iterable: Any) -> List[Any]:
+    if type(iterable) is not list:
+        raise NativeError("for loop is not supported for input type")
+    return iterable
+
+
+def native_wrong_args(want: int, extra: tuple, *params: Any) -> None:
+    got = sum(1 for param in params if param is not native_missing) + len(extra)
+    raise NativeError(f"wrong number of args: want {want}, got {got}")
+
+
+def _check_array(args: tuple, count: int) -> List[Any]:
+    if len(args) != count:
+        raise NativeError(f"wrong number of args: need {count}")
+    if type(args[0]) is not list:
+        raise NativeError("arg is wrong type, must be array")
+    return args[0]
+
+
+def native_len(*args: Any) -> Any:
+    return len(_check_array(args, 1))
+
+
+def native_puts(*args: Any) -> Any:
+    for arg in args:
+        print(box(arg).value)
+    return None
+
+
+def native_first(*args: Any) -> Any:
+    arr = _check_array(args, 1)
+    if len(arr) > 1:
+        return arr[0]
+    return None
+
+
+def native_last(*args: Any) -> Any:
+    arr = _check_array(args, 1)
+    if len(arr) > 1:
+        return arr[-1]
+    return None
+
+
+def native_push(*args: Any) -> Any:
+    return _check_array(args, 2) + [args[1]]
+
+
+def native_rest(*args: Any) -> Any:
+    arr = _check_array(args, 1)
+    if len(arr) > 1:
+        # Element arrays are copied like the builtin copies them, so neither side sees the other's stores
+        return [list(obj) if type(obj) is list else obj for obj in arr[1:]]
+    return None
+
+
+def native_append(*args: Any) -> Any:
+    arr = _check_array(args, 2)
+    arr.append(args[1])
+    return arr
+
+
+NATIVE_BUILTINS: Dict[str, Callable] = {
+    "len": native_len,
+    "puts": native_puts,
+    "first": native_first,
+    "last": native_last,
+    "push": native_push,
+    "rest": native_rest,
+    "append": native_append,
+}
+
+BUILTIN_OBJECTS: Dict[Callable, Object] = {NATIVE_BUILTINS[builtin.name]: builtin for builtin in BUILTINS}
+
+NATIVE_RUNTIME: Dict[str, Any] = {
+    "native_unset": native_unset,
+    "native_missing": native_missing,
+    "native_add": native_add,
+    "native_sub": native_sub,
+    "native_mul": native_mul,
+    "native_div": native_div,
+    "native_equal": native_equal,
+    "native_not_equal": native_not_equal,
+    "native_greater_than": native_greater_than,
+    "native_minus": native_minus,
+    "native_key": native_key,
+    "native_index": native_index,
+    "native_set_index": native_set_index,
+    "native_iterate": native_iterate,
+    "native_wrong_args": native_wrong_args,
+}
+# The transpiler names builtins by their index in BUILTINS
+for i, builtin in enumerate(BUILTINS):
+    NATIVE_RUNTIME[f"b{i}"] = NATIVE_BUILTINS[builtin.name]
+
+
+class NativeVM:
+    def __init__(self, code: CodeType):
+        self.code: CodeType = code
+        # Monkey globals live here as g0, g1, ... next to the runtime
+        self.globals: Dict[str, Any] = dict(NATIVE_RUNTIME)
+        self.result: Object = Object()
+
+    def last_popped(self) -> Object:
+        return self.result
+
+    def run(self) -> Error | None:
+        try:
+            exec(self.code, self.globals)
+            self.result = box(self.globals["main"]())
+        except NativeError as e:
+            return str(e)
+        except RecursionError:
+            return "Stack Overflow"
+        except UnboundLocalError:
+            return "local used before it was assigned"
+        except TypeError as e:
+            if "object is not callable" not in str(e):
+                raise
+            return "Error attempting to call non-function"
+        return None
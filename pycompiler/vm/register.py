@@ -0,0 +1,188 @@
+from pycompiler.objects import (
+    Object,
+    IntObject,
+    BooleanObject,
+    NullObject,
+    ArrayObject,
+    int_array,
+    IteratorObject,
+    RegisterFunctionObject,
+    ClosureObject,
+    Builtin,
+    BUILTINS,
+)
+from pycompiler.compiler import RegisterBytecode
+from pycompiler.code import Opcode, RegOpcode
+
+from typing import List, Dict
+
+from .vm import GLOBALS_SIZE, binary_operation, comparison, index_operation, set_index, is_truthy, build_map
+
+MAX_FRAMES = 2048
+
+Error = str
+
+BINARY_OPCODES: Dict[RegOpcode, Opcode] = {
+    RegOpcode.ADD: Opcode.ADD,
+    RegOpcode.SUB: Opcode.SUB,
+    RegOpcode.MUL: Opcode.MUL,
+    RegOpcode.DIV: Opcode.DIV,
+}
+
+COMPARISON_OPCODES: Dict[RegOpcode, Opcode] = {
+    RegOpcode.EQUAL: Opcode.EQUAL,
+    RegOpcode.NOTEQUAL: Opcode.NOTEQUAL,
+    RegOpcode.GREATERTHAN: Opcode.GREATERTHAN,
+}
+
+
+class RegisterFrame:
+    def __init__(self, cl: ClosureObject, return_register: int) -> None:
+        self.pc: int = 0
+        self.cl: ClosureObject = cl
+        self.registers: List[Object] = [NullObject()] * cl.func.num_registers
+        # Register of the calling frame that receives the return value
+        self.return_register: int = return_register
+
+
+class RegisterVM:
+    def __init__(self, bytecode: RegisterBytecode):
+        self.constants: List[Object] = bytecode[1]
+
+        main = RegisterFunctionObject(bytecode[0], bytecode[2], 0, 0)
+        self.frames: List[RegisterFrame] = [RegisterFrame(ClosureObject(main, []), 0)]
+
+        self.globals: List[Object] = [Object()] * GLOBALS_SIZE
+        self.result: Object = Object()
+        self.executed: int = 0
+
+    def last_popped(self) -> Object:
+        return self.result
+
+    def run(self) -> Error | None:
+        frame = self.frames[-1]
+        ins = frame.cl.func.value
+        regs = frame.registers
+        pc = frame.pc
+        executed = self.executed
+
+        try:
+            while pc < len(ins):
+                op, a, b, c = ins[pc]
+                pc += 1
+                executed += 1
+
+                if op == RegOpcode.MOVE:
+                    regs[a] = regs[b]
+                elif op == RegOpcode.LOADK:
+                    regs[a] = self.constants[b]
+                elif op in BINARY_OPCODES:
+                    result = binary_operation(BINARY_OPCODES[op], regs[b], regs[c])
+                    if isinstance(result, Error):
+                        return result
+                    regs[a] = result
+                elif op in COMPARISON_OPCODES:
+                    result = comparison(COMPARISON_OPCODES[op], regs[b], regs[c])
+                    if isinstance(result, Error):
+                        return result
+                    regs[a] = result
+                elif op == RegOpcode.JUMPCOND:
+                    if not is_truthy(regs[a]):
+                        pc = b
+                elif op == RegOpcode.JUMP:
+                    pc = a
+                elif op == RegOpcode.ITER_INIT:
+                    if not isinstance(regs[b], ArrayObject):
+                        return "for loop is not supported for input type"
+                    regs[a] = IteratorObject(regs[b])
+                elif op == RegOpcode.ITER_NEXT:
+                    iterator = regs[a]
+                    if iterator.index < iterator.value.length():
+                        regs[c] = iterator.value.item(iterator.index)
+                        iterator.index += 1
+                    else:
+                        pc = b
+                elif op == RegOpcode.GETGLOBAL:
+                    if b >= len(self.globals):
+                        self._grow_globals(b)
+                    regs[a] = self.globals[b]
+                elif op == RegOpcode.SETGLOBAL:
+                    if a >= len(self.globals):
+                        self._grow_globals(a)
+                    self.globals[a] = regs[b]
+                elif op == RegOpcode.GETFREE:
+                    regs[a] = frame.cl.free[b]
+                elif op == RegOpcode.GETBUILTIN:
+                    regs[a] = BUILTINS[b]
+                elif op == RegOpcode.CURRENTCLOSURE:
+                    regs[a] = frame.cl
+                elif op == RegOpcode.LOADTRUE:
+                    regs[a] = BooleanObject(True)
+                elif op == RegOpcode.LOADFALSE:
+                    regs[a] = BooleanObject(False)
+                elif op == RegOpcode.LOADNULL:
+                    regs[a] = NullObject()
+                elif op == RegOpcode.BANG:
+                    regs[a] = BooleanObject(not is_truthy(regs[b]))
+                elif op == RegOpcode.MINUS:
+                    operand = regs[b]
+                    if not isinstance(operand, IntObject):
+                        return "- prefix is not supported for input type"
+                    regs[a] = IntObject(-1 * operand.value)
+                elif op == RegOpcode.INDEX:
+                    result = index_operation(regs[b], regs[c])
+                    if isinstance(result, Error):
+                        return result
+                    regs[a] = result
+                elif op == RegOpcode.SETINDEX:
+                    err = set_index(regs[a], regs[b], regs[c])
+                    if err:
+                        return err
+                elif op == RegOpcode.ARRAY:
+                    regs[a] = int_array(regs[b : b + c])
+                elif op == RegOpcode.MAP:
+                    result = build_map(regs[b : b + 2 * c])
+                    if isinstance(result, Error):
+                        return result
+                    regs[a] = result
+                elif op == RegOpcode.CLOSURE:
+                    func = self.constants[b]
+                    regs[a] = ClosureObject(func, regs[c : c + func.num_free])
+                elif op == RegOpcode.CALL:
+                    fn = regs[b]
+                    if isinstance(fn, ClosureObject):
+                        if c != fn.func.num_args:
+                            return f"wrong number of args: want {fn.func.num_args}, got {c}"
+                        if len(self.frames) >= MAX_FRAMES:
+                            return "Stack Overflow"
+                        frame.pc = pc
+                        callee = RegisterFrame(fn, a)
+                        callee.registers[:c] = regs[b + 1 : b + 1 + c]
+                        self.frames.append(callee)
+                        frame, ins, regs, pc = callee, fn.func.value, callee.registers, 0
+                    elif isinstance(fn, Builtin):
+                        result = fn.func(regs[b + 1 : b + 1 + c])
+                        if isinstance(result, Error):
+                            return result
+                        regs[a] = result
+                    else:
+                        return "Error attempting to call non-function"
+                elif op == RegOpcode.RETURNVALUE or op == RegOpcode.RETURN:
+                    value = regs[a] if op == RegOpcode.RETURNVALUE else NullObject()
+                    if len(self.frames) == 1:
+                        self.result = value
+                        break
+                    return_register = self.frames.pop().return_register
+                    frame = self.frames[-1]
+                    ins, regs, pc = frame.cl.func.value, frame.registers, frame.pc
+                    regs[return_register] = value
+                elif op == RegOpcode.RESULT:
+                    self.result = regs[a]
+        finally:
+            frame.pc = pc
+            self.executed = executed
+        return None
+
+    def _grow_globals(self, index: int) -> None:
+        # Past the preallocated globals, unset ones read as an empty object
+        self.globals.extend([Object()] * (index + 1 - len(self.globals)))
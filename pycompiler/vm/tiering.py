@@ -0,0 +1,162 @@
+import sys
+from copy import deepcopy
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+from pycompiler.objects import Object, IntObject, CompiledFunctionObject, ClosureObject, ClosureFunctionObject
+from pycompiler.compiler import Bytecode
+from pycompiler.optimizer import StaticType, TypeInference
+from pycompiler.parser import FunctionLiteral
+
+from .vm import VM
+from .closures import ClosureCompiler, ClosureError, Node, Frame, RECURSION_LIMIT, call_function
+
+Error = str
+
+
+class TieringPolicy:
+    def __init__(
+        self,
+        call_threshold: int = 50,
+        back_edge_threshold: int = 500,
+        max_deopts: int = 8,
+        background: bool = True,
+    ) -> None:
+        self.call_threshold: int = call_threshold
+        # Loop iterations also count, a function called once can still be where the time goes
+        self.back_edge_threshold: int = back_edge_threshold
+        # Calls rejected by a specialized tier before it is replaced by a generic one
+        self.max_deopts: int = max_deopts
+        # Compile on a worker thread and keep running the baseline until it is done
+        self.background: bool = background
+
+    def is_hot(self, func: CompiledFunctionObject) -> bool:
+        return func.calls >= self.call_threshold or func.back_edges >= self.back_edge_threshold
+
+
+class Tier:
+    def __init__(self, body: Node, int_args: List[int], num_padding: int) -> None:
+        self.body: Node = body
+        # Arguments the body was specialized to receive as integers
+        self.int_args: List[int] = int_args
+        self.padding: List[Object] = [Object()] * num_padding
+        self.deopts: int = 0
+
+    def accepts(self, args: List[Object]) -> bool:
+        for i in self.int_args:
+            if type(args[i]) is not IntObject:
+                return False
+        return True
+
+
+def compile_tier(literal: FunctionLiteral, arg_types: List[StaticType], compiler: ClosureCompiler) -> Optional[Tier]:
+    # Assumed argument types let the type pass prove more of the body, the caller guards them on entry.
+    # Inference annotates the literal in place, so it must be a copy only this tier uses
+    TypeInference().infer_function(literal, arg_types)
+    body, err = compiler.compile_function(literal)
+    if err:
+        return None
+    int_args = [i for i, arg_type in enumerate(arg_types) if arg_type == StaticType.INT]
+    return Tier(body, int_args, literal.num_locals - len(literal.arguments))
+
+
+_tier_compiler: Optional[ThreadPoolExecutor] = None
+
+
+def _background() -> ThreadPoolExecutor:
+    # One worker, so two compiles never annotate the same source at once
+    global _tier_compiler
+    if _tier_compiler is None:
+        _tier_compiler = ThreadPoolExecutor(1, thread_name_prefix="monkey-tier")
+    return _tier_compiler
+
+
+class TieredVM(VM):
+    def __init__(self, bytecode: Bytecode, policy: Optional[TieringPolicy] = None):
+        super().__init__(bytecode)
+        self.policy: TieringPolicy = policy or TieringPolicy()
+        self.promoted: int = 0
+        self.deoptimized: int = 0
+
+    def _execute_closure(self, cl: ClosureObject, num_args: int) -> Error | None:
+        func = cl.func
+        if type(func) is ClosureFunctionObject:
+            # Created by tiered code and handed back to the baseline
+            if num_args != func.num_args:
+                return f"wrong number of args: want {func.num_args}, got {num_args}"
+            args = self.stack[self.sp - num_args : self.sp]
+            return self._run_tier(func.value, [self.globals, *args, *func.padding, *cl.free, cl], num_args)
+        if func.tier is None and (func.literal is None or not self.policy.is_hot(func)):
+            return super()._execute_closure(cl, num_args)
+        args = self.stack[self.sp - num_args : self.sp]
+        if num_args == func.num_args:
+            tier = self._tier(func, args)
+            if tier is not None:
+                func.calls += 1
+                return self._run_tier(tier.body, [self.globals, *args, *tier.padding, *cl.free, cl], num_args)
+        return super()._execute_closure(cl, num_args)
+
+    def _run_tier(self, body: Node, frame: Frame, num_args: int) -> Error | None:
+        # Tiered code nests Python calls for every Monkey call, the limit is only raised while it runs
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(limit, RECURSION_LIMIT))
+        try:
+            result = body(frame)
+        except ClosureError as e:
+            return str(e)
+        except RecursionError:
+            return "Stack Overflow"
+        finally:
+            sys.setrecursionlimit(limit)
+        self.sp = self.sp - num_args - 1
+        return self.push(result)
+
+    def _call_from_tier(self, fn: Object, args: List[Object], globals: List[Object]) -> Object:
+        # Baseline functions run in this VM, which also picks their tier
+        if type(fn) is ClosureObject and isinstance(fn.func, CompiledFunctionObject):
+            result = self.call_closure(fn, args)
+            if isinstance(result, Error):
+                raise ClosureError(result)
+            return result
+        return call_function(fn, args, globals)
+
+    def _tier(self, func: CompiledFunctionObject, args: List[Object]) -> Optional[Tier]:
+        tier = func.tier
+        if tier is None:
+            if func.literal is None or not self.policy.is_hot(func):
+                return None
+            self._promote(func, [StaticType.INT if type(arg) is IntObject else StaticType.UNKNOWN for arg in args])
+            tier = func.tier
+        if isinstance(tier, Future):
+            # Swapped in at the first call after the compile finishes
+            if not tier.done():
+                return None
+            tier = self._install(func, tier.result())
+            if tier is None:
+                return None
+        if tier.accepts(args):
+            return tier
+
+        # The assumption broke, this call runs in the baseline and enough of them drop the specialization
+        self.deoptimized += 1
+        tier.deopts += 1
+        if tier.deopts >= self.policy.max_deopts and tier.int_args:
+            self._promote(func, [StaticType.UNKNOWN] * len(args))
+        return None
+
+    def _promote(self, func: CompiledFunctionObject, arg_types: List[StaticType]) -> None:
+        self.promoted += 1
+        compiler = ClosureCompiler(self._call_from_tier)
+        # Copied here, the worker never touches the AST the baseline and later compiles share
+        literal = deepcopy(func.literal)
+        if self.policy.background:
+            func.tier = _background().submit(compile_tier, literal, arg_types, compiler)
+        else:
+            self._install(func, compile_tier(literal, arg_types, compiler))
+
+    def _install(self, func: CompiledFunctionObject, tier: Optional[Tier]) -> Optional[Tier]:
+        func.tier = tier
+        if tier is None:
+            # It cannot be compiled, so it is never promoted again
+            func.literal = None
+        return tier
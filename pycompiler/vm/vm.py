@@ -6,21 +6,136 @@ from pycompiler.objects import (
     StringObject,
     ArrayObject,
     MapObject,
+    IteratorObject,
+    int_array,
     CompiledFunctionObject,
     ClosureObject,
     Builtin,
     BUILTINS,
 )
 from pycompiler.compiler import Bytecode
-from pycompiler.code import Instructions, Opcode
+from pycompiler.code import (
+    Instructions,
+    Opcode,
+    DEFINITIONS,
+    DEFINITIONS_BY_VALUE,
+    WIDE_OPERAND_WIDTH,
+    lookup_opcode,
+    verify_function,
+)
 
-from typing import List, Dict
+from typing import List, Dict, Callable
 
 STACK_SIZE = 2048
 GLOBALS_SIZE = 65536
 
 Error = str
 
+# Only these hash by value, anything else as a key is an error rather than a Python exception
+HASH_KEY_TYPES = (IntObject, StringObject)
+
+# Returned by a handler when the frame that call_closure entered returns, not an error
+_RETURNED = object()
+
+
+def binary_operation(op: Opcode, left: Object, right: Object) -> Object | Error:
+    if isinstance(left, IntObject) and isinstance(right, IntObject):
+        right_int: int = right.value
+        left_int: int = left.value
+        match op:
+            case Opcode.ADD:
+                return IntObject(left_int + right_int)
+            case Opcode.SUB:
+                return IntObject(left_int - right_int)
+            case Opcode.MUL:
+                return IntObject(left_int * right_int)
+            case Opcode.DIV:
+                return IntObject(left_int // right_int)
+            case _:
+                return f"IntObject arithmetic not found for {op}"
+    elif isinstance(left, StringObject) and isinstance(right, StringObject):
+        match op:
+            case Opcode.ADD:
+                return StringObject(left.value + right.value)
+            case _:
+                return f"IntObject arithmetic not found for {op}"
+    return "Cannot find arithmetic function for input types."
+
+
+def _compared(obj: Object):
+    # Arrays compare by their elements, an unboxed one hands out boxed copies and stays unboxed
+    if isinstance(obj, ArrayObject):
+        return obj.elements()
+    return obj.value
+
+
+def comparison(op: Opcode, left: Object, right: Object) -> Object | Error:
+    if isinstance(left, IntObject) and isinstance(right, IntObject):
+        right_val: int = right.value
+        left_val: int = left.value
+        match op:
+            case Opcode.EQUAL:
+                return BooleanObject(left_val == right_val)
+            case Opcode.NOTEQUAL:
+                return BooleanObject(left_val != right_val)
+            case Opcode.GREATERTHAN:
+                return BooleanObject(left_val > right_val)
+            case _:
+                return f"IntObject comparison not found for {op}"
+    elif isinstance(left, NullObject) and isinstance(right, NullObject):
+        return BooleanObject(True)
+    left_val, right_val = _compared(left), _compared(right)
+    match op:
+        case Opcode.EQUAL:
+            return BooleanObject(left_val == right_val)
+        case Opcode.NOTEQUAL:
+            return BooleanObject(left_val != right_val)
+        case Opcode.GREATERTHAN:
+            return BooleanObject(left_val > right_val)
+        case _:
+            return f"Object comparison not found for {op}"
+
+
+def index_operation(left: Object, index: Object) -> Object | Error:
+    if isinstance(left, ArrayObject) and isinstance(index, IntObject):
+        return left.get(index)
+    elif isinstance(left, MapObject):
+        if not isinstance(index, HASH_KEY_TYPES):
+            return "unusable as hash key"
+        return left.get(index)
+    return "Index operator not implemented for input types"
+
+
+def build_map(keys_and_values: List[Object]) -> Object | Error:
+    map: Dict[Object, Object] = {}
+    for i in range(0, len(keys_and_values), 2):
+        key = keys_and_values[i]
+        if not isinstance(key, HASH_KEY_TYPES):
+            return "unusable as hash key"
+        map[key] = keys_and_values[i + 1]
+    return MapObject(map)
+
+
+def set_index(collection: Object, index: Object, value: Object) -> Error | None:
+    # Mutates in place, every reference to the collection sees the change
+    if isinstance(collection, ArrayObject) and isinstance(index, IntObject):
+        if index.value < 0 or index.value >= collection.length():
+            return "Index out of range for assignment"
+        collection.set(index.value, value)
+        return None
+    elif isinstance(collection, MapObject) and isinstance(index, HASH_KEY_TYPES):
+        collection.value[index] = value
+        return None
+    return "Index assignment not implemented for input types"
+
+
+def is_truthy(obj: Object) -> bool:
+    if isinstance(obj, NullObject):
+        return False
+    if isinstance(obj, ArrayObject):
+        return obj.length() > 0
+    return bool(obj.value)
+
 
 class Frame:
     def __init__(self, cl, base_pointer: int) -> None:
@@ -43,6 +158,13 @@ class VM:
         self.sp: int = 0
 
         self.globals: List[Object] = [Object()] * GLOBALS_SIZE
+        self.executed: int = 0
+        # Frame that a call_closure made from outside the loop returns to
+        self.return_frame: int = -1
+        # Indexed by opcode byte, every defined opcode has an _op_ method taking its operands
+        self.handlers: List[Callable[..., Error | None] | None] = [None] * len(DEFINITIONS_BY_VALUE)
+        for op, definition in DEFINITIONS.items():
+            self.handlers[op.value] = getattr(self, "_op_" + definition.name.lower())
 
     def stack_top(self) -> Object:
         if self.sp == 0:
@@ -60,213 +182,261 @@ class VM:
         self.sp += 1
         return None
 
+    def _push(self, obj: Object) -> None:
+        # Verified code stays within the depth checked when its frame was entered
+        self.stack[self.sp] = obj
+        self.sp += 1
+
     def pop(self) -> Object:
         self.sp -= 1
         return self.stack[self.sp]
 
     def run(self) -> Error | None:
-        ip: int
-        ins: Instructions
-        op: Opcode
-        operand: Object
-
-        while self._current_frame().ip < len(self._current_frame().get_instructions()) - 1:
-            self._current_frame().ip += 1
-            ip = self._current_frame().ip
-            ins = self._current_frame().get_instructions()
-            op = Opcode(ins[ip])
-
-            if op == Opcode.CONSTANT:
-                index = int.from_bytes(
-                    ins[ip + 1 : ip + 3], byteorder="big"
-                )
-                self._current_frame().ip += 2
-                err = self.push(self.constants[index])
-                if err:
-                    return err
-            elif op == Opcode.CLOSURE:
-                index = int.from_bytes(
-                    ins[ip + 1 : ip + 3], byteorder="big"
-                )
-                num_free = int.from_bytes(
-                    ins[ip + 3 : ip + 4], byteorder="big"
-                )
-                self._current_frame().ip += 3
-                free = []
-                for i in range(0, num_free):
-                    free.append(self.stack[self.sp-num_free+i])
-                err = self.push(ClosureObject(self.constants[index], free))
-                if err:
-                    return err
-            elif (
-                op == Opcode.ADD
-                or op == Opcode.SUB
-                or op == Opcode.MUL
-                or op == Opcode.DIV
-            ):
-                err = self._execute_binary_op(op)
-                if err:
-                    return err
-            elif (
-                op == Opcode.EQUAL or op == Opcode.NOTEQUAL or op == Opcode.GREATERTHAN
-            ):
-                err = self._execute_comparison(op)
-                if err:
-                    return err
-            elif op == Opcode.BANG:
-                operand = self.pop()
-                err = self.push(BooleanObject(not self._is_truthy(operand)))
-                if err:
-                    return err
-            elif op == Opcode.MINUS:
-                operand = self.pop()
-                if isinstance(operand, IntObject):
-                    err = self.push(IntObject(-1 * operand.value))
-                    if err:
-                        return err
-                else:
-                    return "- prefix is not supported for input type"
-            elif op == Opcode.TRUE:
-                err = self.push(BooleanObject(True))
-                if err:
-                    return err
-            elif op == Opcode.FALSE:
-                err = self.push(BooleanObject(False))
-                if err:
-                    return err
-            elif op == Opcode.JUMP:
-                pos = int.from_bytes(
-                    ins[ip + 1 : ip + 3], byteorder="big"
-                )
-                self._current_frame().ip = pos - 1
-            elif op == Opcode.JUMPCOND:
-                pos = int.from_bytes(
-                    ins[ip + 1 : ip + 3], byteorder="big"
+        if self.frame_index == 0:
+            err = self._reserve(self.frames[0].cl.func, self.sp)
+            if err:
+                return err
+        handlers = self.handlers
+        definitions = DEFINITIONS_BY_VALUE
+
+        while True:
+            frame = self.frames[self.frame_index]
+            ins = frame.cl.func.value
+            ip = frame.ip + 1
+            if ip >= len(ins):
+                return None
+            value = ins[ip]
+            definition = definitions[value]
+            if definition is None:
+                return f"unknown opcode {value}"
+            # Skip past the operands first, jumps overwrite it
+            frame.ip = ip + definition.size - 1
+            self.executed += 1
+
+            if definition.size == 1:
+                err = handlers[value]()
+            else:
+                err = handlers[value](
+                    *[int.from_bytes(ins[ip + start : ip + end], byteorder="big") for start, end in definition.offsets]
                 )
-                self._current_frame().ip += 2
+            if err is not None:
+                if err is _RETURNED:
+                    return None
+                return err
 
-                if not self._is_truthy(self.pop()):
-                    self._current_frame().ip = pos - 1
-            elif op == Opcode.SETGLOBAL:
-                idx = int.from_bytes(
-                    ins[ip + 1 : ip + 3], byteorder="big"
-                )
-                self._current_frame().ip += 2
-                self.globals[idx] = self.pop()
-            elif op == Opcode.GETGLOBAL:
-                idx = int.from_bytes(
-                    ins[ip + 1 : ip + 3], byteorder="big"
-                )
-                self._current_frame().ip += 2
-                err = self.push(self.globals[idx])
-                if err:
-                    return err
-            elif op == Opcode.SETLOCAL:
-                idx = int.from_bytes(
-                    ins[ip + 1 : ip + 2], byteorder="big"
-                )
-                self._current_frame().ip += 1
-                self.stack[self._current_frame().base_pointer + idx] = self.pop()
-            elif op == Opcode.GETLOCAL:
-                idx = int.from_bytes(
-                    ins[ip + 1 : ip + 2], byteorder="big"
-                )
-                self._current_frame().ip += 1
-                err = self.push(self.stack[self._current_frame().base_pointer + idx])
-                if err:
-                    return err
-            elif op == Opcode.GETBUILTIN:
-                idx = int.from_bytes(
-                    ins[ip + 1 : ip + 2], byteorder="big"
-                )
-                self._current_frame().ip += 1
-                err = self.push(BUILTINS[idx])
-                if err:
-                    return err
-            elif op == Opcode.GETFREE:
-                idx = int.from_bytes(
-                    ins[ip + 1 : ip + 2], byteorder="big"
-                )
-                self._current_frame().ip += 1
-                err = self.push(self._current_frame().cl.free[idx])
-                if err:
-                    return err
-            elif op == Opcode.CURRENTCLOSURE:
-                err = self.push(self._current_frame().cl)
-                if err:
-                    return err
-            elif op == Opcode.POP:
-                self.pop()
-            elif op == Opcode.ARRAY:
-                arr_size = int.from_bytes(
-                    ins[ip + 1 : ip + 3], byteorder="big"
-                )
-                self._current_frame().ip += 2
-                elems: List[Object] = [Object()] * arr_size
-                for i in range(0, arr_size):
-                    elems[i] = self.stack[self.sp - arr_size + i]
-                self.sp = self.sp - arr_size
-                err = self.push(ArrayObject(elems))
-                if err:
-                    return err
-            elif op == Opcode.MAP:
-                map_size = int.from_bytes(
-                    ins[ip + 1 : ip + 3], byteorder="big"
-                )
-                self._current_frame().ip += 2
-                map: Dict[Object, Object] = {}
-                for i in range(0, map_size):
-                    key: Object = self.stack[self.sp - map_size * 2 + 2 * i]
-                    value: Object = self.stack[self.sp - map_size * 2 + 2 * i + 1]
-                    map[key] = value
-
-                self.sp = self.sp - map_size * 2
-                err = self.push(MapObject(map))
-                if err:
-                    return err
-            elif op == Opcode.INDEX:
-                right = self.pop()
-                left = self.pop()
-                if isinstance(left, ArrayObject) and isinstance(right, IntObject):
-                    err = self.push(left.get(right))
-                    if err:
-                        return err
-                elif isinstance(left, MapObject):
-                    err = self.push(left.get(right))
-                    if err:
-                        return err
-                else:
-                    return "Index operator not implemented for input types"
-            elif op == Opcode.CALL:
-                num_args = int.from_bytes(
-                    ins[ip + 1 : ip + 2], byteorder="big"
-                )
-                self._current_frame().ip += 1
-                err = self._execute_call(num_args)
-                if err:
-                    return err
-            elif op == Opcode.RETURNVALUE:
-                value = self.pop()
-                # Return to base ptr & Pop compiled function object from stack
-                self.sp = self._current_frame().base_pointer - 1
-                self._pop_frame()
-                err = self.push(value)
-                if err:
-                    return err
-            elif op == Opcode.RETURN:
-                # Return to base ptr & Pop compiled function object from stack
-                self.sp = self._current_frame().base_pointer - 1
-                self._pop_frame()
-                err = self.push(NullObject())
-                if err:
-                    return err
-            elif op == Opcode.NULL:
-                err = self.push(NullObject())
-                if err:
-                    return err
+    def _op_constant(self, index: int) -> Error | None:
+        self._push(self.constants[index])
+
+    def _op_closure(self, index: int, num_free: int) -> Error | None:
+        return self._build_closure(index, num_free)
+
+    def _op_add_int(self) -> Error | None:
+        right = self.pop()
+        self._push(IntObject(self.pop().value + right.value))
+
+    def _op_sub_int(self) -> Error | None:
+        right = self.pop()
+        self._push(IntObject(self.pop().value - right.value))
+
+    def _op_mul_int(self) -> Error | None:
+        right = self.pop()
+        self._push(IntObject(self.pop().value * right.value))
+
+    def _op_div_int(self) -> Error | None:
+        right = self.pop()
+        self._push(IntObject(self.pop().value // right.value))
+
+    def _op_equal_int(self) -> Error | None:
+        right = self.pop()
+        self._push(BooleanObject(self.pop().value == right.value))
+
+    def _op_notequal_int(self) -> Error | None:
+        right = self.pop()
+        self._push(BooleanObject(self.pop().value != right.value))
+
+    def _op_greaterthan_int(self) -> Error | None:
+        right = self.pop()
+        self._push(BooleanObject(self.pop().value > right.value))
+
+    def _op_minus_int(self) -> Error | None:
+        self._push(IntObject(-self.pop().value))
+
+    def _op_add(self) -> Error | None:
+        return self._execute_binary_op(Opcode.ADD)
+
+    def _op_sub(self) -> Error | None:
+        return self._execute_binary_op(Opcode.SUB)
+
+    def _op_mul(self) -> Error | None:
+        return self._execute_binary_op(Opcode.MUL)
+
+    def _op_div(self) -> Error | None:
+        return self._execute_binary_op(Opcode.DIV)
+
+    def _op_equal(self) -> Error | None:
+        return self._execute_comparison(Opcode.EQUAL)
+
+    def _op_notequal(self) -> Error | None:
+        return self._execute_comparison(Opcode.NOTEQUAL)
+
+    def _op_greaterthan(self) -> Error | None:
+        return self._execute_comparison(Opcode.GREATERTHAN)
+
+    def _op_bang(self) -> Error | None:
+        self._push(BooleanObject(not self._is_truthy(self.pop())))
+
+    def _op_minus(self) -> Error | None:
+        operand = self.pop()
+        if not isinstance(operand, IntObject):
+            return "- prefix is not supported for input type"
+        self._push(IntObject(-1 * operand.value))
+
+    def _op_true(self) -> Error | None:
+        self._push(BooleanObject(True))
+
+    def _op_false(self) -> Error | None:
+        self._push(BooleanObject(False))
+
+    def _op_null(self) -> Error | None:
+        self._push(NullObject())
+
+    def _op_jump(self, pos: int) -> Error | None:
+        frame = self._current_frame()
+        if pos <= frame.ip:
+            frame.cl.func.back_edges += 1
+        frame.ip = pos - 1
+
+    def _op_jumpcond(self, pos: int) -> Error | None:
+        if not self._is_truthy(self.pop()):
+            self._current_frame().ip = pos - 1
+
+    def _op_iter_init(self) -> Error | None:
+        return self._iter_init()
+
+    def _op_iter_next(self, pos: int) -> Error | None:
+        return self._iter_next(pos)
 
+    def _op_setglobal(self, index: int) -> Error | None:
+        self.globals[index] = self.pop()
+
+    def _op_getglobal(self, index: int) -> Error | None:
+        self._push(self.globals[index])
+
+    def _op_setlocal(self, index: int) -> Error | None:
+        self.stack[self._current_frame().base_pointer + index] = self.pop()
+
+    def _op_getlocal(self, index: int) -> Error | None:
+        self._push(self.stack[self._current_frame().base_pointer + index])
+
+    def _op_getbuiltin(self, index: int) -> Error | None:
+        self._push(BUILTINS[index])
+
+    def _op_getfree(self, index: int) -> Error | None:
+        self._push(self._current_frame().cl.free[index])
+
+    def _op_currentclosure(self) -> Error | None:
+        self._push(self._current_frame().cl)
+
+    def _op_pop(self) -> Error | None:
+        self.pop()
+
+    def _op_array(self, size: int) -> Error | None:
+        return self._build_array(size)
+
+    def _op_map(self, size: int) -> Error | None:
+        return self._build_map(size)
+
+    def _op_index(self) -> Error | None:
+        right = self.pop()
+        left = self.pop()
+        result = index_operation(left, right)
+        if isinstance(result, Error):
+            return result
+        self._push(result)
+
+    def _op_setindex(self) -> Error | None:
+        value = self.pop()
+        index = self.pop()
+        return set_index(self.pop(), index, value)
+
+    def _op_call(self, num_args: int) -> Error | None:
+        return self._execute_call(num_args)
+
+    def _op_returnvalue(self) -> Error | None:
+        value = self.pop()
+        # Return to base ptr & Pop compiled function object from stack
+        self.sp = self._current_frame().base_pointer - 1
+        self._pop_frame()
+        self._push(value)
+        if self.frame_index == self.return_frame:
+            return _RETURNED
+
+    def _op_return(self) -> Error | None:
+        # Return to base ptr & Pop compiled function object from stack
+        self.sp = self._current_frame().base_pointer - 1
+        self._pop_frame()
+        self._push(NullObject())
+        if self.frame_index == self.return_frame:
+            return _RETURNED
+
+    def _op_wide(self) -> Error | None:
+        frame = self._current_frame()
+        ins = frame.cl.func.value
+        op = lookup_opcode(ins[frame.ip + 1])
+        widths = DEFINITIONS[op].operand_widths
+        if not widths:
+            return f"WIDE prefix is not supported for {op.name}"
+        operands: List[int] = []
+        start = frame.ip + 2
+        for _ in widths:
+            operands.append(int.from_bytes(ins[start : start + WIDE_OPERAND_WIDTH], byteorder="big"))
+            start += WIDE_OPERAND_WIDTH
+        frame.ip = start - 1
+
+        if (op == Opcode.SETGLOBAL or op == Opcode.GETGLOBAL) and operands[0] >= len(self.globals):
+            # Past the preallocated globals, unset ones read as an empty object
+            self.globals.extend([Object()] * (operands[0] + 1 - len(self.globals)))
+        return self.handlers[op.value](*operands)
+
+    def _iter_init(self) -> Error | None:
+        iterable = self.pop()
+        if not isinstance(iterable, ArrayObject):
+            return "for loop is not supported for input type"
+        return self._push(IteratorObject(iterable))
+
+    def _iter_next(self, pos: int) -> Error | None:
+        iterator = self.stack[self.sp - 1]
+        if iterator.index < iterator.value.length():
+            value = iterator.value.item(iterator.index)
+            iterator.index += 1
+            return self._push(value)
+        # Exhausted, drop the iterator and leave the loop
+        self.sp -= 1
+        self._current_frame().ip = pos - 1
         return None
 
+    def _build_closure(self, index: int, num_free: int) -> Error | None:
+        free = []
+        for i in range(0, num_free):
+            free.append(self.stack[self.sp-num_free+i])
+        # The captured values are consumed, only the closure is left behind
+        self.sp = self.sp - num_free
+        return self._push(ClosureObject(self.constants[index], free))
+
+    def _build_array(self, arr_size: int) -> Error | None:
+        elems: List[Object] = [Object()] * arr_size
+        for i in range(0, arr_size):
+            elems[i] = self.stack[self.sp - arr_size + i]
+        self.sp = self.sp - arr_size
+        return self._push(int_array(elems))
+
+    def _build_map(self, map_size: int) -> Error | None:
+        result = build_map(self.stack[self.sp - map_size * 2 : self.sp])
+        if isinstance(result, Error):
+            return result
+        self.sp = self.sp - map_size * 2
+        return self._push(result)
+
     def _execute_call(self, num_args: int) -> Error | None:
         fn = self.stack[self.sp - num_args - 1]
         if isinstance(fn, ClosureObject):
@@ -276,104 +446,71 @@ class VM:
         else:
             return "Error attempting to call non-function"
 
+    def call_closure(self, cl: ClosureObject, args: List[Object]) -> Object | Error:
+        # Runs a call to completion from outside the dispatch loop, such as from a faster tier
+        return_frame, self.return_frame = self.return_frame, self.frame_index
+        err = None
+        for obj in [cl, *args]:
+            err = self.push(obj)
+            if err:
+                break
+        if not err:
+            err = self._execute_call(len(args))
+        if not err and self.frame_index != self.return_frame:
+            err = self.run()
+        self.return_frame = return_frame
+        if err:
+            return err
+        return self.pop()
+
     def _execute_closure(self, cl: ClosureObject, num_args: int) -> Error | None:
         if num_args != cl.func.num_args:
             return f"wrong number of args: want {cl.func.num_args}, got {num_args}"
+        err = self._reserve(cl.func, self.sp - num_args)
+        if err:
+            return err
+        cl.func.calls += 1
         frame = Frame(cl, self.sp - num_args)
         self._push_frame(frame)
         self.sp = frame.base_pointer + cl.func.num_locals
 
+    def _reserve(self, func: CompiledFunctionObject, base_pointer: int) -> Error | None:
+        # The one overflow check for a frame, everything it pushes fits under max_stack
+        if func.max_stack is None:
+            err = verify_function(func)
+            if err:
+                return err
+        if base_pointer + func.num_locals + func.max_stack > STACK_SIZE:
+            return "Stack Overflow"
+        return None
+
     def _execute_builtin(self, fn: Builtin, num_args: int) -> Error | None:
         args = self.stack[self.sp - num_args:self.sp]
         result = fn.func(args)
         self.sp = self.sp - num_args - 1
         if isinstance(result, Error):
             return result
-        err = self.push(result)
-        if err:
-            return err
+        self._push(result)
 
 
     def _execute_binary_op(self, op: Opcode) -> Error | None:
         right: Object = self.pop()
         left: Object = self.pop()
-
-        if isinstance(left, IntObject) and isinstance(right, IntObject):
-            right_int: int = right.value
-            left_int: int = left.value
-            out_int: int
-            match op:
-                case Opcode.ADD:
-                    out_int = left_int + right_int
-                case Opcode.SUB:
-                    out_int = left_int - right_int
-                case Opcode.MUL:
-                    out_int = left_int * right_int
-                case Opcode.DIV:
-                    out_int = left_int // right_int
-                case _:
-                    return f"IntObject arithmetic not found for {op}"
-            err = self.push(IntObject(out_int))
-            if err:
-                return err
-        elif isinstance(left, StringObject) and isinstance(right, StringObject):
-            right_str: str = right.value
-            left_str: str = left.value
-            out_str: str
-            match op:
-                case Opcode.ADD:
-                    out_str = left_str + right_str
-                case _:
-                    return f"IntObject arithmetic not found for {op}"
-            err = self.push(StringObject(out_str))
-            if err:
-                return err
-        else:
-            return "Cannot find arithmetic function for input types."
-
-        return None
+        result = binary_operation(op, left, right)
+        if isinstance(result, Error):
+            return result
+        return self._push(result)
 
     def _execute_comparison(self, op: Opcode) -> Error | None:
         right: Object = self.pop()
         left: Object = self.pop()
-
-        if isinstance(left, IntObject) and isinstance(right, IntObject):
-            right_val: int = right.value
-            left_val: int = left.value
-            match op:
-                case Opcode.EQUAL:
-                    out_val = left_val == right_val
-                case Opcode.NOTEQUAL:
-                    out_val = left_val != right_val
-                case Opcode.GREATERTHAN:
-                    out_val = left_val > right_val
-                case _:
-                    return f"IntObject comparison not found for {op}"
-            err = self.push(BooleanObject(out_val))
-            if err:
-                return err
-        elif isinstance(left, NullObject) and isinstance(right, NullObject):
-            err = self.push(BooleanObject(True))
-        else:
-            match op:
-                case Opcode.EQUAL:
-                    err = self.push(BooleanObject(left.value == right.value))
-                case Opcode.NOTEQUAL:
-                    err = self.push(BooleanObject(left.value != right.value))
-                case Opcode.GREATERTHAN:
-                    err = self.push(BooleanObject(left.value > right.value))
-                case _:
-                    return f"Object comparison not found for {op}"
-            if err:
-                return err
-
-        return None
+        result = comparison(op, left, right)
+        if isinstance(result, Error):
+            return result
+        return self._push(result)
 
     def _is_truthy(self, obj: Object) -> bool:
-        if isinstance(obj, NullObject):
-            return False
-        else:
-            return bool(obj.value)
+        return is_truthy(obj)
 
     def _current_frame(self) -> Frame:
         return self.frames[self.frame_index]
@@ -1,4 +1,28 @@
-from pycompiler.repl import run
+import argparse
+import sys
+
+from pycompiler.repl import run, run_file, disassemble_file, BACKENDS
+from pycompiler.cache import BytecodeCache
+from pycompiler.compiler import DISASSEMBLY_FORMATS
+from pycompiler.optimizer import MAX_OPT_LEVEL
 
 if __name__ == "__main__":
-    run()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("backend", nargs="?", default="stack", choices=list(BACKENDS))
+    parser.add_argument("-O", dest="opt_level", type=int, default=0, choices=range(MAX_OPT_LEVEL + 1))
+    parser.add_argument("-f", dest="file", help="run a script instead of starting the repl")
+    parser.add_argument("--cache-dir", default="__monkeycache__", help="compiled script cache, empty to disable")
+    parser.add_argument("--disassemble", choices=DISASSEMBLY_FORMATS, help="print the script's stack bytecode instead of running it")
+    args = parser.parse_args()
+    if args.file and args.disassemble:
+        cache = BytecodeCache(args.cache_dir) if args.cache_dir else None
+        err = disassemble_file(args.file, sys.stdout, args.disassemble, args.opt_level, cache)
+        if err:
+            print(err)
+    elif args.file:
+        cache = BytecodeCache(args.cache_dir) if args.cache_dir else None
+        err = run_file(args.file, args.backend, args.opt_level, cache)
+        if err:
+            print(err)
+    else:
+        run(args.backend, args.opt_level)
@@ -0,0 +1,104 @@
+from importlib.util import MAGIC_NUMBER
+from typing import List
+
+import pytest
+
+from pycompiler.cache import (
+    FORMAT_VERSION,
+    HEADER,
+    LazyCompiledFunctionObject,
+    serialize,
+    deserialize,
+    load_bytecode,
+)
+from pycompiler.repl import compile_source
+from pycompiler.vm import VM, RegisterVM, NativeVM
+from pycompiler.objects import Object, IntObject, StringObject, ClosureObject, CompiledFunctionObject
+
+
+def is_loaded(func: CompiledFunctionObject) -> bool:
+    # Reads the slot itself, going through the object would load it
+    try:
+        CompiledFunctionObject.value.__get__(func)
+    except AttributeError:
+        return False
+    return True
+
+
+def run_binary_test(source: str, expected: Object, backend: str = "stack", opt_level: int = 0):
+    bytecode, err = compile_source(source, backend, opt_level)
+    assert err is None
+    loaded, err = deserialize(serialize(bytecode))
+    assert err is None
+    assert loaded == bytecode
+
+    vm = VM(loaded) if backend == "stack" else RegisterVM(loaded)
+    assert vm.run() is None
+    assert vm.last_popped() == expected
+
+
+def test_round_trip():
+    run_binary_test('"mon" + "key"', StringObject("monkey"))
+    run_binary_test("-9223372036854775808 - 1 + 99999999999999999999", IntObject(99999999999999999999 - 9223372036854775809))
+    run_binary_test("let add = fn(a) { fn(b) { a + b } }; add(1)(2)", IntObject(3))
+    run_binary_test("let f = fn(x) { if (x > 1) { x * f(x - 1) } else { 1 } }; f(5)", IntObject(120), opt_level=2)
+    run_binary_test("let add = fn(a) { fn(b) { a + b } }; add(1)(2)", IntObject(3), backend="register")
+
+
+def test_functions_load_lazily():
+    bytecode, _ = compile_source("let f = fn() { 1 }; f()")
+    loaded, err = deserialize(serialize(bytecode))
+    assert err is None
+    func = next(c.func for c in loaded[1] if isinstance(c, ClosureObject))
+    assert isinstance(func, LazyCompiledFunctionObject)
+    assert not is_loaded(func)
+    vm = VM(loaded)
+    assert vm.run() is None
+    assert is_loaded(func)
+
+
+def test_zero_copy_load(tmp_path):
+    path = str(tmp_path / "prog.mkbc")
+    bytecode, _ = compile_source("let f = fn(x) { x * 2 }; f(21)")
+    with open(path, "wb") as f:
+        f.write(serialize(bytecode))
+    loaded, err = load_bytecode(path)
+    assert err is None
+    assert isinstance(loaded[0], memoryview)
+    vm = VM(loaded)
+    assert vm.run() is None
+    assert vm.last_popped() == IntObject(42)
+
+
+def test_format_errors():
+    data = serialize(compile_source("1 + 2")[0])
+    _, err = deserialize(b"XXXX" + data[4:])
+    assert err == "not a bytecode container"
+
+    bumped = bytearray(data)
+    bumped[4:6] = (FORMAT_VERSION + 1).to_bytes(2, "big")
+    _, err = deserialize(bumped)
+    assert err == f"unsupported bytecode format version {FORMAT_VERSION + 1}"
+
+    _, err = deserialize(data[: HEADER.size - 1])
+    assert err is not None
+    _, err = deserialize(data[: HEADER.size + 3])
+    assert err is not None
+
+
+def test_native_round_trip():
+    code, err = compile_source("let f = fn(x) { if (x > 1) { x * f(x - 1) } else { 1 } }; f(5)", "native", 2)
+    assert err is None
+    data = serialize(code)
+    loaded, err = deserialize(data)
+    assert err is None
+    vm = NativeVM(loaded)
+    assert vm.run() is None
+    assert vm.last_popped() == IntObject(120)
+
+    # marshal data from another interpreter must be recompiled, not loaded
+    main_offset = data.index(MAGIC_NUMBER)
+    stale = bytearray(data)
+    stale[main_offset] ^= 0xFF
+    _, err = deserialize(stale)
+    assert err == "native code compiled by another Python version"
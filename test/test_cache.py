@@ -0,0 +1,83 @@
+import os
+
+import pycompiler.repl.repl as repl
+from pycompiler.cache import BytecodeCache, CACHE_SUFFIX
+from pycompiler.repl import compile_source
+from pycompiler.vm import VM
+from pycompiler.objects import IntObject
+
+
+def test_cache_hit_skips_compiling(tmp_path, monkeypatch):
+    cache = BytecodeCache(str(tmp_path))
+    source = "let f = fn(x) { x * 2 }; f(21)"
+    bytecode, err = compile_source(source, cache=cache)
+    assert err is None
+    assert cache.misses == 1
+
+    def fail(*args):
+        raise AssertionError("compiled on a cache hit")
+
+    monkeypatch.setattr(repl, "Lexer", fail)
+    cached, err = compile_source(source, cache=cache)
+    assert err is None
+    assert cache.hits == 1
+    assert cached == bytecode
+
+    vm = VM(cached)
+    assert vm.run() is None
+    assert vm.last_popped() == IntObject(42)
+
+
+def test_cache_key_variants(tmp_path):
+    cache = BytecodeCache(str(tmp_path))
+    assert cache.key("1 + 2", "stack", "0") == cache.key("1 + 2", "stack", "0")
+    assert cache.key("1 + 2", "stack", "0") != cache.key("1 + 2", "stack", "1")
+    assert cache.key("1 + 2", "stack", "0") != cache.key("1 + 2", "register", "0")
+    assert cache.key("1 + 2", "stack", "0") != cache.key("1 + 3", "stack", "0")
+
+
+def test_cache_key_tracks_compiler(tmp_path, monkeypatch):
+    import pycompiler.cache.cache as cache_module
+
+    cache = BytecodeCache(str(tmp_path))
+    before = cache.key("1 + 2", "stack", "0")
+    assert cache_module.compiler_fingerprint() == cache_module.COMPILER_FINGERPRINT
+    # A change to the compiler source is a different fingerprint, so old entries miss
+    monkeypatch.setattr(cache_module, "COMPILER_FINGERPRINT", "edited")
+    assert cache.key("1 + 2", "stack", "0") != before
+
+
+def test_cache_corrupt_entry(tmp_path):
+    cache = BytecodeCache(str(tmp_path))
+    key = cache.key("1")
+    with open(os.path.join(str(tmp_path), key + CACHE_SUFFIX), "wb") as f:
+        f.write(b"not bytecode")
+    assert cache.get(key) is None
+    assert cache.misses == 1
+    assert not os.listdir(str(tmp_path))
+
+
+def test_cache_compile_errors_not_stored(tmp_path):
+    cache = BytecodeCache(str(tmp_path))
+    _, err = compile_source("undefined_name", cache=cache)
+    assert err is not None
+    assert not os.listdir(str(tmp_path))
+
+
+def test_cache_lru_eviction(tmp_path):
+    cache = BytecodeCache(str(tmp_path), max_entries=2)
+    keys = [cache.key(str(i)) for i in range(3)]
+    bytecode = [compile_source(str(i))[0] for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.put(key, bytecode[i])
+        os.utime(os.path.join(str(tmp_path), key + CACHE_SUFFIX), (i, i))
+    # Reading the oldest entry makes it the most recently used
+    assert cache.get(keys[0]) == bytecode[0]
+    cache.put(keys[2], bytecode[2])
+    assert sorted(os.listdir(str(tmp_path))) == sorted([keys[0] + CACHE_SUFFIX, keys[2] + CACHE_SUFFIX])
+
+
+def test_cache_size_eviction(tmp_path):
+    cache = BytecodeCache(str(tmp_path), max_bytes=0)
+    cache.put(cache.key("1"), compile_source("1")[0])
+    assert os.listdir(str(tmp_path)) == []
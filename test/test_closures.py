@@ -0,0 +1,163 @@
+from typing import List
+
+from pycompiler.cache import BytecodeCache
+from pycompiler.compiler import Compiler
+from pycompiler.optimizer import PassManager
+from pycompiler.repl import compile_source
+from pycompiler.repl.repl import new_compiler_with_state, new_vm_with_state
+from pycompiler.vm import VM, ClosureCompiler, ClosureVM
+from pycompiler.objects import Object, IntObject, ArrayObject, IntArrayObject, ClosureObject
+from pycompiler.parser import Parser, Statement
+from pycompiler.lexer import Lexer
+
+
+def run_closure(test_prog: str, opt_level: int = 0):
+    ast: List[Statement] = Parser(Lexer(test_prog)).parse()
+    compiler = ClosureCompiler()
+    assert compiler.compile(PassManager(opt_level).run_ast(ast)) is None
+    vm = ClosureVM(compiler.bytecode())
+    return vm.run(), vm.last_popped()
+
+
+def run_conformance(test_prog: str):
+    # The closure backend must agree with the stack VM on every value and error
+    for opt_level in (0, 2):
+        ast: List[Statement] = Parser(Lexer(test_prog)).parse()
+        bytecode, err = PassManager(opt_level).compile(ast, Compiler())
+        assert err is None
+        vm = VM(bytecode)
+        expected_err = vm.run()
+
+        err, result = run_closure(test_prog, opt_level)
+        assert err == expected_err, test_prog
+        if err is None:
+            assert result == vm.last_popped(), test_prog
+
+
+def test_values():
+    for prog in [
+        "1 + 2 * 3 - 4 / 2",
+        "-5 + 10",
+        "-9223372036854775808 - 1",
+        "7 / -2",
+        '"mon" + "key"',
+        "1 < 2",
+        "2 > 1 == true",
+        "!5",
+        "!!0",
+        "true == false",
+        '"a" == "a"',
+        "[1, 2 + 3, [4]]",
+        '{1: 2, "a": [3]}["a"][0]',
+        "[1, 2, 3][5]",
+        "if (1 > 2) { 10 }",
+        "if (0) { 10 } else { 20 }",
+        "if (true) { let x = 1; }",
+        "let a = 5; a",
+        "let a = 5;",
+    ]:
+        run_conformance(prog)
+
+    err, result = run_closure("")
+    assert err is None
+    assert type(result) is Object
+
+    err, result = run_closure("[1, 2, 3]")
+    assert err is None
+    assert type(result) is IntArrayObject
+
+
+def test_functions():
+    for prog in [
+        "let add = fn(a, b) { a + b }; add(1, 2)",
+        "let f = fn() { }; f()",
+        "let f = fn() { let a = 1; }; f()",
+        "let f = fn() { return 1; 2 }; f()",
+        "let f = fn(x) { if (x > 1) { return 10; } 20 }; [f(1), f(2)]",
+        "let f = fn(x) { while (true) { return x; } }; f(3)",
+        "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(15)",
+        "let adder = fn(a) { fn(b) { a + b } }; adder(1)(2)",
+        "let f = fn(a) { let g = fn() { a }; let a = 2; g() }; f(1)",
+        "let f = fn(a, b) { let c = a + b; fn(d) { fn() { a + b + c + d } } }; f(1, 2)(3)()",
+        "let outer = fn() { let count = fn(n) { if (n == 0) { 0 } else { count(n - 1) } }; count(5) }; outer()",
+        "let f = fn() { let fs = []; for (i in [1, 2, 3]) { append(fs, fn() { i }) }; fs[0]() + fs[2]() }; f()",
+        "let apply = fn(g, x) { g(x) }; apply(fn(y) { y * 2 }, 21)",
+    ]:
+        run_conformance(prog)
+
+
+def test_loops_and_mutation():
+    for prog in [
+        "let i = 0; let sum = 0; while (i < 10) { let sum = sum + i; let i = i + 1 }; sum",
+        "let total = 0; for (x in [1, 2, 3]) { let total = total + x }; total",
+        "let f = fn(n) { let i = 0; while (i < n) { let i = i + 1 }; i }; f(5)",
+        "let a = [1, 2]; a[0] = 5; a",
+        "let m = {}; m[\"k\"] = 1; m[\"k\"]",
+        "let a = []; for (x in [1, 2, 3]) { append(a, x * x) }; a",
+        "let a = [1]; let b = push(a, 2); [a, b]",
+        "let a = [1, 2, 3]; [len(a), first(a), last(a), rest(a)]",
+        "let a = [1]; for (x in a) { if (len(a) < 5) { append(a, x) } }; len(a)",
+        "while (false) { 1 }",
+    ]:
+        run_conformance(prog)
+
+
+def test_errors():
+    for prog in [
+        "let f = fn(a) { a }; f()",
+        "let f = fn(a) { a }; f(1, 2)",
+        "5(1)",
+        "1 + true",
+        '"a" - "b"',
+        "-true",
+        "[1][true]",
+        "{true: 1}",
+        "{[1]: 2}",
+        "{1: 2}[true]",
+        "let a = [1]; a[3] = 1",
+        "for (x in 5) { x }",
+        "len(1)",
+        "len([1], [2])",
+        "let f = fn(n) { f(n + 1) }; f(0)",
+    ]:
+        run_conformance(prog)
+
+
+def test_function_values():
+    err, result = run_closure("let f = fn(x) { x }; [f, f, len]")
+    assert err is None
+    assert isinstance(result.value[0], ClosureObject)
+    assert result.value[0] == result.value[1]
+    assert result.value[2].name == "len"
+
+
+def test_shared_globals():
+    compiler = ClosureCompiler()
+    vm = None
+    for line, expected in [
+        ("let a = [1, 2];", ArrayObject([IntObject(1), IntObject(2)])),
+        ("let i = 0; let f = fn(x) { a[0] + x + i };", None),
+        ("f(10)", IntObject(11)),
+        ("while (i < 3) { let i = i + 1 }; f(1)", IntObject(5)),
+        ("a[0] = 5; f(1)", IntObject(9)),
+    ]:
+        compiler = new_compiler_with_state(compiler)
+        assert compiler.compile(Parser(Lexer(line)).parse()) is None
+        vm = new_vm_with_state(vm, compiler.bytecode()) if vm else ClosureVM(compiler.bytecode())
+        assert vm.run() is None
+        if expected is not None:
+            assert vm.last_popped() == expected
+
+
+def test_compile_source_backend(tmp_path):
+    cache = BytecodeCache(str(tmp_path))
+    program, err = compile_source("let f = fn(x) { x * 2 }; f(21)", "closure", 1, cache)
+    assert err is None
+    # Closures are rebuilt every time instead of cached
+    assert cache.misses == 0
+    vm = ClosureVM(program)
+    assert vm.run() is None
+    assert vm.last_popped() == IntObject(42)
+
+    _, err = compile_source('import "lib"', "closure")
+    assert err == "import lib is not supported by the closure backend"
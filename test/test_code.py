@@ -5,7 +5,10 @@ from pycompiler.code import (
     instructions_to_str,
     read_operands,
     lookup_opcode,
+    Assembler,
+    DEFINITIONS,
 )
+import pytest
 
 
 def test_make_constant():
@@ -58,3 +61,78 @@ def test_read_operands():
     operands, bytes_read = read_operands(opcode, instruction[1:])
     assert operands == [65535]
     assert bytes_read == 2
+
+
+def test_definitions():
+    # Every opcode is defined, and lookups by byte agree with the enum
+    for op in Opcode:
+        definition = DEFINITIONS[op]
+        assert definition.name == op.name
+        assert lookup_opcode(op.value) == op
+        assert definition.size == len(make(op, [1] * len(definition.operand_widths)))
+    assert lookup_opcode(255) == Opcode.NULL
+
+    assert DEFINITIONS[Opcode.CLOSURE].operand_widths == [2, 1]
+    assert DEFINITIONS[Opcode.CLOSURE].stack_effect([0, 3]) == (3, 1)
+    assert DEFINITIONS[Opcode.MAP].stack_effect([2]) == (4, 1)
+    assert DEFINITIONS[Opcode.SETINDEX].stack_effect([]) == (3, 0)
+
+
+def test_make_wide():
+    instruction: Instructions = make(Opcode.GETLOCAL, [256])
+    assert instruction[0] == Opcode.WIDE.value
+    assert instruction[1] == Opcode.GETLOCAL.value
+    assert instruction[2:] == (256).to_bytes(4, byteorder="big")
+
+    instruction = make(Opcode.CLOSURE, [65536, 3])
+    assert instruction[0] == Opcode.WIDE.value
+    assert instruction[1] == Opcode.CLOSURE.value
+    assert instruction[2:6] == (65536).to_bytes(4, byteorder="big")
+    assert instruction[6:] == (3).to_bytes(4, byteorder="big")
+
+    assert make(Opcode.CONSTANT, [65535]) == bytearray([Opcode.CONSTANT.value, 255, 255])
+
+
+def test_wide_strings():
+    instructions: Instructions = make(Opcode.CONSTANT, [70000]) + make(Opcode.CALL, [300]) + make(Opcode.POP, [])
+    assert instructions_to_str(instructions) == "0000 WIDE CONSTANT 70000\n0006 WIDE CALL 300\n000C POP\n"
+
+    operands, bytes_read = read_operands(Opcode.CLOSURE, make(Opcode.CLOSURE, [70000, 300])[2:], True)
+    assert operands == [70000, 300]
+    assert bytes_read == 8
+
+
+def test_assembler_labels():
+    assembler = Assembler()
+    top = assembler.bind(assembler.label())
+    done = assembler.label()
+    assembler.emit(Opcode.TRUE)
+    assembler.emit_jump(Opcode.JUMPCOND, done)
+    assembler.emit(Opcode.CONSTANT, [1])
+    assembler.emit_jump(Opcode.JUMP, top)
+    assembler.bind(done)
+    assembler.emit(Opcode.GETLOCAL, [300])
+    assert instructions_to_str(assembler.assemble()) == (
+        "0000 TRUE\n0001 JUMPCOND 10\n0004 CONSTANT 1\n0007 JUMP 0\n000A WIDE GETLOCAL 300\n"
+    )
+
+
+def test_assembler_unbound_label():
+    assembler = Assembler()
+    assembler.emit_jump(Opcode.JUMP, assembler.label())
+    with pytest.raises(ValueError):
+        assembler.assemble()
+
+
+def test_assembler_wide_jumps():
+    assembler = Assembler()
+    end = assembler.label()
+    assembler.emit_jump(Opcode.JUMP, end)
+    for _ in range(22000):
+        assembler.emit(Opcode.CONSTANT, [0])
+    assembler.bind(end)
+    assembler.emit(Opcode.POP)
+    instructions = assembler.assemble()
+    # The jump grows to six bytes, which moves its own target
+    assert instructions_to_str(instructions[:6]) == "0000 WIDE JUMP 66006\n"
+    assert instructions[66006] == Opcode.POP.value
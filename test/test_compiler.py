@@ -3,7 +3,7 @@ from typing import List, Any
 
 from pycompiler.compiler import Compiler
 from pycompiler.code import make, Opcode, Instructions, instructions_to_str
-from pycompiler.objects import Object, IntObject, StringObject, CompiledFunctionObject, NullObject
+from pycompiler.objects import Object, IntObject, StringObject, CompiledFunctionObject, ClosureObject, NullObject
 from pycompiler.parser import Parser, Statement
 from pycompiler.lexer import Lexer
 
@@ -24,6 +24,8 @@ def compare_insts(left, right):
 
 def compare_consts(left_consts, right_consts):
     for left_const, right_const in zip(left_consts, right_consts):
+        if isinstance(left_const, ClosureObject):
+            left_const = left_const.func
         if isinstance(left_const, CompiledFunctionObject) and isinstance(right_const, CompiledFunctionObject):
             compare_insts(left_const.value, right_const.value)
         elif isinstance(left_const, NullObject) and isinstance(right_const, NullObject):
@@ -247,6 +249,117 @@ def test_jumps():
     )
 
 
+def test_loops():
+    run_compiler_test(
+        "let i = 0; while (i < 3) { let i = i + 1 }",
+        [0, 3, 1],
+        [
+            # 0000
+            make(Opcode.CONSTANT, [0]),
+            # 0003
+            make(Opcode.SETGLOBAL, [0]),
+            # 0006
+            make(Opcode.CONSTANT, [1]),
+            # 0009
+            make(Opcode.GETGLOBAL, [0]),
+            # 0012
+            make(Opcode.GREATERTHAN, []),
+            # 0013
+            make(Opcode.JUMPCOND, [29]),
+            # 0016
+            make(Opcode.GETGLOBAL, [0]),
+            # 0019
+            make(Opcode.CONSTANT, [2]),
+            # 0022
+            make(Opcode.ADD, []),
+            # 0023
+            make(Opcode.SETGLOBAL, [0]),
+            # 0026
+            make(Opcode.JUMP, [6]),
+            # 0029
+            make(Opcode.NULL, []),
+            # 0030
+            make(Opcode.POP, []),
+        ],
+    )
+
+    run_compiler_test(
+        "for (x in [1, 2]) { x }",
+        [1, 2],
+        [
+            # 0000
+            make(Opcode.CONSTANT, [0]),
+            # 0003
+            make(Opcode.CONSTANT, [1]),
+            # 0006
+            make(Opcode.ARRAY, [2]),
+            # 0009
+            make(Opcode.ITER_INIT, []),
+            # 0010
+            make(Opcode.ITER_NEXT, [23]),
+            # 0013
+            make(Opcode.SETGLOBAL, [0]),
+            # 0016
+            make(Opcode.GETGLOBAL, [0]),
+            # 0019
+            make(Opcode.POP, []),
+            # 0020
+            make(Opcode.JUMP, [10]),
+            # 0023
+            make(Opcode.NULL, []),
+            # 0024
+            make(Opcode.POP, []),
+        ],
+    )
+
+
+def test_index_assign():
+    run_compiler_test(
+        "let xs = [1]; xs[0] = 2",
+        [1, 0, 2],
+        [
+            # 0000
+            make(Opcode.CONSTANT, [0]),
+            # 0003
+            make(Opcode.ARRAY, [1]),
+            # 0006
+            make(Opcode.SETGLOBAL, [0]),
+            # 0009
+            make(Opcode.GETGLOBAL, [0]),
+            # 0012
+            make(Opcode.CONSTANT, [1]),
+            # 0015
+            make(Opcode.CONSTANT, [2]),
+            # 0018
+            make(Opcode.SETINDEX, []),
+        ],
+    )
+
+    # An arm that does not end in an expression evaluates to null
+    run_compiler_test(
+        "if (true) { let x = 1 }",
+        [1],
+        [
+            # 0000
+            make(Opcode.TRUE, []),
+            # 0001
+            make(Opcode.JUMPCOND, [14]),
+            # 0004
+            make(Opcode.CONSTANT, [0]),
+            # 0007
+            make(Opcode.SETGLOBAL, [0]),
+            # 0010
+            make(Opcode.NULL, []),
+            # 0011
+            make(Opcode.JUMP, [15]),
+            # 0014
+            make(Opcode.NULL, []),
+            # 0015
+            make(Opcode.POP, []),
+        ],
+    )
+
+
 def test_let():
     run_compiler_test(
         "let x = 2; let y = 3;",
@@ -393,7 +506,7 @@ def test_functions():
             ),
         ],
         [
-            make(Opcode.CLOSURE, [2, 0]),
+            make(Opcode.CONSTANT, [2]),
             make(Opcode.POP, []),
         ],
     )
@@ -412,7 +525,7 @@ def test_functions():
             ),
         ],
         [
-            make(Opcode.CLOSURE, [2, 0]),
+            make(Opcode.CONSTANT, [2]),
             make(Opcode.POP, []),
         ],
     )
@@ -431,7 +544,7 @@ def test_functions():
             ),
         ],
         [
-            make(Opcode.CLOSURE, [2, 0]),
+            make(Opcode.CONSTANT, [2]),
             make(Opcode.POP, []),
         ],
     )
@@ -445,7 +558,7 @@ def test_functions():
             ),
         ],
         [
-            make(Opcode.CLOSURE, [0, 0]),
+            make(Opcode.CONSTANT, [0]),
             make(Opcode.POP, []),
         ],
     )
@@ -461,7 +574,7 @@ def test_functions():
             24
         ],
         [
-            make(Opcode.CLOSURE, [0, 0]),
+            make(Opcode.CONSTANT, [0]),
             make(Opcode.SETGLOBAL, [0]),
             make(Opcode.GETGLOBAL, [0]),
             make(Opcode.CONSTANT, [1]),
@@ -487,7 +600,7 @@ def test_functions():
             26,
         ],
         [
-            make(Opcode.CLOSURE, [0, 0]),
+            make(Opcode.CONSTANT, [0]),
             make(Opcode.SETGLOBAL, [0]),
             make(Opcode.GETGLOBAL, [0]),
             make(Opcode.CONSTANT, [1]),
@@ -538,7 +651,7 @@ def test_calls():
             ),
         ],
         [
-            make(Opcode.CLOSURE, [1, 0]),
+            make(Opcode.CONSTANT, [1]),
             make(Opcode.CALL, [0]),
             make(Opcode.POP, []),
         ],
@@ -555,7 +668,7 @@ def test_calls():
             ),
         ],
         [
-            make(Opcode.CLOSURE, [1, 0]),
+            make(Opcode.CONSTANT, [1]),
             make(Opcode.SETGLOBAL, [0]),
             make(Opcode.GETGLOBAL, [0]),
             make(Opcode.CALL, [0]),
@@ -577,7 +690,7 @@ def test_calls():
             ),
         ],
         [
-            make(Opcode.CLOSURE, [2, 0]),
+            make(Opcode.CONSTANT, [2]),
             make(Opcode.SETGLOBAL, [0]),
             make(Opcode.GETGLOBAL, [0]),
             make(Opcode.CALL, [0]),
@@ -600,7 +713,7 @@ def test_local_vars():
         [
             make(Opcode.CONSTANT, [0]),
             make(Opcode.SETGLOBAL, [0]),
-            make(Opcode.CLOSURE, [1, 0]),
+            make(Opcode.CONSTANT, [1]),
             make(Opcode.POP, []),
         ],
     )
@@ -618,7 +731,7 @@ def test_local_vars():
             ),
         ],
         [
-            make(Opcode.CLOSURE, [1, 0]),
+            make(Opcode.CONSTANT, [1]),
             make(Opcode.POP, []),
         ],
     )
@@ -641,7 +754,7 @@ def test_local_vars():
             ),
         ],
         [
-            make(Opcode.CLOSURE, [2, 0]),
+            make(Opcode.CONSTANT, [2]),
             make(Opcode.POP, []),
         ],
     )
@@ -686,7 +799,7 @@ def test_closures():
             ),
         ],
         [
-            make(Opcode.CLOSURE, [1, 0]),
+            make(Opcode.CONSTANT, [1]),
             make(Opcode.POP, []),
         ],
     )
@@ -720,7 +833,7 @@ def test_closures():
             ),
         ],
         [
-            make(Opcode.CLOSURE, [2, 0]),
+            make(Opcode.CONSTANT, [2]),
             make(Opcode.POP, []),
         ],
     )
@@ -741,7 +854,7 @@ def test_closures():
             1,
         ],
         [
-            make(Opcode.CLOSURE, [1, 0]),
+            make(Opcode.CONSTANT, [1]),
             make(Opcode.SETGLOBAL, [0]),
             make(Opcode.GETGLOBAL, [0]),
             make(Opcode.CONSTANT, [2]),
@@ -766,7 +879,7 @@ def test_closures():
             1,
             concat_insts(
                 [
-                    make(Opcode.CLOSURE, [1, 0]),
+                    make(Opcode.CONSTANT, [1]),
                     make(Opcode.SETLOCAL, [0]),
                     make(Opcode.GETLOCAL, [0]),
                     make(Opcode.CONSTANT, [2]),
@@ -776,7 +889,7 @@ def test_closures():
             ),
         ],
         [
-            make(Opcode.CLOSURE, [3, 0]),
+            make(Opcode.CONSTANT, [3]),
             make(Opcode.SETGLOBAL, [0]),
             make(Opcode.GETGLOBAL, [0]),
             make(Opcode.CALL, [0]),
@@ -814,7 +927,7 @@ def test_fibonacci():
             15,
         ],
         [
-            make(Opcode.CLOSURE, [2, 0]),
+            make(Opcode.CONSTANT, [2]),
             make(Opcode.SETGLOBAL, [0]),
             make(Opcode.GETGLOBAL, [0]),
             make(Opcode.CONSTANT, [3]),
@@ -822,3 +935,46 @@ def test_fibonacci():
             make(Opcode.POP, []),
         ],
     )
+
+
+def test_wide_operands():
+    compiler = Compiler()
+    for i in range(70000):
+        compiler._add_constant(IntObject(i))
+    compiler.compile(Parser(Lexer("1")).parse())
+    instructions, constants = compiler.bytecode()
+    compare_insts(instructions, concat_insts([make(Opcode.CONSTANT, [70000]), make(Opcode.POP, [])]))
+    assert constants[70000] == IntObject(1)
+
+    params = ", ".join(f"a{i}" for i in range(300))
+    compiler = Compiler()
+    compiler.compile(Parser(Lexer(f"fn({params}) {{ a299 }}")).parse())
+    _, constants = compiler.bytecode()
+    compare_insts(
+        constants[0].func.value,
+        concat_insts([make(Opcode.GETLOCAL, [299]), make(Opcode.RETURNVALUE, [])]),
+    )
+
+
+def test_wide_jumps():
+    members = ", ".join(["1"] * 22000)
+    compiler = Compiler()
+    compiler.compile(Parser(Lexer(f"if (true) {{ [{members}] }}; 2")).parse())
+    instructions, _ = compiler.bytecode()
+    cons_end = 1 + 6 + 22000 * 3 + 3
+    compare_insts(
+        instructions[:7],
+        concat_insts([make(Opcode.TRUE, []), make(Opcode.JUMPCOND, [cons_end + 6])]),
+    )
+    compare_insts(
+        instructions[cons_end:],
+        concat_insts(
+            [
+                make(Opcode.JUMP, [cons_end + 7]),
+                make(Opcode.NULL, []),
+                make(Opcode.POP, []),
+                make(Opcode.CONSTANT, [22000]),
+                make(Opcode.POP, []),
+            ]
+        ),
+    )
@@ -0,0 +1,125 @@
+from typing import List
+
+from pycompiler.compiler import Compiler
+from pycompiler.optimizer import CommonSubexpressionEliminator, PassManager
+from pycompiler.objects import Object, IntObject, ArrayObject
+from pycompiler.parser import Parser, Statement
+from pycompiler.lexer import Lexer
+from pycompiler.vm import VM
+
+
+def eliminate_prog(test_prog: str):
+    eliminator = CommonSubexpressionEliminator()
+    ast: List[Statement] = eliminator.eliminate(Parser(Lexer(test_prog)).parse())
+    return ast, eliminator
+
+
+def run_cse_test(test_prog: str, exp_prog: str):
+    # Hidden names cannot be written in source, so compare against cse-prefixed stand-ins
+    ast, _ = eliminate_prog(test_prog)
+    expected: List[Statement] = Parser(Lexer(exp_prog)).parse()
+    assert repr(ast).replace("$cse", "cse") == repr(expected)
+
+
+def run_cse_vm_test(test_prog: str, exp_obj: Object):
+    for opt_level in (0, 2):
+        bytecode, err = PassManager(opt_level).compile(Parser(Lexer(test_prog)).parse())
+        assert err is None
+        vm = VM(bytecode)
+        assert vm.run() is None
+        assert vm.last_popped() == exp_obj
+
+
+def test_repeated_expressions():
+    run_cse_test("let c = a * b; a * b", "let cse0 = a * b; let c = cse0; cse0")
+    run_cse_test("xs[i] + xs[i]", "let cse0 = xs[i]; cse0 + cse0")
+    run_cse_test("len(xs) > 1; len(xs)", "let cse0 = len(xs); cse0 > 1; cse0")
+    run_cse_test("-(a + 1) * -(a + 1)", "let cse0 = -(a + 1); cse0 * cse0")
+    run_cse_test("a + b", "a + b")
+    run_cse_test("-a * -a", "-a * -a")
+
+
+def test_largest_first():
+    run_cse_test(
+        "let x = a * b + 1; let y = a * b + 1; a * b",
+        "let cse1 = a * b; let cse0 = cse1 + 1; let x = cse0; let y = cse0; cse1",
+    )
+
+
+def test_if_arms():
+    run_cse_test(
+        "if (xs[i] > 1) { xs[i] } else { 0 }",
+        "let cse0 = xs[i]; if (cse0 > 1) { cse0 } else { 0 }",
+    )
+    run_cse_test(
+        "if (c) { a * b } else { a * b }",
+        "if (c) { a * b } else { a * b }",
+    )
+    run_cse_test(
+        "fn(x) { let y = x * x; x * x }",
+        "fn(x) { let cse0 = x * x; let y = cse0; cse0 }",
+    )
+
+
+def test_impure_calls():
+    run_cse_test("puts(a) + puts(a)", "puts(a) + puts(a)")
+    run_cse_test("f(a) + f(a)", "f(a) + f(a)")
+    # Hoisting past a call that already ran would reorder it with any error
+    run_cse_test("f() + a * b + a * b", "f() + a * b + a * b")
+    run_cse_test("puts(a * b); a * b", "let cse0 = a * b; puts(cse0); cse0")
+    run_cse_test("let len = fn(x) { x }; len(a) + len(a)", "let len = fn(x) { x }; len(a) + len(a)")
+
+    compiler = Compiler()
+    compiler.symbol_table.define("first")
+    ast = CommonSubexpressionEliminator().eliminate(Parser(Lexer("first(a) + first(a)")).parse(), compiler.symbol_table)
+    assert ast == Parser(Lexer("first(a) + first(a)")).parse()
+
+
+def test_rebinding():
+    run_cse_test("let y = a * a; let a = 3; a * a", "let y = a * a; let a = 3; a * a")
+    run_cse_test("let y = a * a; if (c) { let a = 3; }; a * a", "let y = a * a; if (c) { let a = 3; }; a * a")
+
+
+def test_semantics_preserved():
+    run_cse_vm_test("let a = 3; let b = 4; let c = a * b + 1; let d = a * b + 1; c + d + a * b", IntObject(38))
+    run_cse_vm_test(
+        "let xs = [1, 2, 3]; let f = fn(i) { if (xs[i] > 1) { xs[i] } else { len(xs) + len(xs) } }; f(1) + f(0)",
+        IntObject(8),
+    )
+    run_cse_vm_test("let a = 2; let b = a * a; let a = 3; a * a + b", IntObject(13))
+
+
+def test_loops():
+    # Loop bodies repeat, so nothing inside them is hoisted in front of the loop
+    run_cse_test("while (c) { puts(a * b) }; a * b", "while (c) { puts(a * b) }; a * b")
+    run_cse_test("let x = a * b; while (c) { puts(a * b) }", "let cse0 = a * b; let x = cse0; while (c) { puts(cse0) }")
+    run_cse_test("let x = a * b; while (c) { let a = 1; a * b }", "let x = a * b; while (c) { let a = 1; a * b }")
+    run_cse_test("let x = a * b; for (a in xs) { a * b }", "let x = a * b; for (a in xs) { a * b }")
+    run_cse_vm_test("let a = 2; let b = a * a; let i = 0; while (i < 3) { let a = a * a + i; let i = i + 1 }; a * a + b", IntObject(84685))
+
+
+def test_mutation():
+    # Collections change in place, so reads of their contents do not survive a write or an unknown call
+    run_cse_test("let a = xs[0]; xs[0] = 5; xs[0]", "let a = xs[0]; xs[0] = 5; xs[0]")
+    run_cse_test("let a = len(xs); append(xs, 1); len(xs)", "let a = len(xs); append(xs, 1); len(xs)")
+    run_cse_test("let a = xs == ys; f(xs); xs == ys", "let a = xs == ys; f(xs); xs == ys")
+    run_cse_test("let a = xs[i] + k * 2; xs[i] = k * 2", "let cse0 = k * 2; let a = xs[i] + cse0; xs[i] = cse0")
+    run_cse_test("let a = xs[0]; if (c) { xs[0] = 1 }; xs[0]", "let a = xs[0]; if (c) { xs[0] = 1 }; xs[0]")
+    run_cse_vm_test("let xs = [1, 2]; let a = xs[0] + len(xs); xs[0] = 7; append(xs, 3); a + xs[0] + len(xs)", IntObject(13))
+
+
+def test_new_collections_not_shared():
+    # Each evaluation makes its own array or map, sharing one result would alias them
+    run_cse_test("let b = rest(a); let c = rest(a); c", "let b = rest(a); let c = rest(a); c")
+    run_cse_test("let b = [x, y]; let c = [x, y]; c", "let b = [x, y]; let c = [x, y]; c")
+    run_cse_test("let b = {1: x}; let c = {1: x}; c", "let b = {1: x}; let c = {1: x}; c")
+    run_cse_test("let b = [[x]][0]; let c = [[x]][0]; c", "let b = [[x]][0]; let c = [[x]][0]; c")
+    run_cse_vm_test(
+        "let a = [1, 2, 3]; let b = rest(a); let c = rest(a); append(b, 9); c",
+        ArrayObject([IntObject(2), IntObject(3)]),
+    )
+    run_cse_vm_test(
+        "let f = fn(a) { let b = rest(a); let c = rest(a); b[0] = 0; c }; f([1, 2, 3])",
+        ArrayObject([IntObject(2), IntObject(3)]),
+    )
+    run_cse_vm_test("let x = 1; let b = [[x]][0]; let c = [[x]][0]; append(b, 9); c", ArrayObject([IntObject(1)]))
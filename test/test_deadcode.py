@@ -0,0 +1,157 @@
+from typing import List
+
+from pycompiler.compiler import Compiler
+from pycompiler.optimizer import DeadCodeEliminator, PeepholeOptimizer, PassManager
+from pycompiler.code import make, Opcode, Instructions, instructions_to_str
+from pycompiler.objects import Object, IntObject, NullObject, CompiledFunctionObject
+from pycompiler.parser import Parser, Statement
+from pycompiler.lexer import Lexer
+from pycompiler.vm import VM
+
+
+def concat_insts(insts: List[Instructions]) -> Instructions:
+    output = bytearray()
+    for ins in insts:
+        output += ins
+    return output
+
+
+def eliminate_prog(test_prog: str):
+    eliminator = DeadCodeEliminator()
+    ast: List[Statement] = eliminator.eliminate(Parser(Lexer(test_prog)).parse())
+    compiler = Compiler()
+    assert compiler.compile(ast) is None
+    bytecode = PeepholeOptimizer().optimize(compiler.bytecode())
+    bytecode = PeepholeOptimizer().optimize(eliminator.eliminate_bytecode(bytecode))
+    return bytecode, eliminator
+
+
+def run_deadcode_test(test_prog: str, exp_insts_list: List[Instructions]):
+    bytecode, _ = eliminate_prog(test_prog)
+    assert instructions_to_str(bytecode[0]) == instructions_to_str(concat_insts(exp_insts_list))
+
+
+def run_deadcode_vm_test(test_prog: str, exp_obj: Object):
+    bytecode, _ = eliminate_prog(test_prog)
+    vm = VM(bytecode)
+    assert vm.run() is None
+    assert vm.last_popped() == exp_obj
+
+
+def test_constant_branches():
+    run_deadcode_test(
+        "if (true) {5}; 3333;",
+        [
+            make(Opcode.CONSTANT, [1]),
+            make(Opcode.POP, []),
+        ],
+    )
+    run_deadcode_test(
+        "if (false) {5} else {10}",
+        [
+            make(Opcode.CONSTANT, [0]),
+            make(Opcode.POP, []),
+        ],
+    )
+    run_deadcode_test(
+        "if (!true) {5}",
+        [
+            make(Opcode.NULL, []),
+            make(Opcode.POP, []),
+        ],
+    )
+    run_deadcode_test(
+        "let x = 1; if (0) {x} else {x + 1}",
+        [
+            make(Opcode.CONSTANT, [0]),
+            make(Opcode.SETGLOBAL, [0]),
+            make(Opcode.GETGLOBAL, [0]),
+            make(Opcode.CONSTANT, [1]),
+            make(Opcode.ADD, []),
+            make(Opcode.POP, []),
+        ],
+    )
+
+
+def test_after_return():
+    bytecode, eliminator = eliminate_prog("fn() { return 1; 2; 3 }")
+    func = bytecode[1][1].func
+    assert isinstance(func, CompiledFunctionObject)
+    assert instructions_to_str(func.value) == instructions_to_str(
+        concat_insts(
+            [
+                make(Opcode.CONSTANT, [0]),
+                make(Opcode.RETURNVALUE, []),
+            ]
+        )
+    )
+    assert eliminator.statements_removed == 2
+
+
+def test_pure_statements():
+    bytecode, eliminator = eliminate_prog('1; "two"; [3, 4]; !true; 5 * 6; puts(7); 8')
+    assert instructions_to_str(bytecode[0]) == instructions_to_str(
+        concat_insts(
+            [
+                make(Opcode.GETBUILTIN, [1]),
+                make(Opcode.CONSTANT, [0]),
+                make(Opcode.CALL, [1]),
+                make(Opcode.POP, []),
+                make(Opcode.CONSTANT, [1]),
+                make(Opcode.POP, []),
+            ]
+        )
+    )
+    assert eliminator.statements_removed == 5
+
+
+def test_identifier_statements():
+    # Names that resolve are dropped like any other pure statement
+    _, eliminator = eliminate_prog("let x = 1; x; len; let f = fn(a) { a; f; x; 2 }; for (y in [1]) { y; 3 }; f(1)")
+    assert eliminator.statements_removed == 6
+
+    # An undefined name is still a compile error at every level
+    programs = [
+        "undefined_name; 1",
+        "let f = fn(a) { a; b; 1 }; 2",
+        "let g = fn() { let y = 1; 2 }; y; 3",
+        # Arms are compiled in order, a let in the else arm does not bind for the then arm
+        "let c = true; if (c) { x; 1 } else { let x = 1 }",
+    ]
+    for prog in programs:
+        for opt_level in (0, 1, 2):
+            _, err = PassManager(opt_level).compile(Parser(Lexer(prog)).parse(), Compiler())
+            assert err is not None and err.startswith("Cannot resolve identifier"), prog
+
+
+def test_unreachable_instructions():
+    eliminator = DeadCodeEliminator()
+    instructions = concat_insts(
+        [
+            # 0000
+            make(Opcode.GETLOCAL, [0]),
+            # 0002
+            make(Opcode.RETURNVALUE, []),
+            # 0003
+            make(Opcode.CONSTANT, [0]),
+            # 0006
+            make(Opcode.RETURNVALUE, []),
+        ]
+    )
+    assert instructions_to_str(eliminator.eliminate_instructions(instructions)) == instructions_to_str(
+        concat_insts(
+            [
+                make(Opcode.GETLOCAL, [0]),
+                make(Opcode.RETURNVALUE, []),
+            ]
+        )
+    )
+    assert eliminator.bytes_removed == 4
+
+
+def test_semantics_preserved():
+    run_deadcode_vm_test("if (true) {10} else {20}", IntObject(10))
+    run_deadcode_vm_test("if (false) {10}", NullObject())
+    run_deadcode_vm_test("1; 2; 3", IntObject(3))
+    run_deadcode_vm_test("let f = fn(x) { if (x > 1) { return x; 5 }; 0 }; f(3) + f(1)", IntObject(3))
+    run_deadcode_vm_test("let f = fn() { if (false) { 1 } else { return 2; 3 } }; f()", IntObject(2))
@@ -0,0 +1,74 @@
+import io
+import json
+from typing import List
+
+from pycompiler.compiler import Compiler, disassemble, disassembly_to_text, write_disassembly
+from pycompiler.code import make, Opcode, iter_instructions, instructions_to_str
+from pycompiler.optimizer import PassManager
+from pycompiler.repl import disassemble_file
+from pycompiler.parser import Parser, Statement
+from pycompiler.lexer import Lexer
+
+
+def compile_prog(test_prog: str):
+    ast: List[Statement] = Parser(Lexer(test_prog)).parse()
+    bytecode, err = PassManager(0).compile(ast, Compiler())
+    assert err is None
+    return bytecode
+
+
+def test_iter_instructions():
+    instructions = make(Opcode.CONSTANT, [1]) + make(Opcode.GETLOCAL, [300]) + make(Opcode.CLOSURE, [2, 1]) + make(Opcode.POP)
+    assert list(iter_instructions(instructions)) == [
+        (0, Opcode.CONSTANT, [1], False),
+        (3, Opcode.GETLOCAL, [300], True),
+        (9, Opcode.CLOSURE, [2, 1], False),
+        (13, Opcode.POP, [], False),
+    ]
+    assert instructions_to_str(instructions) == "0000 CONSTANT 1\n0003 WIDE GETLOCAL 300\n0009 CLOSURE 2 1\n000D POP\n"
+    # The buffer can still grow once decoding is done
+    instructions += make(Opcode.POP)
+
+
+def test_iter_instructions_while_resizing():
+    instructions = bytearray(make(Opcode.CONSTANT, [1]) + make(Opcode.POP))
+    decoded = iter_instructions(instructions)
+    assert next(decoded) == (0, Opcode.CONSTANT, [1], False)
+    # A suspended iterator holds no export of the buffer, and sees what was appended
+    instructions += make(Opcode.TRUE)
+    assert list(decoded) == [(3, Opcode.POP, [], False), (4, Opcode.TRUE, [], False)]
+
+
+def test_nested_functions():
+    bytecode = compile_prog("let adder = fn(a) { fn(b) { a + b } }; let add = adder(1); [add(2), adder(3)(4)]")
+    functions = []
+    for index, _ in disassemble(bytecode):
+        if not functions or functions[-1] != index:
+            functions.append(index)
+    # The inner function follows the one that creates it, and nothing is listed twice
+    assert functions == [None, 1, 0]
+
+    text = "".join(disassembly_to_text(bytecode))
+    assert text.startswith("main:\n  0000 CONSTANT 1\n")
+    assert "\nconstant 1: fn(args=1, locals=1)\n  0000 GETLOCAL 0\n  0002 CLOSURE 0 1\n  0006 RETURNVALUE\n" in text
+    assert text.endswith("\nconstant 0: fn(args=1, locals=1)\n  0000 GETFREE 0\n  0002 GETLOCAL 0\n  0004 ADD\n  0005 RETURNVALUE\n")
+
+
+def test_json_output():
+    bytecode = compile_prog("let f = fn(x) { x }; f(1)")
+    out = io.StringIO()
+    write_disassembly(bytecode, out, "json")
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert records[0] == {"function": None, "pos": 0, "op": "CONSTANT", "operands": [0], "wide": False}
+    assert records[-2:] == [
+        {"function": 0, "pos": 0, "op": "GETLOCAL", "operands": [0], "wide": False},
+        {"function": 0, "pos": 2, "op": "RETURNVALUE", "operands": [], "wide": False},
+    ]
+
+
+def test_disassemble_file(tmp_path):
+    path = tmp_path / "main.mk"
+    path.write_text("let x = 1; x")
+    out = io.StringIO()
+    assert disassemble_file(str(path), out) is None
+    assert out.getvalue() == "main:\n  0000 CONSTANT 0\n  0003 SETGLOBAL 0\n  0006 GETGLOBAL 0\n  0009 POP\n"
@@ -0,0 +1,63 @@
+from typing import List
+
+from pycompiler.modules import IncrementalCompiler
+from pycompiler.parser import Parser, Statement
+from pycompiler.lexer import Lexer
+from pycompiler.repl import compile_source
+from pycompiler.vm import VM
+from pycompiler.objects import Object, IntObject
+
+
+def run_incremental_test(compiler: IncrementalCompiler, source: str, expected: Object):
+    ast: List[Statement] = Parser(Lexer(source)).parse()
+    bytecode, err = compiler.compile(ast)
+    assert err is None
+    vm = VM(bytecode)
+    assert vm.run() is None
+    assert vm.last_popped() == expected
+
+
+PROGRAM = """
+let square = fn(x) { x * x };
+let base = 10;
+let pick = fn(x) { if (x > base) { x } else { base } };
+pick(square(3)) + base
+"""
+
+
+def test_matches_whole_program():
+    ast: List[Statement] = Parser(Lexer(PROGRAM)).parse()
+    bytecode, err = IncrementalCompiler().compile(ast)
+    assert err is None
+    assert bytecode == compile_source(PROGRAM)[0]
+
+
+def test_unchanged_statements_reused():
+    for opt_level in range(3):
+        compiler = IncrementalCompiler(opt_level)
+        run_incremental_test(compiler, PROGRAM, IntObject(20))
+        assert (compiler.compiled, compiler.reused) == (4, 0)
+        run_incremental_test(compiler, PROGRAM, IntObject(20))
+        assert (compiler.compiled, compiler.reused) == (4, 4)
+
+
+def test_changed_statements_recompiled():
+    compiler = IncrementalCompiler()
+    run_incremental_test(compiler, PROGRAM, IntObject(20))
+
+    # Same layout, so only the edited statement is compiled again
+    run_incremental_test(compiler, PROGRAM.replace("let base = 10", "let base = 5"), IntObject(14))
+    assert (compiler.compiled, compiler.reused) == (5, 3)
+
+    # A new definition moves every later global, so everything after it is recompiled
+    edited = PROGRAM.replace("let base = 10;", "let offset = 1; let base = 10;")
+    run_incremental_test(compiler, edited, IntObject(20))
+    assert (compiler.compiled, compiler.reused) == (9, 4)
+
+
+def test_errors_keep_earlier_statements():
+    compiler = IncrementalCompiler()
+    ast: List[Statement] = Parser(Lexer("let a = 1; b")).parse()
+    assert compiler.compile(ast) == (None, "Cannot resolve identifier b")
+    run_incremental_test(compiler, "let a = 1; let b = 2; a + b", IntObject(3))
+    assert (compiler.compiled, compiler.reused) == (3, 1)
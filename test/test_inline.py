@@ -0,0 +1,140 @@
+from typing import List
+
+from pycompiler.compiler import Compiler
+from pycompiler.optimizer import Inliner, PeepholeOptimizer, walk
+from pycompiler.code import make, Opcode, Instructions, instructions_to_str
+from pycompiler.objects import Object, IntObject, ArrayObject
+from pycompiler.parser import Parser, Statement, LiteralExpression
+from pycompiler.lexer import Lexer
+from pycompiler.vm import VM
+
+
+def concat_insts(insts: List[Instructions]) -> Instructions:
+    output = bytearray()
+    for ins in insts:
+        output += ins
+    return output
+
+
+def inline_prog(test_prog: str, threshold: int | None = None):
+    inliner = Inliner() if threshold is None else Inliner(threshold)
+    ast: List[Statement] = inliner.inline(Parser(Lexer(test_prog)).parse())
+    compiler = Compiler()
+    assert compiler.compile(ast) is None
+    return PeepholeOptimizer().optimize(compiler.bytecode()), inliner
+
+
+def run_inline_vm_test(test_prog: str, exp_obj: Object, exp_inlined: int):
+    bytecode, inliner = inline_prog(test_prog)
+    vm = VM(bytecode)
+    assert vm.run() is None
+    assert vm.last_popped() == exp_obj
+    assert inliner.inlined == exp_inlined
+
+
+def test_inline_expression():
+    bytecode, inliner = inline_prog("let add = fn(a, b) { a + b }; add(1, 2)")
+    assert inliner.inlined == 1
+    assert instructions_to_str(bytecode[0]) == instructions_to_str(
+        concat_insts(
+            [
+                make(Opcode.CONSTANT, [0]),
+                make(Opcode.SETGLOBAL, [0]),
+                make(Opcode.CONSTANT, [1]),
+                make(Opcode.CONSTANT, [2]),
+                make(Opcode.ADD, []),
+                make(Opcode.POP, []),
+            ]
+        )
+    )
+
+
+def test_inline_locals():
+    bytecode, inliner = inline_prog("let sq = fn(a) { a * a }; let f = fn(x) { sq(x + 1) }")
+    assert inliner.inlined == 1
+    func = bytecode[1][2].func
+    assert func.num_locals == 2
+    assert instructions_to_str(func.value) == instructions_to_str(
+        concat_insts(
+            [
+                make(Opcode.GETLOCAL, [0]),
+                make(Opcode.CONSTANT, [1]),
+                make(Opcode.ADD, []),
+                make(Opcode.SETLOCAL, [1]),
+                make(Opcode.GETLOCAL, [1]),
+                make(Opcode.GETLOCAL, [1]),
+                make(Opcode.MUL, []),
+                make(Opcode.RETURNVALUE, []),
+                make(Opcode.NULL, []),
+                make(Opcode.RETURNVALUE, []),
+            ]
+        )
+    )
+
+
+def test_not_inlined():
+    # Recursive
+    run_inline_vm_test("let f = fn(x) { if (x > 0) { f(x - 1) } else { 7 } }; f(3)", IntObject(7), 0)
+    # Rebound
+    run_inline_vm_test("let f = fn() { 1 }; let f = fn() { 2 }; f()", IntObject(2), 0)
+    # Shadowed at the call site
+    run_inline_vm_test("let f = fn() { 1 }; let g = fn(f) { f() }; g(fn() { 5 })", IntObject(5), 1)
+    # Depends on a global that is redefined after the function
+    run_inline_vm_test("let a = 1; let f = fn() { a }; let a = 2; f()", IntObject(1), 0)
+    # Depends on a global that a loop assigns
+    run_inline_vm_test(
+        "let a = 1; let f = fn() { a }; let i = 0; while (i < 1) { let a = 2; let i = i + 1 }; f()", IntObject(2), 0
+    )
+    # A builtin the unit shadows after the function is defined
+    run_inline_vm_test("let f = fn(a) { len(a) }; let len = fn(x) { 99 }; f([1])", IntObject(1), 0)
+    # Calls a global that is only defined later keeps the compile error
+    inliner = Inliner()
+    ast = inliner.inline(Parser(Lexer("let f = fn() { g() }; let g = fn() { 1 }; f()")).parse())
+    assert inliner.inlined == 0
+    assert Compiler().compile(ast) == "Cannot resolve identifier g"
+    # Wrong number of arguments keeps the runtime error
+    bytecode, inliner = inline_prog("let f = fn(a) { a }; f()")
+    assert inliner.inlined == 0
+    assert VM(bytecode).run() == "wrong number of args: want 1, got 0"
+
+
+def test_expansions_do_not_share_nodes():
+    inliner = Inliner()
+    ast = inliner.inline(Parser(Lexer("let n = 1; let g = fn() { n }; [g(), g()]")).parse())
+    assert inliner.inlined == 2
+    found = [node for node in walk(ast[2]) if isinstance(node, LiteralExpression)]
+    # The array and one n per expansion, the resolver annotates each separately
+    assert len(found) == 3
+    assert found[1] is not found[2]
+    assert found[1].literal is not found[2].literal
+    assert found[1].literal is not ast[1].expr.literal.body.statements[0].expr.literal
+
+
+def test_threshold():
+    _, inliner = inline_prog("let add = fn(a, b) { a + b }; add(1, 2)", 0)
+    assert inliner.inlined == 0
+    _, inliner = inline_prog("let add = fn(a, b) { a + b }; add(1, 2)", 2)
+    assert inliner.inlined == 0
+
+
+def test_semantics_preserved():
+    run_inline_vm_test(
+        "let sq = fn(a) { let t = a * a; t + 1 }; let g = fn(x) { sq(x + 1) }; g(2)",
+        IntObject(10),
+        2,
+    )
+    run_inline_vm_test(
+        "let f = fn(x) { if (x > 1) { x } else { 0 } }; [f(3), f(0), f(f(5))]",
+        ArrayObject([IntObject(3), IntObject(0), IntObject(5)]),
+        4,
+    )
+    run_inline_vm_test(
+        "let n = 10; let addn = fn(a) { a + n }; let f = fn(x) { addn(x) * 2 }; f(1)",
+        IntObject(22),
+        2,
+    )
+    run_inline_vm_test(
+        "let sum = fn(xs) { let t = 0; for (x in xs) { let t = t + x }; t }; let i = 0; while (i < 2) { let i = i + sum([i, 1]) }; i",
+        IntObject(3),
+        1,
+    )
@@ -0,0 +1,73 @@
+from typing import List
+
+from pycompiler.compiler import Compiler, BasicBlock, linearize, assemble
+from pycompiler.code import make, Opcode, Ins, Instructions, instructions_to_str
+from pycompiler.parser import Parser, Statement
+from pycompiler.lexer import Lexer
+
+
+def concat_insts(insts: List[Instructions]) -> Instructions:
+    output = bytearray()
+    for ins in insts:
+        output += ins
+    return output
+
+
+def compile_blocks(test_prog: str) -> List[BasicBlock]:
+    ast: List[Statement] = Parser(Lexer(test_prog)).parse()
+    compiler = Compiler()
+    assert compiler.compile(ast) is None
+    return compiler.scopes[0].blocks
+
+
+def test_if_blocks():
+    blocks = compile_blocks("if (true) { 10 } else { 20 }; 30")
+    assert [[ins.op for ins in block.instructions] for block in blocks] == [
+        [Opcode.TRUE, Opcode.JUMPCOND],
+        [Opcode.CONSTANT, Opcode.JUMP],
+        [Opcode.CONSTANT],
+        [Opcode.POP, Opcode.CONSTANT, Opcode.POP],
+    ]
+    assert blocks[0].successors() == [blocks[2], blocks[1]]
+    assert blocks[1].successors() == [blocks[3]]
+    assert blocks[2].successors() == [blocks[3]]
+    assert blocks[3].successors() == []
+
+
+def test_return_starts_block():
+    ast: List[Statement] = Parser(Lexer("fn() { return 1; 2 }")).parse()
+    compiler = Compiler()
+    compiler._enter_scope()
+    assert compiler.compile(ast[0].expr.literal.body.statements) is None
+    blocks = compiler.scopes[1].blocks
+    assert len(blocks) == 2
+    assert blocks[0].terminator().op == Opcode.RETURNVALUE
+    assert blocks[0].successors() == []
+
+
+def test_linearize():
+    entry, middle, last = BasicBlock(0), BasicBlock(1), BasicBlock(2)
+    entry.instructions = [Ins(Opcode.TRUE, []), Ins(Opcode.JUMPCOND, [])]
+    entry.instructions[1].target = middle
+    entry.fallthrough = last
+    last.instructions = [Ins(Opcode.NULL, []), Ins(Opcode.RETURNVALUE, [])]
+    middle.fallthrough = last
+
+    # The fallthrough moved away from entry needs an explicit jump, the empty block resolves to its successor
+    assert instructions_to_str(assemble([entry, middle, last])) == instructions_to_str(
+        concat_insts(
+            [
+                # 0000
+                make(Opcode.TRUE, []),
+                # 0001
+                make(Opcode.JUMPCOND, [7]),
+                # 0004
+                make(Opcode.JUMP, [7]),
+                # 0007
+                make(Opcode.NULL, []),
+                # 0008
+                make(Opcode.RETURNVALUE, []),
+            ]
+        )
+    )
+    assert len(linearize([entry, middle, last]).instructions) == 5
@@ -80,6 +80,23 @@ def test_keyword_tokens():
     )
 
 
+def test_import_tokens():
+    assert_output('import "lib.mk"', [Token(TokenType.IMPORT), Token(TokenType.STRING, "lib.mk")])
+
+
+def test_loop_tokens():
+    assert_output(
+        "while for x in xs",
+        [
+            Token(TokenType.WHILE),
+            Token(TokenType.FOR),
+            Token(TokenType.IDENT, "x"),
+            Token(TokenType.IN),
+            Token(TokenType.IDENT, "xs"),
+        ],
+    )
+
+
 def test_twochar_tokens():
     assert_output(
         "! != = ==",
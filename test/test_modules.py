@@ -0,0 +1,119 @@
+import os
+from typing import Dict
+
+from pycompiler.modules import ModuleBuilder, scan_imports
+from pycompiler.cache import BytecodeCache
+from pycompiler.repl import compile_source
+from pycompiler.vm import VM
+from pycompiler.objects import Object, IntObject
+
+
+def write_modules(tmp_path, modules: Dict[str, str]) -> None:
+    for name, source in modules.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(source)
+
+
+def run_modules_test(builder: ModuleBuilder, path: str, expected: Object):
+    bytecode, err = builder.build(path)
+    assert err is None
+    vm = VM(bytecode)
+    assert vm.run() is None
+    assert vm.last_popped() == expected
+
+
+LIBRARY = {
+    "lib/math.mk": "let square = fn(x) { x * x }; let base = 10;",
+    "lib/util.mk": 'import "math.mk"; let add_base = fn(x) { x + base }; let twice = fn(f, x) { f(f(x)) };',
+    "main.mk": 'import "lib/util.mk"; import "lib/math.mk"; let r = twice(square, 3); add_base(r) + square(base)',
+}
+
+
+def test_scan_imports():
+    assert scan_imports("let x = 1") == []
+    assert scan_imports('import "a.mk"; let s = "b.mk"; import "c.mk"') == ["a.mk", "c.mk"]
+
+
+def test_link_modules(tmp_path):
+    write_modules(tmp_path, LIBRARY)
+    for opt_level in range(3):
+        run_modules_test(ModuleBuilder(opt_level, workers=1), str(tmp_path / "main.mk"), IntObject(191))
+
+
+def test_single_module_matches_compile_source(tmp_path):
+    write_modules(tmp_path, {"main.mk": "let f = fn(x) { if (x > 1) { x } else { 0 } }; f(3)"})
+    bytecode, err = ModuleBuilder(workers=1).build(str(tmp_path / "main.mk"))
+    assert err is None
+    assert bytecode == compile_source("let f = fn(x) { if (x > 1) { x } else { 0 } }; f(3)")[0]
+
+
+def test_imports_are_not_reexported(tmp_path):
+    write_modules(tmp_path, {**LIBRARY, "main.mk": 'import "lib/util.mk"; base'})
+    _, err = ModuleBuilder(workers=1).build(str(tmp_path / "main.mk"))
+    assert err == f"{tmp_path / 'main.mk'}: Cannot resolve identifier base"
+
+
+def test_shadowing_imports(tmp_path):
+    write_modules(tmp_path, {**LIBRARY, "main.mk": 'import "lib/math.mk"; let base = 1; import "lib/util.mk"; add_base(base)'})
+    run_modules_test(ModuleBuilder(workers=1), str(tmp_path / "main.mk"), IntObject(11))
+
+
+def test_units_compiled_once(tmp_path):
+    write_modules(tmp_path, LIBRARY)
+    builder = ModuleBuilder(workers=1)
+    run_modules_test(builder, str(tmp_path / "main.mk"), IntObject(191))
+    assert builder.compiled == 3
+    run_modules_test(builder, str(tmp_path / "main.mk"), IntObject(191))
+    assert builder.compiled == 3
+
+    # Importers only depend on the names a module exports, not on its code
+    write_modules(tmp_path, {"lib/util.mk": 'import "math.mk"; let add_base = fn(x) { x + base + 1 }; let twice = fn(f, x) { f(f(x)) };'})
+    run_modules_test(builder, str(tmp_path / "main.mk"), IntObject(192))
+    assert builder.compiled == 4
+
+    write_modules(tmp_path, {"lib/util.mk": 'import "math.mk"; let add_base = fn(x) { x + base }; let twice = 2;'})
+    write_modules(tmp_path, {"main.mk": 'import "lib/util.mk"; add_base(twice)'})
+    run_modules_test(builder, str(tmp_path / "main.mk"), IntObject(12))
+    assert builder.compiled == 6
+
+
+def test_parallel_build(tmp_path):
+    modules = {f"lib{i}.mk": f"let value{i} = {i};" for i in range(4)}
+    modules["main.mk"] = "".join(f'import "lib{i}.mk"; ' for i in range(4)) + "value0 + value1 + value2 + value3"
+    write_modules(tmp_path, modules)
+    builder = ModuleBuilder(workers=2)
+    run_modules_test(builder, str(tmp_path / "main.mk"), IntObject(6))
+    assert builder.compiled == 5
+    assert builder.build(str(tmp_path / "main.mk")) == ModuleBuilder(workers=1).build(str(tmp_path / "main.mk"))
+
+
+def test_build_cache(tmp_path):
+    write_modules(tmp_path, LIBRARY)
+    cache = BytecodeCache(str(tmp_path / "cache"))
+    builder = ModuleBuilder(workers=1, cache=cache)
+    run_modules_test(builder, str(tmp_path / "main.mk"), IntObject(191))
+    run_modules_test(ModuleBuilder(workers=1, cache=cache), str(tmp_path / "main.mk"), IntObject(191))
+    assert cache.hits == 1
+
+
+def test_module_errors(tmp_path):
+    write_modules(
+        tmp_path,
+        {
+            "a.mk": 'import "b.mk"; let a = 1;',
+            "b.mk": 'import "a.mk"; let b = 1;',
+            "missing.mk": 'import "nowhere.mk";',
+            "c.mk": "let c = 1;",
+            "nested.mk": 'let f = fn() { import "c.mk"; 1 };',
+        },
+    )
+    builder = ModuleBuilder(workers=1)
+    a, b = str(tmp_path / "a.mk"), str(tmp_path / "b.mk")
+    assert builder.build(a) == (None, f"import cycle: {a} -> {b} -> {a}")
+    assert builder.build(str(tmp_path / "missing.mk")) == (
+        None,
+        f"cannot import {tmp_path / 'nowhere.mk'}: No such file or directory",
+    )
+    _, err = builder.build(str(tmp_path / "nested.mk"))
+    assert err.endswith("import c.mk must be at the top level")
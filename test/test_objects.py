@@ -0,0 +1,104 @@
+import pickle
+from array import array
+from copy import copy
+
+import pytest
+
+from pycompiler.objects import (
+    Object,
+    IntObject,
+    StringObject,
+    BooleanObject,
+    NullObject,
+    ArrayObject,
+    IntArrayObject,
+    MapObject,
+    IteratorObject,
+    ClosureObject,
+    CompiledFunctionObject,
+    BUILTINS,
+    int_array,
+)
+
+
+def test_no_instance_dicts():
+    for obj in [
+        Object(),
+        IntObject(1),
+        StringObject("a"),
+        BooleanObject(True),
+        NullObject(),
+        ArrayObject([]),
+        MapObject({}),
+        ClosureObject(CompiledFunctionObject(bytearray(), 0, 0), []),
+        BUILTINS[0],
+    ]:
+        assert not hasattr(obj, "__dict__"), type(obj).__name__
+
+
+def test_scalars_are_immutable():
+    for obj in [IntObject(1), StringObject("a"), BooleanObject(True), NullObject()]:
+        with pytest.raises(AttributeError):
+            obj.value = 2
+        with pytest.raises(AttributeError):
+            obj.other = 2
+        assert copy(obj) is obj
+        assert pickle.loads(pickle.dumps(obj)) == obj
+
+    assert {IntObject(1): 1, StringObject("a"): 2}[StringObject("a")] == 2
+    # Every scalar hashes by value, and a boolean stays distinct from the int it hashes like
+    assert hash(BooleanObject(True)) == hash(BooleanObject(True))
+    assert hash(NullObject()) == hash(NullObject())
+    assert {BooleanObject(True): 1, IntObject(1): 2, NullObject(): 3}[BooleanObject(True)] == 1
+
+    # Containers are still updated in place
+    array = ArrayObject([IntObject(1)])
+    array.value[0] = IntObject(2)
+    assert array == ArrayObject([IntObject(2)])
+
+
+def test_int_array():
+    ints = int_array([IntObject(1), IntObject(2)])
+    assert isinstance(ints, IntArrayObject)
+    assert ints.ints == array("q", [1, 2])
+    assert ints == ArrayObject([IntObject(1), IntObject(2)])
+    assert repr(ints) == repr(ArrayObject([IntObject(1), IntObject(2)]))
+    assert ints.get(IntObject(1)) == IntObject(2)
+    assert ints.get(IntObject(2)) == NullObject()
+
+    ints.set(0, IntObject(5))
+    ints.append(IntObject(6))
+    assert ints.ints == array("q", [5, 2, 6])
+
+    # Too large for the buffer, or not an int at all
+    assert type(int_array([IntObject(1 << 63)])) is ArrayObject
+    assert type(int_array([IntObject(1), StringObject("a")])) is ArrayObject
+
+
+def test_int_array_boxes():
+    ints = int_array([IntObject(1), IntObject(2)])
+    iterator = IteratorObject(ints)
+    ints.set(1, StringObject("a"))
+    assert type(ints) is ArrayObject
+    assert ints.value == [IntObject(1), StringObject("a")]
+    # Anything already holding the array sees the change
+    assert iterator.value.item(1) == StringObject("a")
+
+    ints = int_array([IntObject(1)])
+    ints.append(IntObject(1 << 64))
+    assert ints == ArrayObject([IntObject(1), IntObject(1 << 64)])
+
+    # Reading the elements hands out boxed copies and leaves the array unboxed
+    ints = int_array([IntObject(3)])
+    assert ints.elements() == [IntObject(3)]
+    assert type(ints) is IntArrayObject
+
+    # A copy has its own buffer
+    copied = copy(ints)
+    copied.append(IntObject(4))
+    assert ints.ints == array("q", [3])
+    assert copied.ints == array("q", [3, 4])
+    boxed = ArrayObject([StringObject("a")])
+    copied = copy(boxed)
+    copied.append(IntObject(4))
+    assert boxed.value == [StringObject("a")]
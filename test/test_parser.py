@@ -16,9 +16,13 @@ from pycompiler.parser import (
     InfixExpression,
     CallExpression,
     IfExpression,
+    WhileExpression,
+    ForExpression,
     LetStatement,
     ReturnStatement,
     ExpressionStatement,
+    ImportStatement,
+    IndexAssignStatement,
     BlockStatement,
 )
 
@@ -201,6 +205,72 @@ def test_return_statement():
     )
 
 
+def test_import_statement():
+    assert_parser_output('import "lib/math.mk";', [ImportStatement("lib/math.mk")])
+
+
+def test_loop_expressions():
+    assert_parser_output(
+        "while (x) { f(x) }",
+        [
+            ExpressionStatement(
+                WhileExpression(
+                    LiteralExpression(IdentifierLiteral(Token(TokenType.IDENT, "x"))),
+                    BlockStatement(
+                        [
+                            ExpressionStatement(
+                                CallExpression(
+                                    LiteralExpression(IdentifierLiteral(Token(TokenType.IDENT, "f"))),
+                                    [LiteralExpression(IdentifierLiteral(Token(TokenType.IDENT, "x")))],
+                                )
+                            )
+                        ]
+                    ),
+                )
+            )
+        ],
+    )
+    assert_parser_output(
+        "for (x in xs) { x }",
+        [
+            ExpressionStatement(
+                ForExpression(
+                    Token(TokenType.IDENT, "x"),
+                    LiteralExpression(IdentifierLiteral(Token(TokenType.IDENT, "xs"))),
+                    BlockStatement([ExpressionStatement(LiteralExpression(IdentifierLiteral(Token(TokenType.IDENT, "x"))))]),
+                )
+            )
+        ],
+    )
+
+
+def test_index_assign_statement():
+    assert_parser_output(
+        "xs[0] = y;",
+        [
+            IndexAssignStatement(
+                LiteralExpression(IdentifierLiteral(Token(TokenType.IDENT, "xs"))),
+                LiteralExpression(IntLiteral(Token(TokenType.INT, "0"), 0)),
+                LiteralExpression(IdentifierLiteral(Token(TokenType.IDENT, "y"))),
+            )
+        ],
+    )
+    assert_parser_output(
+        "m[a][b] = 1",
+        [
+            IndexAssignStatement(
+                InfixExpression(
+                    LiteralExpression(IdentifierLiteral(Token(TokenType.IDENT, "m"))),
+                    Token(TokenType.LBRACKET, "["),
+                    LiteralExpression(IdentifierLiteral(Token(TokenType.IDENT, "a"))),
+                ),
+                LiteralExpression(IdentifierLiteral(Token(TokenType.IDENT, "b"))),
+                LiteralExpression(IntLiteral(Token(TokenType.INT, "1"), 1)),
+            )
+        ],
+    )
+
+
 def test_infix_expression():
     assert_parser_output(
         "12 * test",
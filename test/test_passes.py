@@ -0,0 +1,125 @@
+from typing import List
+
+from pycompiler.compiler import Compiler
+from pycompiler.optimizer import PassManager, fold_constant_branches, thread_jumps, remove_unreachable_blocks
+from pycompiler.code import make, Opcode, Instructions, instructions_to_str
+from pycompiler.objects import Object, IntObject, NullObject
+from pycompiler.parser import Parser, Statement
+from pycompiler.lexer import Lexer
+from pycompiler.vm import VM
+
+
+def concat_insts(insts: List[Instructions]) -> Instructions:
+    output = bytearray()
+    for ins in insts:
+        output += ins
+    return output
+
+
+def compile_prog(test_prog: str, opt_level: int):
+    pass_manager = PassManager(opt_level)
+    bytecode, err = pass_manager.compile(Parser(Lexer(test_prog)).parse())
+    assert err is None
+    return bytecode, pass_manager
+
+
+def run_passes_vm_test(test_prog: str, exp_obj: Object):
+    results = []
+    for opt_level in range(3):
+        vm = VM(compile_prog(test_prog, opt_level)[0])
+        assert vm.run() is None
+        results.append(vm.last_popped())
+    assert results == [exp_obj] * 3
+
+
+def test_levels():
+    assert [name for name, _ in PassManager(0).ast_passes] == []
+    assert [name for name, _ in PassManager(1).ast_passes] == ["deadcode", "types"]
+    assert [name for name, _ in PassManager(2).ast_passes] == ["inline", "deadcode", "cse", "types"]
+    assert [name for name, _ in PassManager(2).ir_passes] == ["fold-branches", "thread-jumps", "unreachable-blocks"]
+
+
+def test_o0_matches_compiler():
+    prog = "let f = fn(x) { if (x > 1) { return x; 5 }; 0 }; if (false) { 1 }; f(3)"
+    compiler = Compiler()
+    compiler.compile(Parser(Lexer(prog)).parse())
+    expected = compiler.bytecode()
+    bytecode, _ = compile_prog(prog, 0)
+    assert bytecode[0] == expected[0]
+    assert bytecode[1] == expected[1]
+
+
+def test_timings():
+    _, pass_manager = compile_prog("let f = fn(x) { x + 1 }; f(2)", 2)
+    assert set(pass_manager.timings) == {"inline", "deadcode", "cse", "types", "fold-branches", "thread-jumps", "unreachable-blocks", "codegen", "peephole"}
+    assert all(seconds >= 0 for seconds in pass_manager.timings.values())
+    assert pass_manager.report().startswith("-O2\n")
+
+
+def test_unreachable_blocks():
+    bytecode, _ = compile_prog("let f = fn() { if (true) { return 1 } else { return 2 }; 3 }; f()", 1)
+    assert instructions_to_str(bytecode[1][2].func.value) == instructions_to_str(
+        concat_insts(
+            [
+                make(Opcode.CONSTANT, [0]),
+                make(Opcode.RETURNVALUE, []),
+            ]
+        )
+    )
+
+
+def test_ir_passes():
+    ast: List[Statement] = Parser(Lexer("if (x) { 1 } else { 2 }")).parse()
+    compiler = Compiler()
+    compiler.symbol_table.define("x")
+    compiler.compile(ast)
+    blocks = compiler.scopes[0].blocks
+    blocks[1].instructions[-1].target = blocks[2]
+    blocks[2].instructions = []
+    blocks[2].fallthrough = blocks[3]
+
+    # A jump into an empty block is redirected to where control ends up
+    thread_jumps(blocks)
+    assert blocks[0].terminator().target is blocks[3]
+    assert blocks[1].terminator().target is blocks[3]
+    assert remove_unreachable_blocks(blocks) == [blocks[0], blocks[1], blocks[3]]
+
+    blocks[0].instructions[-1].op = Opcode.JUMP
+    blocks[0].fallthrough = None
+    assert remove_unreachable_blocks(blocks) == [blocks[0], blocks[3]]
+
+    # Each compiler gets its own pass list
+    passes = [thread_jumps]
+    compiler = Compiler(passes)
+    compiler.ir_passes.append(remove_unreachable_blocks)
+    assert passes == [thread_jumps]
+    assert Compiler().ir_passes == []
+
+
+def test_constant_branches():
+    ast: List[Statement] = Parser(Lexer("if (false) { 1 } else { 2 }")).parse()
+    compiler = Compiler()
+    compiler.compile(ast)
+    blocks = fold_constant_branches(compiler.scopes[0].blocks)
+    assert [ins.op for ins in blocks[0].instructions] == [Opcode.JUMP]
+    assert blocks[0].successors() == [blocks[2]]
+    assert remove_unreachable_blocks(blocks) == [blocks[0], blocks[2], blocks[3]]
+
+
+def test_semantics_preserved():
+    run_passes_vm_test("if (true) { 10 } else { 20 }", IntObject(10))
+    run_passes_vm_test("if (false) { 10 }", NullObject())
+    run_passes_vm_test("let sq = fn(x) { x * x }; sq(3) + sq(4)", IntObject(25))
+    run_passes_vm_test(
+        """
+        let fibonacci = fn(x) {
+            if (x == 0) {
+                return 0;
+            } else {
+                if (x == 1) { return 1; } else { fibonacci(x - 1) + fibonacci(x - 2); }
+            }
+        };
+        fibonacci(10);
+        """,
+        IntObject(55),
+    )
@@ -0,0 +1,162 @@
+from typing import List
+
+from pycompiler.compiler import Compiler
+from pycompiler.optimizer import PeepholeOptimizer
+from pycompiler.code import make, Opcode, Instructions, instructions_to_str
+from pycompiler.objects import Object, IntObject, CompiledFunctionObject
+from pycompiler.parser import Parser, Statement
+from pycompiler.lexer import Lexer
+from pycompiler.vm import VM
+
+
+def concat_insts(insts: List[Instructions]) -> Instructions:
+    output = bytearray()
+    for ins in insts:
+        output += ins
+    return output
+
+
+def optimize_prog(test_prog: str):
+    ast: List[Statement] = Parser(Lexer(test_prog)).parse()
+    compiler = Compiler()
+    compiler.compile(ast)
+    optimizer = PeepholeOptimizer()
+    return optimizer.optimize(compiler.bytecode()), optimizer
+
+
+def run_peephole_test(test_prog: str, exp_insts_list: List[Instructions], exp_saved: int):
+    bytecode, optimizer = optimize_prog(test_prog)
+    assert instructions_to_str(bytecode[0]) == instructions_to_str(concat_insts(exp_insts_list))
+    assert optimizer.bytes_saved == exp_saved
+
+
+def run_peephole_vm_test(test_prog: str, exp_obj: Object):
+    bytecode, _ = optimize_prog(test_prog)
+    vm = VM(bytecode)
+    assert vm.run() is None
+    assert vm.last_popped() == exp_obj
+
+
+def test_constant_condition():
+    run_peephole_test(
+        "if (true) {5}; 3333;",
+        [
+            # 0000
+            make(Opcode.CONSTANT, [0]),
+            # 0003
+            make(Opcode.JUMP, [7]),
+            # 0006
+            make(Opcode.NULL, []),
+            # 0007
+            make(Opcode.POP, []),
+            # 0008
+            make(Opcode.CONSTANT, [1]),
+            # 0011
+            make(Opcode.POP, []),
+        ],
+        4,
+    )
+    run_peephole_test(
+        "if (false) {5} else {10}",
+        [
+            # 0000
+            make(Opcode.JUMP, [9]),
+            # 0003
+            make(Opcode.CONSTANT, [0]),
+            # 0006
+            make(Opcode.JUMP, [12]),
+            # 0009
+            make(Opcode.CONSTANT, [1]),
+            # 0012
+            make(Opcode.POP, []),
+        ],
+        1,
+    )
+
+
+def test_push_pop():
+    run_peephole_test(
+        "1; let x = 2; x; 3",
+        [
+            make(Opcode.CONSTANT, [1]),
+            make(Opcode.SETGLOBAL, [0]),
+            make(Opcode.CONSTANT, [2]),
+            make(Opcode.POP, []),
+        ],
+        8,
+    )
+
+
+def test_jump_to_return():
+    bytecode, optimizer = optimize_prog("fn(a) { if (a) { 1 } else { 2 } }")
+    func = bytecode[1][2].func
+    assert isinstance(func, CompiledFunctionObject)
+    assert instructions_to_str(func.value) == instructions_to_str(
+        concat_insts(
+            [
+                make(Opcode.GETLOCAL, [0]),
+                make(Opcode.JUMPCOND, [9]),
+                make(Opcode.CONSTANT, [0]),
+                make(Opcode.RETURNVALUE, []),
+                make(Opcode.CONSTANT, [1]),
+                make(Opcode.RETURNVALUE, []),
+            ]
+        )
+    )
+    assert optimizer.bytes_saved == 2
+
+
+def test_jump_threading():
+    optimizer = PeepholeOptimizer()
+    instructions = concat_insts(
+        [
+            # 0000
+            make(Opcode.GETLOCAL, [0]),
+            # 0002
+            make(Opcode.JUMPCOND, [8]),
+            # 0005
+            make(Opcode.JUMP, [8]),
+            # 0008
+            make(Opcode.JUMP, [12]),
+            # 0011
+            make(Opcode.NULL, []),
+            # 0012
+            make(Opcode.RETURNVALUE, []),
+        ]
+    )
+    assert instructions_to_str(optimizer.optimize_instructions(instructions)) == instructions_to_str(
+        concat_insts(
+            [
+                make(Opcode.GETLOCAL, [0]),
+                make(Opcode.JUMPCOND, [8]),
+                make(Opcode.RETURNVALUE, []),
+                make(Opcode.RETURNVALUE, []),
+                make(Opcode.NULL, []),
+                make(Opcode.RETURNVALUE, []),
+            ]
+        )
+    )
+    assert optimizer.bytes_saved == 4
+
+
+def test_semantics_preserved():
+    run_peephole_vm_test("if (true) {10} else {20}", IntObject(10))
+    run_peephole_vm_test("if (false) {10} else {20}; 30", IntObject(30))
+    run_peephole_vm_test("let x = 2; x; 5; x", IntObject(2))
+    run_peephole_vm_test(
+        """
+        let fibonacci = fn(x) {
+            if (x == 0) {
+                return 0;
+            } else {
+                if (x == 1) {
+                    return 1;
+                } else {
+                    fibonacci(x - 1) + fibonacci(x - 2);
+                }
+            }
+        };
+        fibonacci(15);
+        """,
+        IntObject(610),
+    )
@@ -0,0 +1,210 @@
+from typing import List
+
+from pycompiler.compiler import Compiler, RegisterCompiler
+from pycompiler.vm import VM, RegisterVM
+from pycompiler.code import RegOpcode, RegInstruction, make_register, register_instructions_to_str
+from pycompiler.objects import Object, IntObject, BooleanObject, NullObject, StringObject, ClosureObject, IntArrayObject, ArrayObject
+from pycompiler.parser import Parser, Statement
+from pycompiler.lexer import Lexer
+
+
+def compile_prog(test_prog: str):
+    ast: List[Statement] = Parser(Lexer(test_prog)).parse()
+    compiler = RegisterCompiler()
+    assert compiler.compile(ast) is None
+    return compiler.bytecode()
+
+
+def run_register_test(test_prog: str, exp_insts: List[RegInstruction], exp_registers: int):
+    bytecode = compile_prog(test_prog)
+    assert register_instructions_to_str(bytecode[0]) == register_instructions_to_str(exp_insts)
+    assert bytecode[2] == exp_registers
+
+
+def run_register_vm_test(test_prog: str, exp_obj: Object | str):
+    vm = RegisterVM(compile_prog(test_prog))
+    err = vm.run()
+    if err:
+        assert err == exp_obj
+        return
+    assert vm.last_popped() == exp_obj
+
+
+def run_both(test_prog: str):
+    ast: List[Statement] = Parser(Lexer(test_prog)).parse()
+    compiler = Compiler()
+    compiler.compile(ast)
+    stack_vm = VM(compiler.bytecode())
+    assert stack_vm.run() is None
+    register_vm = RegisterVM(compile_prog(test_prog))
+    assert register_vm.run() is None
+    assert register_vm.last_popped() == stack_vm.last_popped()
+    return stack_vm, register_vm
+
+
+def test_make_register():
+    assert make_register(RegOpcode.ADD, [2, 0, 1]) == (RegOpcode.ADD, 2, 0, 1)
+    assert make_register(RegOpcode.JUMP, [7]) == (RegOpcode.JUMP, 7, 0, 0)
+    assert register_instructions_to_str(
+        [make_register(RegOpcode.LOADK, [0, 1]), make_register(RegOpcode.RETURN, [])]
+    ) == "0000 LOADK 0 1\n0001 RETURN\n"
+
+
+def test_expressions():
+    run_register_test(
+        "1 + 2 * 3",
+        [
+            make_register(RegOpcode.LOADK, [0, 0]),
+            make_register(RegOpcode.LOADK, [1, 1]),
+            make_register(RegOpcode.LOADK, [2, 2]),
+            make_register(RegOpcode.MUL, [1, 1, 2]),
+            make_register(RegOpcode.ADD, [0, 0, 1]),
+            make_register(RegOpcode.RESULT, [0]),
+        ],
+        3,
+    )
+    run_register_test(
+        "let x = 1; x < 2",
+        [
+            make_register(RegOpcode.LOADK, [0, 0]),
+            make_register(RegOpcode.SETGLOBAL, [0, 0]),
+            make_register(RegOpcode.RESULT, [0]),
+            make_register(RegOpcode.LOADK, [0, 1]),
+            make_register(RegOpcode.GETGLOBAL, [1, 0]),
+            make_register(RegOpcode.GREATERTHAN, [0, 0, 1]),
+            make_register(RegOpcode.RESULT, [0]),
+        ],
+        2,
+    )
+    run_register_test(
+        "if (true) { 10 }",
+        [
+            make_register(RegOpcode.LOADTRUE, [0]),
+            make_register(RegOpcode.JUMPCOND, [0, 4]),
+            make_register(RegOpcode.LOADK, [0, 0]),
+            make_register(RegOpcode.JUMP, [5]),
+            make_register(RegOpcode.LOADNULL, [0]),
+            make_register(RegOpcode.RESULT, [0]),
+        ],
+        1,
+    )
+
+
+def test_functions():
+    bytecode = compile_prog("fn(a, b) { let c = a + b; c * a }")
+    closure = bytecode[1][0]
+    assert isinstance(closure, ClosureObject)
+    # a, b and c occupy registers 0-2, the temporary for the product register 3
+    assert register_instructions_to_str(closure.func.value) == register_instructions_to_str(
+        [
+            make_register(RegOpcode.ADD, [2, 0, 1]),
+            make_register(RegOpcode.MUL, [3, 2, 0]),
+            make_register(RegOpcode.RETURNVALUE, [3]),
+        ]
+    )
+    assert closure.func.num_registers == 4
+    assert closure.func.num_args == 2
+
+    bytecode = compile_prog("fn(a) { fn(b) { a + b } }")
+    outer = bytecode[1][1]
+    assert register_instructions_to_str(outer.func.value) == register_instructions_to_str(
+        [
+            make_register(RegOpcode.MOVE, [1, 0]),
+            make_register(RegOpcode.CLOSURE, [1, 0, 1]),
+            make_register(RegOpcode.RETURNVALUE, [1]),
+        ]
+    )
+
+
+def test_programs():
+    run_register_vm_test("5 * 4 * 2 * 3", IntObject(120))
+    run_register_vm_test("-5 + 10", IntObject(5))
+    run_register_vm_test("!(1 < 2)", BooleanObject(False))
+    run_register_vm_test('"mon" + "key"', StringObject("monkey"))
+    run_register_vm_test("if (1 > 2) { 10 }", NullObject())
+    run_register_vm_test("let one = 1; let two = one + one; one + two", IntObject(3))
+    run_register_vm_test("[1, 2 * 2, 3 + 3][1]", IntObject(4))
+    run_register_vm_test('{1: "a", 2: "b"}[2]', StringObject("b"))
+    run_register_vm_test("len([1, 2, 3])", IntObject(3))
+    run_register_vm_test("let f = fn() { }; f()", NullObject())
+    run_register_vm_test("let f = fn(a) { a }; f(1, 2)", "wrong number of args: want 1, got 2")
+    run_register_vm_test("1(2)", "Error attempting to call non-function")
+    run_register_vm_test("let f = fn() { f() }; f()", "Stack Overflow")
+
+
+def test_matches_stack_vm():
+    progs = [
+        "let f = fn(a, b) { let c = a + b; if (c > 2) { return c; }; 0 }; [f(1, 2), f(1, 0)]",
+        "let adder = fn(a) { fn(b) { fn(c) { a + b + c } } }; adder(1)(2)(3)",
+        "let f = fn() { let a = 1; let b = if (a > 0) { let c = 2; c * a } else { 0 }; b + a }; f()",
+        "let x = 10; let g = fn(y) { let h = fn() { x + y }; h() }; g(5)",
+        'let m = {"a": [1, 2]}; m["a"][1] + len(m["a"])',
+    ]
+    for prog in progs:
+        run_both(prog)
+
+
+def test_loops():
+    progs = [
+        "let i = 0; let s = 0; while (i < 5) { let s = s + i; let i = i + 1 }; s",
+        "let f = fn(xs) { let t = 0; for (x in xs) { let t = t + x * x }; t }; f([1, 2, 3])",
+        "let n = 0; for (a in [[1, 2], [], [3]]) { for (b in a) { let n = n + b } }; [n, a]",
+        "let f = fn(n) { let i = 0; while (i < n) { let i = i + 1; if (i == 3) { return i * 100 } }; i }; [f(2), f(5)]",
+        "while (false) { 1 }",
+    ]
+    for prog in progs:
+        run_both(prog)
+    run_register_vm_test("for (x in 5) { x }", "for loop is not supported for input type")
+
+
+def test_index_assign():
+    progs = [
+        "let xs = [1, 2, 3]; xs[1] = 5; xs",
+        'let m = {"a": 1}; let f = fn(k, v) { m[k] = v }; f("b", 2); f("c", 3); [m["a"], m["b"], m["c"]]',
+        "let xs = []; for (x in [1, 2, 3]) { append(xs, x * 2) }; xs",
+        "if (true) { let x = 1 }",
+    ]
+    for prog in progs:
+        run_both(prog)
+    run_register_vm_test("let xs = [1]; xs[3] = 2", "Index out of range for assignment")
+
+
+def test_fewer_instructions():
+    stack_vm, register_vm = run_both(
+        "let fib = fn(x) { if (x < 2) { x } else { fib(x - 1) + fib(x - 2) } }; fib(12)"
+    )
+    assert register_vm.last_popped() == IntObject(144)
+    assert register_vm.executed < stack_vm.executed
+
+
+def test_globals_grow():
+    # Past the preallocated globals, the same as the stack VM
+    instructions = [
+        make_register(RegOpcode.LOADK, [0, 0]),
+        make_register(RegOpcode.SETGLOBAL, [70000, 0]),
+        make_register(RegOpcode.GETGLOBAL, [1, 70000]),
+        make_register(RegOpcode.GETGLOBAL, [2, 70001]),
+        make_register(RegOpcode.RESULT, [1]),
+    ]
+    vm = RegisterVM((instructions, [IntObject(7)], 3))
+    assert vm.run() is None
+    assert vm.last_popped() == IntObject(7)
+    assert type(vm.globals[70001]) is Object
+
+
+def test_map_keys():
+    run_register_vm_test("{1: 2, \"a\": 3}[\"a\"]", IntObject(3))
+    run_register_vm_test("{true: 2}", "unusable as hash key")
+    run_register_vm_test("{[1]: 2}", "unusable as hash key")
+
+
+def test_int_arrays():
+    # Unboxed like the stack VM's arrays, boxed again once a non-int goes in
+    vm = RegisterVM(compile_prog("[1, 2, 3]"))
+    assert vm.run() is None
+    assert type(vm.last_popped()) is IntArrayObject
+    vm = RegisterVM(compile_prog("[1, \"a\"]"))
+    assert vm.run() is None
+    assert type(vm.last_popped()) is ArrayObject
+    for prog in ["let a = [1, 2]; a[0] = 5; push(a, 3)", "let a = [1, 2]; a[1] = \"b\"; a", "rest([1, 2, 3])[1]"]:
+        run_both(prog)
@@ -0,0 +1,82 @@
+from typing import List
+
+from pycompiler.compiler import Compiler, Resolver, SymbolTable, Symbol, GLOBALSCOPE, LOCALSCOPE, FREESCOPE, FUNCTIONSCOPE
+from pycompiler.parser import Parser, Statement
+from pycompiler.lexer import Lexer
+from pycompiler.vm import VM
+from pycompiler.objects import IntObject
+
+
+def parse(source: str) -> List[Statement]:
+    return Parser(Lexer(source)).parse()
+
+
+def test_resolver_annotations():
+    ast = parse("let a = 1; let f = fn(b) { let c = a; fn() { b + c + f } }")
+    Resolver(SymbolTable()).resolve(ast)
+    assert ast[0].symbol == Symbol("a", GLOBALSCOPE, 0)
+    outer = ast[1].expr.literal
+    assert ast[1].symbol == Symbol("f", GLOBALSCOPE, 1)
+    assert outer.body.statements[0].symbol == Symbol("c", LOCALSCOPE, 1)
+    assert outer.body.statements[0].expr.literal.symbol == Symbol("a", GLOBALSCOPE, 0)
+    assert outer.num_locals == 2
+    assert outer.free_symbols == []
+
+    inner = outer.body.statements[1].expr.literal
+    # Inside its own body f names the current closure, which the inner function captures
+    assert inner.free_symbols == [
+        Symbol("b", LOCALSCOPE, 0),
+        Symbol("c", LOCALSCOPE, 1),
+        Symbol("f", FUNCTIONSCOPE, 0),
+    ]
+    add = inner.body.statements[0].expr
+    assert add.left.left.literal.symbol == Symbol("b", FREESCOPE, 0)
+    assert add.right.literal.symbol == Symbol("f", FREESCOPE, 2)
+
+
+def test_resolver_captures_through_every_level():
+    ast = parse("fn(a) { fn() { fn() { a } } }")
+    Resolver(SymbolTable()).resolve(ast)
+    f1 = ast[0].expr.literal
+    f2 = f1.body.statements[0].expr.literal
+    f3 = f2.body.statements[0].expr.literal
+    assert f2.free_symbols == [Symbol("a", LOCALSCOPE, 0)]
+    assert f3.free_symbols == [Symbol("a", FREESCOPE, 0)]
+    assert f3.body.statements[0].expr.literal.symbol == Symbol("a", FREESCOPE, 0)
+
+
+def test_resolver_function_names():
+    ast = parse("let f = fn(n) { f }")
+    Resolver(SymbolTable()).resolve(ast)
+    assert ast[0].expr.literal.body.statements[0].expr.literal.symbol == Symbol("f", FUNCTIONSCOPE, 0)
+
+
+def test_deeply_nested_closures():
+    depth = 60
+    source = "".join(f"fn(a{i}) {{ " for i in range(depth))
+    source += " + ".join(f"a{i}" for i in range(depth)) + " }" * depth
+    source = "let f = " + source + "; f" + "".join(f"({i})" for i in range(depth))
+    compiler = Compiler()
+    assert compiler.compile(parse(source)) is None
+    vm = VM(compiler.bytecode())
+    assert vm.run() is None
+    assert vm.last_popped() == IntObject(sum(range(depth)))
+
+
+def test_loops_assign_existing_bindings():
+    ast = parse("let i = 0; while (i < 3) { let i = i + 1; let j = i }; for (i in [1]) { i }; let i = 5")
+    Resolver(SymbolTable()).resolve(ast)
+    loop = ast[1].expr
+    assert loop.body.statements[0].symbol == Symbol("i", GLOBALSCOPE, 0)
+    assert loop.body.statements[1].symbol == Symbol("j", GLOBALSCOPE, 1)
+    assert ast[2].expr.symbol == Symbol("i", GLOBALSCOPE, 0)
+    # Outside a loop a let still defines a new binding
+    assert ast[3].symbol == Symbol("i", GLOBALSCOPE, 2)
+
+    ast = parse("let f = fn(n) { while (n > 0) { let n = n - 1; let g = fn() { let n = 1; n } } }")
+    Resolver(SymbolTable()).resolve(ast)
+    function = ast[0].expr.literal
+    body = function.body.statements[0].expr.body
+    assert body.statements[0].symbol == Symbol("n", LOCALSCOPE, 0)
+    assert body.statements[1].expr.literal.body.statements[0].symbol == Symbol("n", LOCALSCOPE, 0)
+    assert function.num_locals == 2
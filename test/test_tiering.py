@@ -0,0 +1,121 @@
+import sys
+from typing import List
+
+from pycompiler.compiler import Compiler
+from pycompiler.optimizer import PassManager
+from pycompiler.vm import VM, TieredVM, TieringPolicy, Tier
+from pycompiler.objects import Object, IntObject, StringObject, ArrayObject, ClosureObject, CompiledFunctionObject
+from pycompiler.parser import Parser, Statement
+from pycompiler.lexer import Lexer
+
+
+def compile_prog(test_prog: str, opt_level: int = 0):
+    ast: List[Statement] = Parser(Lexer(test_prog)).parse()
+    bytecode, err = PassManager(opt_level).compile(ast, Compiler())
+    assert err is None
+    return bytecode
+
+
+def function_constant(bytecode, index: int = 0) -> CompiledFunctionObject:
+    funcs = [c.func if isinstance(c, ClosureObject) else c for c in bytecode[1]]
+    return [f for f in funcs if isinstance(f, CompiledFunctionObject)][index]
+
+
+def run_tiered(test_prog: str, expected: Object | str, policy: TieringPolicy):
+    # Tiering must never change what a program does
+    for opt_level in (0, 2):
+        baseline = VM(compile_prog(test_prog, opt_level))
+        baseline_err = baseline.run()
+        vm = TieredVM(compile_prog(test_prog, opt_level), policy)
+        err = vm.run()
+        assert err == baseline_err
+        if err:
+            assert err == expected
+            continue
+        assert vm.last_popped() == baseline.last_popped() == expected
+
+
+def test_profile_counters():
+    bytecode = compile_prog("let f = fn(n) { let i = 0; while (i < n) { let i = i + 1 }; i }; f(3); f(4)")
+    vm = VM(bytecode)
+    assert vm.run() is None
+    func = function_constant(bytecode)
+    assert func.calls == 2
+    assert func.back_edges == 7
+
+
+def test_promotion():
+    policy = TieringPolicy(call_threshold=3, background=False)
+    bytecode = compile_prog("let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(15)")
+    vm = TieredVM(bytecode, policy)
+    assert vm.run() is None
+    assert vm.last_popped() == IntObject(610)
+    assert vm.promoted == 1
+    func = function_constant(bytecode)
+    assert isinstance(func.tier, Tier)
+    # Tiered calls are still counted
+    assert func.calls == 1973
+
+    run_tiered("let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(15)", IntObject(610), policy)
+
+
+def test_back_edge_promotion():
+    policy = TieringPolicy(call_threshold=1000, back_edge_threshold=10, background=False)
+    bytecode = compile_prog("let f = fn(n) { let i = 0; while (i < n) { let i = i + 1 }; i }; [f(20), f(5)]")
+    vm = TieredVM(bytecode, policy)
+    assert vm.run() is None
+    # The loop ran hot during the first call, the second one is swapped in
+    assert vm.last_popped() == ArrayObject([IntObject(20), IntObject(5)])
+    assert vm.promoted == 1
+    assert isinstance(function_constant(bytecode).tier, Tier)
+
+
+def test_deoptimization():
+    policy = TieringPolicy(call_threshold=2, max_deopts=2, background=False)
+    source = """
+    let add = fn(a, b) { a + b };
+    let r = [add(1, 2), add(3, 4), add(5, 6)];
+    let s = [add("a", "b"), add("c", "d"), add("e", "f")];
+    [r, s, add(7, 8)]
+    """
+    bytecode = compile_prog(source)
+    vm = TieredVM(bytecode, policy)
+    assert vm.run() is None
+    strings = ArrayObject([StringObject("ab"), StringObject("cd"), StringObject("ef")])
+    assert vm.last_popped() == ArrayObject(
+        [ArrayObject([IntObject(3), IntObject(7), IntObject(11)]), strings, IntObject(15)]
+    )
+    # Strings broke the integer assumption twice, then the generic tier took over
+    assert vm.deoptimized == 2
+    assert vm.promoted == 2
+    assert function_constant(bytecode).tier.int_args == []
+
+    run_tiered("let f = fn(x) { -x }; [f(1), f(2), f(3), f(true)]", "- prefix is not supported for input type", policy)
+
+
+def test_tiered_semantics():
+    policy = TieringPolicy(call_threshold=0, back_edge_threshold=0, background=False)
+    run_tiered("let adder = fn(a) { fn(b) { a + b } }; let add2 = adder(2); [add2(1), add2(5)]", ArrayObject([IntObject(3), IntObject(7)]), policy)
+    run_tiered("let f = fn(x) { if (x > 1) { return x; } 0 }; [f(1), f(5)]", ArrayObject([IntObject(0), IntObject(5)]), policy)
+    run_tiered("let g = fn() { len([1, 2]) }; let f = fn() { g() + 1 }; f()", IntObject(3), policy)
+    run_tiered("let a = [1, 2]; let f = fn(i) { a[i] = 9 }; f(0); a", ArrayObject([IntObject(9), IntObject(2)]), policy)
+    run_tiered("let f = fn(a) { a }; let g = fn() { f() }; g()", "wrong number of args: want 1, got 0", policy)
+    run_tiered("let f = fn(n) { f(n + 1) }; f(0)", "Stack Overflow", policy)
+
+
+def test_background_compile():
+    policy = TieringPolicy(call_threshold=5)
+    run_tiered("let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(18)", IntObject(2584), policy)
+
+
+def test_promotion_leaves_source_alone():
+    policy = TieringPolicy(call_threshold=1, background=False)
+    bytecode = compile_prog("let add = fn(a, b) { a + b }; [add(1, 2), add(3, 4)]")
+    vm = TieredVM(bytecode, policy)
+    limit = sys.getrecursionlimit()
+    assert vm.run() is None
+    assert vm.promoted == 1
+    # The tier was specialized to ints on a copy, the shared literal still knows nothing about a and b
+    literal = function_constant(bytecode).literal
+    assert literal.body.statements[0].expr.int_operands is False
+    assert sys.getrecursionlimit() == limit
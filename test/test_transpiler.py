@@ -0,0 +1,166 @@
+from typing import List
+
+from pycompiler.compiler import Compiler, Transpiler
+from pycompiler.optimizer import PassManager
+from pycompiler.repl import compile_source
+from pycompiler.repl.repl import new_compiler_with_state, new_vm_with_state
+from pycompiler.vm import VM, NativeVM
+from pycompiler.objects import Object, IntObject, ArrayObject, MapObject
+from pycompiler.parser import Parser, Statement
+from pycompiler.lexer import Lexer
+
+
+def transpile(test_prog: str, opt_level: int = 0) -> Transpiler:
+    ast: List[Statement] = Parser(Lexer(test_prog)).parse()
+    transpiler = Transpiler()
+    assert transpiler.compile(PassManager(opt_level).run_ast(ast)) is None
+    return transpiler
+
+
+def run_native(test_prog: str, opt_level: int = 0):
+    vm = NativeVM(transpile(test_prog, opt_level).bytecode())
+    return vm.run(), vm.last_popped()
+
+
+def run_conformance(test_prog: str):
+    # The native backend must agree with the stack VM on every value and error
+    for opt_level in (0, 2):
+        ast: List[Statement] = Parser(Lexer(test_prog)).parse()
+        bytecode, err = PassManager(opt_level).compile(ast, Compiler())
+        assert err is None
+        vm = VM(bytecode)
+        expected_err = vm.run()
+
+        err, result = run_native(test_prog, opt_level)
+        assert err == expected_err, test_prog
+        if err is None:
+            assert result == vm.last_popped(), test_prog
+
+
+def test_values():
+    for prog in [
+        "1 + 2 * 3 - 4 / 2",
+        "-5 + 10",
+        "-9223372036854775808 - 1",
+        "7 / -2",
+        '"mon" + "key"',
+        "1 < 2",
+        "2 > 1 == true",
+        "!5",
+        "!!0",
+        "true == false",
+        '"a" == "a"',
+        "[1, 2 + 3, [4]]",
+        '{1: 2, "a": [3]}["a"][0]',
+        "[1, 2, 3][5]",
+        "if (1 > 2) { 10 }",
+        "if (0) { 10 } else { 20 }",
+        "let a = 5; a",
+        "let a = 5;",
+    ]:
+        run_conformance(prog)
+
+    err, result = run_native("")
+    assert err is None
+    assert type(result) is Object
+
+
+def test_functions():
+    for prog in [
+        "let add = fn(a, b) { a + b }; add(1, 2)",
+        "let f = fn() { }; f()",
+        "let f = fn() { return 1; 2 }; f()",
+        "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(15)",
+        "let adder = fn(a) { fn(b) { a + b } }; adder(1)(2)",
+        "let f = fn(a) { let g = fn() { a }; let a = 2; g() }; f(1)",
+        "let outer = fn() { let count = fn(n) { if (n == 0) { 0 } else { count(n - 1) } }; count(5) }; outer()",
+        "let f = fn() { let fs = []; for (i in [1, 2, 3]) { append(fs, fn() { i }) }; fs[0]() + fs[2]() }; f()",
+    ]:
+        run_conformance(prog)
+
+
+def test_loops_and_mutation():
+    for prog in [
+        "let i = 0; let sum = 0; while (i < 10) { let sum = sum + i; let i = i + 1 }; sum",
+        "let total = 0; for (x in [1, 2, 3]) { let total = total + x }; total",
+        "let a = [1, 2]; a[0] = 5; a",
+        "let m = {}; m[\"k\"] = 1; m[\"k\"]",
+        "let a = []; for (x in [1, 2, 3]) { append(a, x * x) }; a",
+        "let a = [1]; let b = push(a, 2); [a, b]",
+        "let a = [1, 2, 3]; [len(a), first(a), last(a), rest(a)]",
+        "let xs = [[1], [\"a\"], [2]]; let ys = rest(xs); ys[0][0] = 9; ys[1][0] = 8; [xs, ys]",
+        "let a = [1]; for (x in a) { if (len(a) < 5) { append(a, x) } }; len(a)",
+    ]:
+        run_conformance(prog)
+
+
+def test_errors():
+    for prog in [
+        "let f = fn(a) { a }; f()",
+        "let f = fn(a) { a }; f(1, 2)",
+        "5(1)",
+        "1 + true",
+        '"a" - "b"',
+        "-true",
+        "[1][true]",
+        "{true: 1}",
+        "{[1]: 2}",
+        "{1: 2}[true]",
+        "let a = [1]; a[3] = 1",
+        "for (x in 5) { x }",
+        "len(1)",
+        "len([1], [2])",
+        "let f = fn(n) { f(n + 1) }; f(0)",
+    ]:
+        run_conformance(prog)
+
+
+def test_function_values():
+    err, result = run_native("let f = fn(x) { x }; [f, len]")
+    assert err is None
+    assert result.value[0].value.__name__ == "fn0"
+    assert result.value[1].name == "len"
+
+
+def test_int_fast_path():
+    # Proven integer operands drop the guard entirely
+    source = transpile("let a = 1; let b = a + 2; b * 3", opt_level=2).source()
+    assert "native_add" not in source
+    assert "native_mul" not in source
+    # Unknown operands keep a guarded fallback to the VM semantics
+    source = transpile("let f = fn(x) { x + 1 }; f(1)").source()
+    assert "native_add" in source
+
+
+def test_recursive_calls_are_direct():
+    source = transpile("let f = fn(n) { if (n < 1) { 0 } else { f(n - 1) } }; f(3)").source()
+    assert "fn0(" in source
+
+
+def test_shared_globals():
+    compiler = Transpiler()
+    vm = None
+    for line, expected in [
+        ("let a = [1, 2];", ArrayObject([IntObject(1), IntObject(2)])),
+        ("let f = fn(x) { a[0] + x };", None),
+        ("f(10)", IntObject(11)),
+        ("a[0] = 5; f(1)", IntObject(6)),
+        ('let a = ["x"]; f(2)', IntObject(7)),
+    ]:
+        compiler = new_compiler_with_state(compiler)
+        assert compiler.compile(Parser(Lexer(line)).parse()) is None
+        vm = new_vm_with_state(vm, compiler.bytecode()) if vm else NativeVM(compiler.bytecode())
+        assert vm.run() is None
+        if expected is not None:
+            assert vm.last_popped() == expected
+
+
+def test_compile_source_backend():
+    code, err = compile_source("let m = {1: 2}; m", "native", 1)
+    assert err is None
+    vm = NativeVM(code)
+    assert vm.run() is None
+    assert vm.last_popped() == MapObject({IntObject(1): IntObject(2)})
+
+    _, err = compile_source('import "lib"', "native")
+    assert err == "import lib is not supported by the native backend"
@@ -0,0 +1,153 @@
+from typing import List
+
+from pycompiler.compiler import Compiler
+from pycompiler.optimizer import TypeInference, PassManager
+from pycompiler.code import make, Opcode, Instructions, instructions_to_str
+from pycompiler.objects import Object, IntObject, BooleanObject, ArrayObject, StringObject
+from pycompiler.parser import Parser, Statement, ExpressionStatement, InfixExpression
+from pycompiler.lexer import Lexer
+from pycompiler.vm import VM
+from pycompiler.repl.repl import new_compiler_with_state, new_vm_with_state
+
+
+def concat_insts(insts: List[Instructions]) -> Instructions:
+    output = bytearray()
+    for ins in insts:
+        output += ins
+    return output
+
+
+def infer_prog(test_prog: str):
+    inference = TypeInference()
+    ast: List[Statement] = inference.infer(Parser(Lexer(test_prog)).parse())
+    return ast, inference
+
+
+def last_infix(ast: List[Statement]) -> InfixExpression:
+    statement = ast[-1]
+    assert isinstance(statement, ExpressionStatement)
+    assert isinstance(statement.expr, InfixExpression)
+    return statement.expr
+
+
+def run_types_test(test_prog: str, exp_int: bool):
+    ast, _ = infer_prog(test_prog)
+    assert last_infix(ast).int_operands == exp_int
+
+
+def run_types_vm_test(test_prog: str, exp_obj: Object):
+    bytecode, err = PassManager(1).compile(Parser(Lexer(test_prog)).parse())
+    assert err is None
+    vm = VM(bytecode)
+    assert vm.run() is None
+    assert vm.last_popped() == exp_obj
+
+
+def test_literals_and_builtins():
+    run_types_test("1 + 2", True)
+    run_types_test("1 + 2 * 3 > 4", True)
+    run_types_test("-1 - 2", True)
+    run_types_test('len(["abc"]) * 2', True)
+    run_types_test('"a" + "b"', False)
+    run_types_test("[1][0] + 1", False)
+    run_types_test("let len = fn(x) { x }; len(1) + 1", False)
+
+
+def test_dataflow():
+    run_types_test("let x = 1; let y = x * 2; y + x", True)
+    run_types_test("let x = 1; let x = true; x + 1", False)
+    run_types_test("let f = fn(a) { a + 1 }; 1 + 1", True)
+    ast, _ = infer_prog("let f = fn(a) { a + 1 }")
+    assert ast[0].expr.literal.body.statements[0].expr.int_operands is False
+    ast, _ = infer_prog("let f = fn() { let m = 2 * 3; m - 1 }")
+    assert ast[0].expr.literal.body.statements[1].expr.int_operands is True
+    # Globals are read on every call and a later compile may assign them anything
+    ast, _ = infer_prog("let n = 2; let f = fn() { let m = n * 3; m - 1 }")
+    assert ast[1].expr.literal.body.statements[1].expr.int_operands is False
+
+    # A binding made inside one arm of an if may be unassigned afterwards
+    run_types_test("let x = 1; if (y) { let x = 2; }; x + 1", False)
+    run_types_test("let x = 1; if (true) { let x = 2; }; x + 1", True)
+    run_types_test("let x = if (y) { 1 } else { 2 }; x + 1", True)
+    run_types_test("let x = if (y) { 1 }; x + 1", False)
+
+
+def test_symbol_table():
+    compiler = Compiler()
+    compiler.symbol_table.define("len")
+    inference = TypeInference()
+    ast = inference.infer(Parser(Lexer("len([1]) + 1")).parse(), compiler.symbol_table)
+    assert last_infix(ast).int_operands is False
+
+
+def test_report():
+    _, inference = infer_prog("let a = 1 + 2; let b = a - 3; let c = b[0] + 1; -c; !c")
+    assert inference.sites == 4
+    assert inference.specialized == 2
+    assert inference.fraction() == 0.5
+    assert inference.report() == "specialized 2 of 4 arithmetic sites (50.0%)"
+
+
+def test_specialized_opcodes():
+    bytecode, _ = PassManager(1).compile(Parser(Lexer("let x = 3; -x * 2 < x")).parse())
+    assert instructions_to_str(bytecode[0]) == instructions_to_str(
+        concat_insts(
+            [
+                make(Opcode.CONSTANT, [0]),
+                make(Opcode.SETGLOBAL, [0]),
+                make(Opcode.GETGLOBAL, [0]),
+                make(Opcode.GETGLOBAL, [0]),
+                make(Opcode.MINUS_INT, []),
+                make(Opcode.CONSTANT, [1]),
+                make(Opcode.MUL_INT, []),
+                make(Opcode.GREATERTHAN_INT, []),
+                make(Opcode.POP, []),
+            ]
+        )
+    )
+
+
+def test_semantics_preserved():
+    run_types_vm_test("let x = 7; x / 2 + x * 3 - -x", IntObject(31))
+    run_types_vm_test(
+        "let x = 7; [x == 7, x != 7, x > 6, x < 6]",
+        ArrayObject([BooleanObject(True), BooleanObject(False), BooleanObject(True), BooleanObject(False)]),
+    )
+    run_types_vm_test('let s = "a"; let n = len([s, s + s]); n * 10', IntObject(20))
+    run_types_vm_test("let n = 5; let f = fn(a) { a + n * 2 }; f(1)", IntObject(11))
+
+
+def test_loops():
+    # Types that an iteration cannot change are kept, everything else is widened
+    run_types_test("let i = 0; while (i < 3) { let i = i + 1 }; i + 1", True)
+    run_types_test("let i = 0; while (i < 3) { let i = true }; i + 1", False)
+    run_types_test("let i = 0; for (i in xs) { 1 }; i + 1", False)
+    run_types_test("while (c) { let j = 1 }; j + 1", False)
+    ast, _ = infer_prog("let i = 0; while (i < 3) { let i = if (i > 1) { i } else { 2 } + 1 }")
+    assert ast[1].expr.condition.int_operands is True
+    # A function can run after a loop has given a global another type
+    ast, _ = infer_prog("let n = 1; let f = fn() { n + 1 }; while (c) { let n = 1 }")
+    assert ast[1].expr.literal.body.statements[0].expr.int_operands is False
+    run_types_vm_test(
+        'let n = 1; let f = fn() { n + 1 }; let i = 0; while (i < 1) { let n = "a"; let i = i + 1 }; len([f])',
+        IntObject(1),
+    )
+    run_types_vm_test("let i = 0; let s = 0; while (i < 4) { let s = s + i * i; let i = i + 1 }; s", IntObject(14))
+
+
+def test_repl_globals():
+    # A function compiled on one line reads a global that a loop on a later line assigns a string
+    lines = [
+        "let x = 1; let f = fn() { x + x };",
+        'let i = 0; while (i < 1) { let x = "ab"; let i = i + 1 }; f()',
+    ]
+    pass_manager = PassManager(1)
+    compiler = None
+    vm = None
+    for line in lines:
+        compiler = new_compiler_with_state(compiler) if compiler else Compiler()
+        bytecode, err = pass_manager.compile(Parser(Lexer(line)).parse(), compiler)
+        assert err is None
+        vm = new_vm_with_state(vm, bytecode) if vm else VM(bytecode)
+        assert vm.run() is None
+    assert vm.last_popped() == StringObject("abab")
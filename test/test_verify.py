@@ -0,0 +1,165 @@
+from typing import List
+
+from pycompiler.code import Opcode, Instructions, make, verify, stack_effect
+from pycompiler.compiler import Compiler
+from pycompiler.optimizer import PassManager
+from pycompiler.vm import VM
+from pycompiler.objects import ClosureObject, CompiledFunctionObject, IntObject
+from pycompiler.parser import Parser, Statement
+from pycompiler.lexer import Lexer
+
+
+def concat(instructions: List[Instructions]) -> Instructions:
+    out = bytearray()
+    for ins in instructions:
+        out += ins
+    return out
+
+
+def compile_prog(test_prog: str, opt_level: int = 0):
+    ast: List[Statement] = Parser(Lexer(test_prog)).parse()
+    bytecode, err = PassManager(opt_level).compile(ast, Compiler())
+    assert err is None
+    return bytecode
+
+
+def test_stack_effect():
+    assert stack_effect(Opcode.ADD, []) == (2, 1)
+    assert stack_effect(Opcode.ARRAY, [3]) == (3, 1)
+    assert stack_effect(Opcode.MAP, [2]) == (4, 1)
+    assert stack_effect(Opcode.CALL, [2]) == (3, 1)
+    assert stack_effect(Opcode.CLOSURE, [0, 2]) == (2, 1)
+
+
+def test_max_depth():
+    tests = [
+        ([], 0),
+        ([make(Opcode.CONSTANT, [0]), make(Opcode.POP)], 1),
+        (
+            [
+                make(Opcode.CONSTANT, [0]),
+                make(Opcode.CONSTANT, [1]),
+                make(Opcode.CONSTANT, [2]),
+                make(Opcode.ARRAY, [3]),
+                make(Opcode.CONSTANT, [3]),
+                make(Opcode.ADD),
+                make(Opcode.POP),
+            ],
+            3,
+        ),
+        # if (true) { 1 } else { 2 }, both arms leave one value
+        (
+            [
+                make(Opcode.TRUE),
+                make(Opcode.JUMPCOND, [10]),
+                make(Opcode.CONSTANT, [0]),
+                make(Opcode.JUMP, [13]),
+                make(Opcode.CONSTANT, [1]),
+                make(Opcode.POP),
+            ],
+            1,
+        ),
+        # The loop body runs with the iterator and the element on the stack
+        (
+            [
+                make(Opcode.GETGLOBAL, [0]),
+                make(Opcode.ITER_INIT),
+                make(Opcode.ITER_NEXT, [13]),
+                make(Opcode.SETGLOBAL, [1]),
+                make(Opcode.JUMP, [4]),
+                make(Opcode.NULL),
+                make(Opcode.POP),
+            ],
+            2,
+        ),
+        # Operands wider than the compact encoding
+        ([make(Opcode.GETLOCAL, [300]), make(Opcode.RETURNVALUE)], 1),
+    ]
+    for instructions, expected in tests:
+        assert verify(concat(instructions)) == (expected, None)
+
+
+def test_invalid_bytecode():
+    tests = [
+        ([make(Opcode.POP)], "invalid bytecode at 0000: stack underflow in POP"),
+        (
+            [make(Opcode.CONSTANT, [0]), make(Opcode.ADD)],
+            "invalid bytecode at 0003: stack underflow in ADD",
+        ),
+        ([make(Opcode.JUMP, [1])], "invalid bytecode at 0000: JUMP to 0001 is not an instruction"),
+        ([make(Opcode.JUMP, [9])], "invalid bytecode at 0000: JUMP to 0009 is not an instruction"),
+        ([bytes([255])], "invalid bytecode at 0000: unknown opcode"),
+        ([make(Opcode.CONSTANT, [0])[:2]], "invalid bytecode at 0000: truncated CONSTANT"),
+        ([bytes([Opcode.WIDE.value]), make(Opcode.ADD)], "invalid bytecode at 0000: WIDE prefix on ADD"),
+        # One arm leaves a value and the other does not
+        (
+            [
+                make(Opcode.TRUE),
+                make(Opcode.JUMPCOND, [7]),
+                make(Opcode.CONSTANT, [0]),
+                make(Opcode.NULL),
+                make(Opcode.POP),
+            ],
+            "invalid bytecode at 0007: stack depth 1 here, 0 on another path",
+        ),
+    ]
+    for instructions, expected in tests:
+        assert verify(concat(instructions)) == (0, expected)
+
+
+def test_compiled_programs_verify():
+    # Everything the compiler emits, at every optimization level, passes the verifier
+    programs = [
+        "1 + 2 * 3",
+        "let a = [1, 2, {1: 2}]; a[0] = 5; a",
+        "if (1 > 2) { 10 } else { 20 }",
+        "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(10)",
+        "let adder = fn(a) { fn(b) { a + b } }; adder(1)(2)",
+        "let f = fn(x) { if (x > 1) { return x; } 0 }; f(3)",
+        "let total = 0; for (x in [1, 2, 3]) { let total = total + x }; total",
+        "let f = fn(n) { let i = 0; while (i < n) { let i = i + 1 }; i }; f(5)",
+        "let a = []; for (x in [1, 2]) { for (y in [3, 4]) { append(a, x * y) } }; a",
+    ]
+    for prog in programs:
+        for opt_level in (0, 1, 2):
+            bytecode = compile_prog(prog, opt_level)
+            _, err = verify(bytecode[0])
+            assert err is None, prog
+            for const in bytecode[1]:
+                func = const.func if isinstance(const, ClosureObject) else const
+                if isinstance(func, CompiledFunctionObject):
+                    _, err = verify(func.value)
+                    assert err is None, prog
+
+
+def test_vm_records_max_stack():
+    bytecode = compile_prog("let f = fn(a, b) { [a, b, a + b] }; f(1, 2)")
+    vm = VM(bytecode)
+    assert vm.run() is None
+    funcs = [c.func if isinstance(c, ClosureObject) else c for c in bytecode[1]]
+    func = [f for f in funcs if isinstance(f, CompiledFunctionObject)][0]
+    assert func.max_stack == 4
+    assert vm.frames[0].cl.func.max_stack == 3
+
+
+def test_vm_rejects_invalid_bytecode():
+    vm = VM((concat([make(Opcode.CONSTANT, [0]), make(Opcode.ADD)]), [IntObject(1)]))
+    assert vm.run() == "invalid bytecode at 0003: stack underflow in ADD"
+
+    bad = CompiledFunctionObject(concat([make(Opcode.POP), make(Opcode.RETURN)]), 0, 0)
+    main = concat([make(Opcode.CLOSURE, [0, 0]), make(Opcode.CALL, [0]), make(Opcode.POP)])
+    vm = VM((main, [bad]))
+    assert vm.run() == "invalid bytecode at 0000: stack underflow in POP"
+
+    # Bytecode already marked verified still stops cleanly on a byte that is no opcode
+    vm = VM((bytes([255]), []))
+    vm.frames[0].cl.func.max_stack = 0
+    assert vm.run() == "unknown opcode 255"
+
+
+def test_overflow_checked_per_call():
+    vm = VM(compile_prog("let f = fn(n) { f(n + 1) }; f(0)"))
+    assert vm.run() == "Stack Overflow"
+    vm = VM(compile_prog("let f = fn(n) { if (n == 0) { 0 } else { 1 + f(n - 1) } }; f(500)"))
+    assert vm.run() is None
+    assert vm.last_popped() == IntObject(500)
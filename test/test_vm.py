@@ -11,6 +11,7 @@ from pycompiler.objects import (
     NullObject,
     StringObject,
     ArrayObject,
+    IntArrayObject,
     MapObject,
 )
 from pycompiler.parser import Parser, Statement
@@ -118,6 +119,10 @@ def test_map():
         "{1 + 1: 1 + 2, 3 + 3: 3 + 4}",
         MapObject({IntObject(2): IntObject(3), IntObject(6): IntObject(7)}),
     )
+    # Only ints and strings are keys, anything else is a VM error
+    run_vm_test("{true: 2}", "unusable as hash key")
+    run_vm_test("{[1]: 2}", "unusable as hash key")
+    run_vm_test("{1: 2}[true]", "unusable as hash key")
 
 
 def test_index():
@@ -365,3 +370,111 @@ def test_fibonacci():
         """,
         IntObject(610),
     )
+
+
+def test_static_closures():
+    ast: List[Statement] = Parser(Lexer("let outer = fn() { fn() { 1 } }; [outer(), outer()]")).parse()
+    compiler = Compiler()
+    compiler.compile(ast)
+    vm = VM(compiler.bytecode())
+    assert vm.run() is None
+    first, second = vm.last_popped().value
+    assert first is second
+    run_vm_test("let outer = fn() { fn() { 1 } }; outer()()", IntObject(1))
+
+
+def test_wide_operands():
+    params = ", ".join(f"a{i}" for i in range(300))
+    args = ", ".join(str(i) for i in range(300))
+    run_vm_test(f"let f = fn({params}) {{ a299 - a1 }}; f({args})", IntObject(298))
+
+    statements = "1; " * 17000
+    run_vm_test(
+        f"let f = fn(x) {{ if (x) {{ {statements} 5 }} else {{ 0 }} }}; [f(true), f(false)]",
+        ArrayObject([IntObject(5), IntObject(0)]),
+    )
+
+
+def test_loops():
+    run_vm_test("let i = 0; let s = 0; while (i < 5) { let s = s + i; let i = i + 1 }; s", IntObject(10))
+    run_vm_test("while (false) { 1 }", NullObject())
+    run_vm_test("let s = 0; for (x in [1, 2, 3]) { let s = s * 10 + x }; s", IntObject(123))
+    run_vm_test("let n = 0; for (a in [[1, 2], [], [3]]) { for (b in a) { let n = n + b } }; n", IntObject(6))
+    run_vm_test("let x = 7; for (x in [1, 2]) { x }; x", IntObject(2))
+    run_vm_test("let f = fn(xs) { let t = 0; for (x in xs) { let t = t + x * x }; t }; f([1, 2, 3])", IntObject(14))
+    run_vm_test("let f = fn() { for (x in [1, 2, 3]) { if (x == 2) { return x * 10 } }; 0 }; f()", IntObject(20))
+    # Closures capture the loop variable's value at the time they are created
+    run_vm_test("let f = fn() { let g = 0; for (x in [1, 2]) { if (x == 1) { let g = fn() { x } } }; g }; f()()", IntObject(1))
+    run_vm_test("for (x in 5) { x }", "for loop is not supported for input type")
+
+
+def test_index_assign():
+    run_vm_test("let xs = [1, 2, 3]; xs[1] = 5; xs", ArrayObject([IntObject(1), IntObject(5), IntObject(3)]))
+    run_vm_test('let m = {"a": 1}; m["b"] = 2; m["a"] = 3; m["a"] + m["b"]', IntObject(5))
+    # Every name bound to the collection sees the change
+    run_vm_test("let xs = [1, 2]; let ys = xs; let f = fn(a) { a[0] = 9 }; f(ys); xs[0]", IntObject(9))
+    run_vm_test("let xs = []; let i = 0; while (i < 4) { append(xs, i * i); let i = i + 1 }; xs[3] + len(xs)", IntObject(13))
+    run_vm_test("let xs = [1]; let ys = push(xs, 2); [len(xs), len(ys), ys[0]]", ArrayObject([IntObject(1), IntObject(2), IntObject(1)]))
+    run_vm_test("let xs = [1]; xs[1] = 2", "Index out of range for assignment")
+    run_vm_test("let xs = [1]; xs[-1] = 2", "Index out of range for assignment")
+    run_vm_test("let m = {}; m[[1]] = 2", "Index assignment not implemented for input types")
+    run_vm_test('let s = "ab"; s[0] = "c"', "Index assignment not implemented for input types")
+
+
+def test_if_arm_without_value():
+    run_vm_test("if (true) { let x = 1 }; 5", IntObject(5))
+    run_vm_test("let r = if (true) { let x = 1 } else { 2 }; r", NullObject())
+    run_vm_test("if (false) { 1 } else { }", NullObject())
+    # Creating a closure leaves only the closure on the stack
+    run_vm_test("let f = fn() { let fs = []; for (x in [1, 2, 3]) { append(fs, fn() { x }) }; fs }; let fs = f(); fs[0]() + fs[2]()", IntObject(4))
+
+
+def test_dispatch_table():
+    # Each defined opcode dispatches to its own handler
+    vm = VM((bytearray(), []))
+    for op in Opcode:
+        assert vm.handlers[op.value].__name__ == "_op_" + op.name.lower()
+
+    wide = make(Opcode.GETGLOBAL, [70000]) + make(Opcode.POP)
+    vm = VM((wide, []))
+    assert vm.run() is None
+    assert type(vm.last_popped()) is Object
+    vm = VM((make(Opcode.WIDE) + make(Opcode.POP), []))
+    assert vm.run() == "invalid bytecode at 0000: WIDE prefix on POP"
+
+
+def test_int_arrays():
+    compiler = Compiler()
+    compiler.compile(Parser(Lexer("let a = [1, 2, 3]; append(a, 4); [a, rest(a), push(a, 5)]")).parse())
+    vm = VM(compiler.bytecode())
+    assert vm.run() is None
+    # Every array here holds only ints, and the builtins keep them unboxed
+    assert all(isinstance(array, IntArrayObject) for array in vm.last_popped().value[:3])
+
+    ints = lambda *values: ArrayObject([IntObject(v) for v in values])
+    run_vm_test("let a = [1, 2, 3]; [len(a), first(a), last(a), a[1], a[5]]", ArrayObject([IntObject(3), IntObject(1), IntObject(3), IntObject(2), NullObject()]))
+    run_vm_test("let a = [1, 2]; a[0] = 9; a", ints(9, 2))
+    run_vm_test('let a = [1, 2]; a[0] = "x"; a', ArrayObject([StringObject("x"), IntObject(2)]))
+    run_vm_test("let a = [1]; append(a, 9223372036854775807 + 1); a", ints(1, 9223372036854775808))
+    run_vm_test("let a = [1, 2]; push(a, true)", ArrayObject([IntObject(1), IntObject(2), BooleanObject(True)]))
+    run_vm_test("let a = [1, 2]; let t = 0; for (x in a) { let t = t + x }; t", IntObject(3))
+    # Growing and boxing during a loop are seen by the loop
+    run_vm_test("let a = [1]; for (x in a) { if (len(a) < 4) { append(a, x + 1) } }; a", ints(1, 2, 3, 4))
+    run_vm_test('let a = [1, 2]; let r = []; for (x in a) { a[1] = "b"; append(r, x) }; r', ArrayObject([IntObject(1), StringObject("b")]))
+    run_vm_test("[1, 2] == [1, 2]", BooleanObject(True))
+
+
+def test_int_arrays_stay_unboxed():
+    source = "let xs = [1, 2]; let ys = [1, 2]; if (xs) { puts(xs) }; let same = xs == ys; let differ = xs != [1]; [xs, ys, same, differ]"
+    compiler = Compiler()
+    compiler.compile(Parser(Lexer(source)).parse())
+    vm = VM(compiler.bytecode())
+    assert vm.run() is None
+    xs, ys, same, differ = vm.last_popped().value
+    # Truthiness, comparison and puts read the elements without boxing the arrays
+    assert type(xs) is IntArrayObject and type(ys) is IntArrayObject
+    assert same == BooleanObject(True)
+    assert differ == BooleanObject(True)
+    run_vm_test("if ([]) { 1 } else { 2 }", IntObject(2))
+    # rest copies unboxed and boxed elements alike, neither shares storage with the source
+    run_vm_test('let xs = [[1], ["a"], [2]]; let ys = rest(xs); ys[0][0] = 9; ys[1][0] = 8; xs', ArrayObject([ArrayObject([IntObject(1)]), ArrayObject([StringObject("a")]), ArrayObject([IntObject(2)])]))
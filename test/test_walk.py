@@ -0,0 +1,52 @@
+from typing import List
+
+from pycompiler.optimizer import children, walk, rebuild, identifier, node_size, let_names, identifier_names, binding_names, loop_names
+from pycompiler.parser import Parser, Statement, LiteralExpression, IdentifierLiteral, IfExpression
+from pycompiler.lexer import Lexer
+
+
+def parse(test_prog: str) -> List[Statement]:
+    return Parser(Lexer(test_prog)).parse()
+
+
+def names(nodes) -> List[str]:
+    return [
+        n.literal.token.token_value
+        for n in nodes
+        if isinstance(n, LiteralExpression) and isinstance(n.literal, IdentifierLiteral)
+    ]
+
+
+def test_children_in_evaluation_order():
+    statement = parse("if (a) { b } else { c }")[0]
+    condition, consequence, alternative = children(statement.expr)
+    assert names([condition]) == ["a"]
+    assert names(walk(consequence)) == ["b"]
+    assert names(walk(alternative)) == ["c"]
+    assert names(walk(parse("f(a, [b, {c: d}], -e)[g]")[0])) == ["f", "a", "b", "c", "d", "e", "g"]
+
+
+def test_walk_functions():
+    statement = parse("let f = fn(a) { let b = a; b }; f(x)")
+    assert names(walk(statement[0])) == ["a", "b"]
+    assert names(walk(statement[0], functions=False)) == []
+    assert let_names(statement) == {"f"}
+    assert binding_names(statement) == {"f", "a", "b"}
+    assert identifier_names(statement[1]) == {"f", "x"}
+    assert loop_names(parse("let g = fn() { for (i in [1]) { let j = i } }")) == {"i", "j"}
+    assert node_size(statement[0]) == 6
+
+
+def test_rebuild():
+    statement = parse("if (a) { b } else { c }")[0]
+
+    def rename(node):
+        if isinstance(node, LiteralExpression) and isinstance(node.literal, IdentifierLiteral):
+            return identifier(node.literal.token.token_value * 2)
+        return rebuild(node, rename)
+
+    renamed = rename(statement)
+    assert isinstance(renamed.expr, IfExpression)
+    assert names(walk(renamed)) == ["aa", "bb", "cc"]
+    # The original tree is left alone
+    assert names(walk(statement)) == ["a", "b", "c"]